@@ -4,24 +4,44 @@
 数据来源：上海黄金交易所 Au99.99 / 公募基金实时估值
 """
 
+import signal
 import threading
+
+try:
+    from waitress import serve
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
 from app import create_app
-from app.services.background import background_fetch_loop
+from app.config import SERVER_HOST, SERVER_PORT, SERVER_THREADS
+from app.services.background import background_fetch_loop, stop_background_loop
 
 # 创建 Flask 应用实例
 application = create_app()
 
 
+def _handle_sigterm(signum, frame):
+    """收到 SIGTERM 时停止后台线程并正常退出（触发 atexit 落盘）"""
+    stop_background_loop()
+    raise SystemExit(0)
+
+
 if __name__ == '__main__':
     print("=" * 50)
     print(" 个人投资监控看板")
     print(" 数据来源: 上海黄金交易所 Au99.99")
-    print(" 访问地址: http://localhost:5000")
+    print(f" 访问地址: http://localhost:{SERVER_PORT}")
     print("=" * 50)
 
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+
     # 启动后台抓取线程
     t = threading.Thread(target=background_fetch_loop, daemon=True)
     t.start()
 
-    # 启动 Flask 应用
-    application.run(host='0.0.0.0', port=5000, debug=True, threaded=True, use_reloader=False)
+    # 优先使用生产级 WSGI 服务器 waitress（跨平台，支持 Windows），未安装时退回 Flask 内置服务器
+    if WAITRESS_AVAILABLE:
+        serve(application, host=SERVER_HOST, port=SERVER_PORT, threads=SERVER_THREADS)
+    else:
+        application.run(host=SERVER_HOST, port=SERVER_PORT, debug=False, threaded=True, use_reloader=False)
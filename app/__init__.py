@@ -7,7 +7,13 @@ from pathlib import Path
 
 from flask import Flask
 
-from app.config import TEMPLATES_DIR
+try:
+    from flask_compress import Compress
+    FLASK_COMPRESS_AVAILABLE = True
+except ImportError:
+    FLASK_COMPRESS_AVAILABLE = False
+
+from app.config import TEMPLATES_DIR, COMPRESS_MIN_SIZE, COMPRESS_ALGORITHM
 from app.routes import register_blueprints
 from app.services.persistence import load_data
 
@@ -28,6 +34,17 @@ def create_app():
         static_folder=str(STATIC_DIR)
     )
     
+    # 输出紧凑 JSON（Flask 2.2+ 使用 app.json.compact，旧版本使用配置项）
+    flask_app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+    if hasattr(flask_app, 'json') and hasattr(flask_app.json, 'compact'):
+        flask_app.json.compact = True
+    
+    # 较大的 JSON 响应启用 br/gzip 压缩（未安装 flask-compress 时跳过）
+    if FLASK_COMPRESS_AVAILABLE:
+        flask_app.config['COMPRESS_MIN_SIZE'] = COMPRESS_MIN_SIZE
+        flask_app.config['COMPRESS_ALGORITHM'] = COMPRESS_ALGORITHM
+        Compress(flask_app)
+    
     # 注册所有路由蓝图
     register_blueprints(flask_app)
     
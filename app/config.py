@@ -5,6 +5,7 @@
 """
 
 import os
+from dataclasses import dataclass
 
 # ==================== 路径配置 ====================
 # 获取项目根目录（app包的上级目录）
@@ -18,42 +19,28 @@ DATA_FILE = os.path.join(DATA_DIR, 'data.json')
 # 旧数据文件路径（用于自动迁移）
 OLD_DATA_FILE = os.path.join(BASE_DIR, 'data.json')
 
+# ==================== 服务配置 ====================
+SERVER_HOST = '0.0.0.0'
+SERVER_PORT = 5000
+SERVER_THREADS = 16  # WSGI 服务器处理请求的线程数
+
 # ==================== 数据源配置 ====================
+@dataclass(frozen=True)
+class SourceConfig:
+    """金价数据源的不可变配置（运行时熔断状态见 app.models.state.SOURCE_STATE）"""
+    name: str
+    type: str
+    timeout: float
+    enabled: bool = True
+
+
 # 数据源列表（按优先级排序）
-DATA_SOURCES = [
-    {
-        "name": "东方财富",
-        "type": "eastmoney",
-        "enabled": True,
-        "timeout": 3,
-        "fail_count": 0,
-        "mute_until": 0
-    },
-    {
-        "name": "腾讯财经",
-        "type": "tencent",
-        "enabled": True,
-        "timeout": 3,
-        "fail_count": 0,
-        "mute_until": 0
-    },
-    {
-        "name": "网易财经",
-        "type": "netease",
-        "enabled": True,
-        "timeout": 3,
-        "fail_count": 0,
-        "mute_until": 0
-    },
-    {
-        "name": "新浪财经",
-        "type": "sina",
-        "enabled": True,
-        "timeout": 3,
-        "fail_count": 0,
-        "mute_until": 0
-    }
-]
+DATA_SOURCES = (
+    SourceConfig(name="东方财富", type="eastmoney", timeout=3),
+    SourceConfig(name="腾讯财经", type="tencent", timeout=3),
+    SourceConfig(name="网易财经", type="netease", timeout=3),
+    SourceConfig(name="新浪财经", type="sina", timeout=3),
+)
 
 # ==================== 熔断配置 ====================
 MAX_FAIL_COUNT = 3  # 连续失败多少次触发熔断
@@ -62,18 +49,33 @@ MUTE_DURATION = 60  # 熔断持续时间（秒）
 # ==================== 缓存配置 ====================
 CACHE_TTL_SECONDS = 60       # 基金数据缓存有效期（秒）
 FUND_STALE_TTL_SECONDS = 300  # 基金数据可接受的过期时间（秒）
+FUND_CACHE_MAXSIZE = 256      # 基金数据缓存最多保存的基金数量
 HOLDINGS_CACHE_TTL_SECONDS = 10  # 持仓汇总缓存有效期（秒）
 HOLDINGS_STALE_TTL_SECONDS = 300  # 持仓汇总可接受的过期时间（秒）
 STALE_THRESHOLD_SECONDS = 30  # 金价数据过期阈值（秒）
 MAX_FETCH_WORKERS = 10        # 并发获取数据的线程池大小
+FUND_INFLIGHT_WAIT_SECONDS = 15  # 等待同一基金进行中抓取结果的最长时间（秒）
+FUND_FETCH_DEADLINE_SECONDS = 3  # 接口等待逐只回退抓取的最长时间（秒），超时的基金使用过期缓存
+FUND_NEGATIVE_CACHE_TTL = 60  # 所有数据源都取不到的基金在该时间（秒）内不再重复请求上游
 
 # ==================== 历史数据配置 ====================
 MAX_HISTORY_SIZE = 20000  # 存储历史价格数据 (最多保存 20000 条，约 24 小时以上的数据，5秒一条)
 HISTORY_KEEP_HOURS = 24   # 数据清理：保留小时数（注：金价历史已改为按自然日清理，此配置保留供其他用途）
 RECORDS_KEEP_DAYS = 7     # 手动记录保留天数
+DURABILITY_INTERVAL = 300  # 数据文件强制落盘 (fsync) 的最小间隔（秒），其余保存只做原子替换
+SAVE_DEBOUNCE_SECONDS = 1.0  # 异步保存的合并窗口（秒），窗口内的多次修改只写一次文件
 
 # ==================== 基金持仓缓存配置 ====================
 PORTFOLIO_CACHE_TTL = 86400  # 基金重仓股配置缓存有效期 (24小时)
+PORTFOLIO_STALE_TTL = 2 * PORTFOLIO_CACHE_TTL  # 过期缓存仍可直接返回（同时后台刷新）的最长时间
+SINA_QUOTE_CACHE_TTL = 2     # 重仓股实时行情短时缓存有效期（秒）
+
+# ==================== 条件请求缓存配置 ====================
+RESPONSE_CACHE_TTL = 120  # 带 ETag 的接口响应缓存有效期（秒），数据版本变化时立即失效
+
+# ==================== 响应压缩配置 ====================
+COMPRESS_MIN_SIZE = 1024               # 超过该字节数的响应才压缩
+COMPRESS_ALGORITHM = ['br', 'gzip']    # 按客户端支持情况依次选择
 
 # ==================== HTTP 请求配置 ====================
 HEADERS = {
@@ -84,17 +86,20 @@ HEADERS = {
 
 # ==================== 交易时间配置 ====================
 # 节假日 API 配置（按优先级排序）
+# (名称, URL, 超时秒数)
 HOLIDAY_API_URLS = [
     # 百度日历 API（主要）
-    ("baidu", "https://sp0.baidu.com/8aQDcjqpAAV3otqbppnN2DJv/api.php?resource_id=6017&query={year}年节假日"),
+    ("baidu", "https://sp0.baidu.com/8aQDcjqpAAV3otqbppnN2DJv/api.php?resource_id=6017&query={year}年节假日", 5),
     # timor.tech 免费 API（备用1）
-    ("timor", "https://timor.tech/api/holiday/year/{year}"),
+    ("timor", "https://timor.tech/api/holiday/year/{year}", 5),
     # 聚合数据免费 API（备用2，需要Key，这里保留接口仅供参考）
-    ("juhe", "https://api.juhe.cn/calendar/month"),
+    ("juhe", "https://api.juhe.cn/calendar/month", 3),
 ]
 
 HOLIDAY_API_URL = HOLIDAY_API_URLS[0][1]  # 保留兼容性
 HOLIDAY_CACHE_TTL = 86400  # 节假日数据缓存有效期（24小时）
+HOLIDAY_API_MUTE_DURATION = 300  # 节假日 API 连续失败 MAX_FAIL_COUNT 次后的熔断时长（秒）
+HOLIDAY_API_CONNECT_TIMEOUT = 2  # 节假日 API 建立连接的超时（秒），上表中的超时仅用于等待响应
 
 # 智能缓存配置
 HOLIDAY_CACHE_DIR = DATA_DIR  # 缓存目录
@@ -110,7 +115,11 @@ EXCHANGE_CALENDAR_UPDATE_DAY = 1  # 每月1日自动更新
 SGE_HOLIDAY_URL = "https://www.sge.com.cn/xwzx/ssjg?p=1&focus=%25E4%25BC%2591%25E5%25B8%2582"
 SGE_HOLIDAY_CACHE_FILE = os.path.join(DATA_DIR, "sge_holidays.json")
 SGE_HOLIDAY_CACHE_TTL = 30 * 24 * 3600  # 30天缓存
+SGE_FETCH_MUTE_DURATION = 300  # 上金所页面连续抓取失败 MAX_FAIL_COUNT 次后的熔断时长（秒）
  
+# 交易日判断结果缓存有效期（秒），节假日数据更新后最迟在该时间后生效
+TRADING_DAY_CACHE_TTL = 600
+
 # 采集频率配置
 FETCH_INTERVAL_TRADING = 5       # 交易时间内采集间隔（秒）
 FETCH_INTERVAL_NON_TRADING = 300  # 非交易时间采集间隔（秒）
@@ -5,28 +5,46 @@ app.models 包初始化
 
 from app.models.state import (
     lock,
+    records_lock,
+    watchlist_lock,
+    cache_lock,
+    holdings_lock,
+    history_lock,
+    fund_portfolios_lock,
     price_history,
     manual_records,
     alert_settings,
     fund_watchlist,
     fund_portfolios,
     fund_cache,
+    fund_stale,
     fund_holdings,
     holdings_cache,
-    fund_refreshing,
-    holdings_refreshing
+    fund_refresh_gate,
+    holdings_refresh_gate,
+    SOURCE_STATE,
+    source_state_lock
 )
 
 __all__ = [
     'lock',
+    'records_lock',
+    'watchlist_lock',
+    'cache_lock',
+    'holdings_lock',
+    'history_lock',
+    'fund_portfolios_lock',
     'price_history',
     'manual_records',
     'alert_settings',
     'fund_watchlist',
     'fund_portfolios',
     'fund_cache',
+    'fund_stale',
     'fund_holdings',
     'holdings_cache',
-    'fund_refreshing',
-    'holdings_refreshing'
+    'fund_refresh_gate',
+    'holdings_refresh_gate',
+    'SOURCE_STATE',
+    'source_state_lock'
 ]
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+金价历史环形缓冲区
+以两个定长 array（价格 / 时间戳）按列存储历史数据，替代每条记录一个 dict 的 deque
+"""
+
+import threading
+from array import array
+from datetime import datetime
+
+
+class PriceHistory:
+    """
+    定长环形缓冲区
+    - append 为 O(1)，写满后覆盖最旧的数据
+    - 时间戳按追加顺序递增，过期清理使用二分查找一次性丢弃
+    - 最新一条完整记录（含开高低收、数据源等字段）单独保留，供实时价格接口使用
+    """
+
+    def __init__(self, capacity, lock=None):
+        self._capacity = capacity
+        self._prices = array('d', bytes(8 * capacity))
+        self._timestamps = array('d', bytes(8 * capacity))
+        self._head = 0
+        self._count = 0
+        self._latest = None
+        # 仅保护缓冲区内部索引，临界区只有数组读写，持有时间极短
+        self._lock = lock or threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def _push(self, price, timestamp):
+        idx = (self._head + self._count) % self._capacity
+        self._prices[idx] = price
+        self._timestamps[idx] = timestamp
+        if self._count < self._capacity:
+            self._count += 1
+        else:
+            self._head = (self._head + 1) % self._capacity
+
+    def _ordered(self, arr):
+        """按时间顺序返回有效区间的副本"""
+        end = self._head + self._count
+        if end <= self._capacity:
+            return arr[self._head:end]
+        return arr[self._head:] + arr[:end - self._capacity]
+
+    def append(self, record):
+        """追加一条价格记录（至少包含 price 和 timestamp 字段）"""
+        with self._lock:
+            self._push(float(record['price']), float(record['timestamp']))
+            self._latest = record
+
+    def extend(self, records):
+        """批量追加记录（用于从持久化数据恢复）"""
+        with self._lock:
+            for record in records:
+                self._push(float(record.get('price', 0)), float(record.get('timestamp', 0)))
+            if records:
+                self._latest = dict(records[-1])
+
+    def clear(self):
+        with self._lock:
+            self._head = 0
+            self._count = 0
+            self._latest = None
+
+    def expire_before(self, threshold):
+        """丢弃时间戳早于 threshold 的记录"""
+        with self._lock:
+            lo, hi = 0, self._count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._timestamps[(self._head + mid) % self._capacity] < threshold:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo:
+                self._head = (self._head + lo) % self._capacity
+                self._count -= lo
+                if not self._count:
+                    self._latest = None
+
+    def latest(self):
+        """返回最新一条完整记录的副本，无数据时返回 None"""
+        with self._lock:
+            if not self._count or self._latest is None:
+                return None
+            return dict(self._latest)
+
+    def prices(self):
+        """按时间顺序返回价格数组副本"""
+        with self._lock:
+            return self._ordered(self._prices)
+
+    def to_list(self, with_time_str=True):
+        """
+        导出为记录列表 [{price, timestamp, time_str}, ...]
+        最后一条使用完整记录，保证重启后实时价格接口仍有开高低收等字段
+        """
+        with self._lock:
+            prices = self._ordered(self._prices)
+            timestamps = self._ordered(self._timestamps)
+            latest = self._latest
+
+        if with_time_str:
+            records = [
+                {"price": p, "timestamp": ts, "time_str": datetime.fromtimestamp(ts).strftime("%H:%M:%S")}
+                for p, ts in zip(prices, timestamps)
+            ]
+        else:
+            records = [{"price": p, "timestamp": ts} for p, ts in zip(prices, timestamps)]
+
+        if records and latest and latest.get('timestamp') == records[-1]['timestamp']:
+            records[-1] = dict(latest)
+        return records
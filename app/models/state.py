@@ -5,17 +5,38 @@
 """
 
 import threading
-from collections import deque
-from app.config import MAX_HISTORY_SIZE
+from dataclasses import dataclass
+
+from cachetools import TTLCache
+
+from app.config import (
+    MAX_HISTORY_SIZE, CACHE_TTL_SECONDS, FUND_STALE_TTL_SECONDS, FUND_CACHE_MAXSIZE,
+    DATA_SOURCES
+)
+from app.models.price_history import PriceHistory
 
 
 # ==================== 线程锁 ====================
+# 按资源拆分锁，互不相关的接口不再串行；各锁之间不嵌套获取
+# 全局锁：保护预警设置等其余状态
 # 使用 RLock 以支持在持有锁的情况下调用其他需要锁的函数
 lock = threading.RLock()
+# 基金重仓股配置缓存（持仓详情接口与其余状态互不阻塞）
+fund_portfolios_lock = threading.Lock()
+# 手动记录
+records_lock = threading.RLock()
+# 自选基金列表
+watchlist_lock = threading.RLock()
+# 基金持仓及持仓汇总缓存
+holdings_lock = threading.RLock()
+# 金价历史（由 PriceHistory 内部获取，调用方无需也不应另外持有）
+history_lock = threading.Lock()
+# 基金数据缓存专用锁（TTLCache 非线程安全），与自选/持仓等状态的 lock 分离，缓存读写不再互相阻塞
+cache_lock = threading.RLock()
 
 # ==================== 金价历史数据 ====================
-# 存储历史价格数据 (最多保存 MAX_HISTORY_SIZE 条)
-price_history = deque(maxlen=MAX_HISTORY_SIZE)
+# 存储历史价格数据 (环形缓冲区，最多保存 MAX_HISTORY_SIZE 条)
+price_history = PriceHistory(MAX_HISTORY_SIZE, lock=history_lock)
 
 # ==================== 手动记录 ====================
 # 用户手动记录的价格快照
@@ -31,26 +52,47 @@ alert_settings = {
 
 # ==================== 基金相关状态 ====================
 # 基金自选列表 (存储基金代码)
-fund_watchlist = []
+# 使用 dict（值恒为 None）作为有序集合：保持添加顺序，成员判断和删除均为 O(1)
+fund_watchlist = {}
 
 # 基金重仓股配置缓存 (持久化缓存，用于存储股票构成和权重)
 # 结构: { "code": { "timestamp": float, "report_period": str, "holdings_info": {stock_code: {name, weight}} } }
 fund_portfolios = {}
 
 # 基金数据缓存 (内存缓存，不持久化详情，只持久化代码列表)
-fund_cache = {}
+# fund_cache: 新鲜数据，CACHE_TTL_SECONDS 后自动过期
+# fund_stale: 同一份数据的过期兜底副本，FUND_STALE_TTL_SECONDS 内可用于快速模式和抓取失败时回退
+fund_cache = TTLCache(maxsize=FUND_CACHE_MAXSIZE, ttl=CACHE_TTL_SECONDS)
+fund_stale = TTLCache(maxsize=FUND_CACHE_MAXSIZE, ttl=FUND_STALE_TTL_SECONDS)
 
-# 基金持仓数据 (存储在 data.json 中)
-# 结构: [{code, name, cost_price, shares, note}, ...]
-fund_holdings = []
+# 基金持仓数据 (存储在 data.json 中，文件内仍为列表格式)
+# 结构: {code: {code, name, cost_price, shares, note}, ...}（按添加顺序）
+fund_holdings = {}
 
 # ==================== 持仓数据缓存 ====================
 # 内存缓存，用于加速基金估值页刷新
+# timestamp 为 time.monotonic() 读数；key 为生成该响应时持仓内容的哈希，持仓变化后旧响应不会被误用
 holdings_cache = {
     "timestamp": 0,
-    "response": None
+    "response": None,
+    "key": None
 }
 
-# ==================== 后台刷新标记 ====================
-fund_refreshing = False
-holdings_refreshing = False
+# ==================== 后台刷新闸门 ====================
+# 非阻塞 acquire 即原子的“检查并置位”：获取成功的调用方负责刷新并在结束后 release，
+# 刷新进行中时其余调用立即返回
+fund_refresh_gate = threading.Lock()
+holdings_refresh_gate = threading.Lock()
+
+
+# ==================== 数据源熔断状态 ====================
+@dataclass
+class SourceRuntime:
+    """单个金价数据源的运行时熔断状态"""
+    fail_count: int = 0
+    mute_until: float = 0.0  # time.monotonic() 时间点
+
+
+# 按数据源类型索引的熔断状态，读写需持有 source_state_lock
+SOURCE_STATE = {source.type: SourceRuntime() for source in DATA_SOURCES}
+source_state_lock = threading.Lock()
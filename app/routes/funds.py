@@ -4,20 +4,18 @@
 包含基金自选列表、基金持仓详情等
 """
 
-import time
 from flask import Blueprint, jsonify, request
-from concurrent.futures import ThreadPoolExecutor
 
-from app.config import (
-    CACHE_TTL_SECONDS, FUND_STALE_TTL_SECONDS, MAX_FETCH_WORKERS
-)
-from app.models.state import lock, fund_watchlist, fund_cache
+from app.models.state import watchlist_lock, cache_lock, fund_watchlist, fund_cache, fund_stale
+from app.services.executors import FETCH_EXECUTOR
 from app.services.fund_fetcher import (
-    fetch_fund_data,
+    fetch_funds_data,
+    cache_fund_results,
     fetch_fund_portfolio,
-    refresh_fund_cache_async
+    revalidate_funds_async,
+    bootstrap_new_fund
 )
-from app.services.persistence import save_data
+from app.services.persistence import save_data_async
 
 
 funds_bp = Blueprint('funds', __name__)
@@ -25,62 +23,64 @@ funds_bp = Blueprint('funds', __name__)
 
 @funds_bp.route('/api/funds', methods=['GET'])
 def get_funds():
-    """获取所有自选基金的实时数据 (并发优化版)"""
-    results = []
-
-    fast_mode = request.args.get('fast', '0').lower() in ('1', 'true')
-    current_time = time.time()
-
-    with lock:
+    """
+    获取所有自选基金的实时数据 (stale-while-revalidate)
+    - 新鲜缓存 (age < CACHE_TTL_SECONDS)：直接返回
+    - 可接受的过期缓存 (age < FUND_STALE_TTL_SECONDS)：立即返回并在后台刷新，下次轮询拿到新数据
+    - 无缓存：同步抓取（没有可返回的数据）
+    """
+    with watchlist_lock:
         current_watchlist = list(fund_watchlist)
 
     codes_to_fetch = []
     codes_to_refresh = []
     temp_results = {}
 
-    for code in current_watchlist:
-        cache_item = fund_cache.get(code)
-        if cache_item and (current_time - cache_item['timestamp'] < CACHE_TTL_SECONDS):
-            temp_results[code] = cache_item
-        elif fast_mode and cache_item and (current_time - cache_item['timestamp'] < FUND_STALE_TTL_SECONDS):
-            # 快速模式：优先返回可接受的过期缓存
-            stale_item = dict(cache_item)
-            if "(缓存)" not in stale_item.get('source', ''):
-                stale_item['source'] = f"{stale_item.get('source', '')}(缓存)"
-            temp_results[code] = stale_item
-            codes_to_refresh.append(code)
-        else:
-            codes_to_fetch.append(code)
-
-    # 非快速模式或无可用缓存时：并发抓取
+    # TTLCache 自动处理过期：fund_cache 命中即新鲜数据，fund_stale 命中即可接受的过期数据
+    with cache_lock:
+        for code in current_watchlist:
+            try:
+                temp_results[code] = fund_cache[code]
+                continue
+            except KeyError:
+                pass
+            stale_item = fund_stale.get(code)
+            if stale_item:
+                stale_item = dict(stale_item)
+                if "(更新中)" not in stale_item.get('source', ''):
+                    stale_item['source'] = f"{stale_item.get('source', '')}(更新中)"
+                temp_results[code] = stale_item
+                codes_to_refresh.append(code)
+            else:
+                codes_to_fetch.append(code)
+
+    if codes_to_refresh:
+        revalidate_funds_async(codes_to_refresh)
+
+    # 无可用缓存时：批量抓取（缺失项逐只回退）
     if codes_to_fetch:
-        with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
-            fetched_data_list = list(executor.map(fetch_fund_data, codes_to_fetch))
-
-        with lock:
-            for i, data in enumerate(fetched_data_list):
-                code = codes_to_fetch[i]
-                if data:
-                    fund_cache[code] = data
-                    temp_results[code] = data
-                else:
-                    old_cache = fund_cache.get(code)
-                    if old_cache:
-                        if "(过期)" not in old_cache.get('source', ''):
-                            old_cache['source'] = f"{old_cache.get('source', '')}(过期)"
-                        temp_results[code] = old_cache
-                    else:
-                        temp_results[code] = {
-                            "code": code,
-                            "name": "加载失败",
-                            "price": 0,
-                            "change": 0,
-                            "time_str": "--",
-                            "source": "Error"
-                        }
-
-    if fast_mode and codes_to_refresh:
-        refresh_fund_cache_async(codes_to_refresh)
+        fetched_data_list = fetch_funds_data(codes_to_fetch)
+        fallback_map = cache_fund_results(codes_to_fetch, fetched_data_list)
+
+        for code, data in zip(codes_to_fetch, fetched_data_list):
+            if data:
+                temp_results[code] = data
+                continue
+            old_cache = fallback_map.get(code)
+            if old_cache:
+                old_cache = dict(old_cache)
+                if "(过期)" not in old_cache.get('source', ''):
+                    old_cache['source'] = f"{old_cache.get('source', '')}(过期)"
+                temp_results[code] = old_cache
+            else:
+                temp_results[code] = {
+                    "code": code,
+                    "name": "加载失败",
+                    "price": 0,
+                    "change": 0,
+                    "time_str": "--",
+                    "source": "Error"
+                }
 
     results = [temp_results.get(code) for code in current_watchlist if temp_results.get(code)]
 
@@ -106,33 +106,28 @@ def add_fund():
     if not code or not code.isdigit() or len(code) != 6:
         return jsonify({"success": False, "message": "无效的基金代码 (需6位数字)"})
         
-    with lock:
+    with watchlist_lock:
         if code in fund_watchlist:
             return jsonify({"success": False, "message": "该基金已在列表中"})
+        fund_watchlist[code] = None
     
-    # 尝试抓取一次以验证代码有效性
-    data = fetch_fund_data(code)
-    if not data:
-        return jsonify({"success": False, "message": "无法获取该基金数据，请确认代码是否正确"})
-        
-    with lock:
-        fund_watchlist.append(code)
-        fund_cache[code] = data # 顺便存入缓存
-        
-    save_data()
-    return jsonify({"success": True, "data": data})
+    # 先加入列表立即返回，由后台抓取验证代码有效性并写入缓存（上游确认代码不存在时自动移除）
+    save_data_async()
+    FETCH_EXECUTOR.submit(bootstrap_new_fund, code)
+    return jsonify({"success": True, "pending": True, "code": code})
 
 
 @funds_bp.route('/api/funds/<code_to_del>', methods=['DELETE'])
 def delete_fund(code_to_del):
     """删除自选基金"""
-    with lock:
-        if code_to_del in fund_watchlist:
-            fund_watchlist.remove(code_to_del)
-            # 缓存可以选择不删，反正会自动过期，或者删掉省内存
-            if code_to_del in fund_cache:
-                del fund_cache[code_to_del]
-            save_data()
-            return jsonify({"success": True})
-            
-    return jsonify({"success": False, "message": "未找到该基金"})
+    with watchlist_lock:
+        if code_to_del not in fund_watchlist:
+            return jsonify({"success": False, "message": "未找到该基金"})
+        del fund_watchlist[code_to_del]
+    
+    # 缓存可以选择不删，反正会自动过期，或者删掉省内存
+    with cache_lock:
+        fund_cache.pop(code_to_del, None)
+        fund_stale.pop(code_to_del, None)
+    save_data_async()
+    return jsonify({"success": True})
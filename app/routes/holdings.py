@@ -6,19 +6,22 @@
 
 import time
 from flask import Blueprint, jsonify, request
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
 
 from app.config import (
-    HOLDINGS_CACHE_TTL_SECONDS, HOLDINGS_STALE_TTL_SECONDS, MAX_FETCH_WORKERS
+    HOLDINGS_CACHE_TTL_SECONDS, HOLDINGS_STALE_TTL_SECONDS
 )
-from app.models.state import lock, fund_holdings, fund_cache, holdings_cache
+from app.models.state import holdings_lock, fund_holdings, holdings_cache
+from app.services.executors import FETCH_EXECUTOR
 from app.services.fund_fetcher import (
-    fetch_fund_data,
+    fetch_funds_data,
+    resolve_holding_name,
+    cache_fund_results,
     build_holdings_response,
+    holdings_cache_key,
     refresh_holdings_cache_async
 )
-from app.services.persistence import save_data
+from app.services.persistence import save_data_async
+from app.utils.time_cache import now_str
 
 
 holdings_bp = Blueprint('holdings', __name__)
@@ -31,17 +34,22 @@ def get_holdings():
     """
     fast_mode = request.args.get('fast', '0').lower() in ('1', 'true')
     force_refresh = request.args.get('refresh', 'false').lower() in ('1', 'true')
-    now_ts = time.time()
+    # 缓存有效期使用单调时钟判断，系统时间跳变不会导致缓存集体失效或长期不过期
+    now_ts = time.monotonic()
 
-    with lock:
-        holdings = list(fund_holdings)
+    with holdings_lock:
+        holdings = list(fund_holdings.values())
         cached_response = holdings_cache.get("response")
         cached_ts = holdings_cache.get("timestamp", 0)
+        cached_key = holdings_cache.get("key")
 
-    if fast_mode and not force_refresh and cached_response:
+    key = holdings_cache_key(holdings)
+    if cached_response and cached_key == key and not force_refresh:
+        # 有效期内直接返回缓存，轮询期间不再重复请求上游
         if now_ts - cached_ts < HOLDINGS_CACHE_TTL_SECONDS:
             return jsonify(cached_response)
-        if now_ts - cached_ts < HOLDINGS_STALE_TTL_SECONDS:
+        # 快速模式：可接受的过期范围内先返回旧数据，同时后台刷新
+        if fast_mode and now_ts - cached_ts < HOLDINGS_STALE_TTL_SECONDS:
             refresh_holdings_cache_async(holdings)
             stale_response = dict(cached_response)
             stale_response["stale"] = True
@@ -52,28 +60,21 @@ def get_holdings():
             "success": True,
             "data": [],
             "summary": {"total_cost": 0, "total_value": 0, "total_profit": 0, "total_profit_rate": 0, "count": 0},
-            "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            "last_update": now_str()
         }
-        with lock:
-            holdings_cache["timestamp"] = now_ts
-            holdings_cache["response"] = response
+        with holdings_lock:
+            holdings_cache.update({"timestamp": now_ts, "response": response, "key": key})
         return jsonify(response)
     
     codes = [h['code'] for h in holdings]
 
-    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
-        fund_data_list = list(executor.map(fetch_fund_data, codes))
+    fund_data_list = fetch_funds_data(codes)
 
-    with lock:
-        cached_map = {code: fund_cache.get(code) for code in codes}
-        for i, data in enumerate(fund_data_list):
-            if data:
-                fund_cache[codes[i]] = data
+    cached_map = cache_fund_results(codes, fund_data_list)
 
     response = build_holdings_response(holdings, fund_data_list, cached_map)
-    with lock:
-        holdings_cache["timestamp"] = now_ts
-        holdings_cache["response"] = response
+    with holdings_lock:
+        holdings_cache.update({"timestamp": now_ts, "response": response, "key": key})
 
     return jsonify(response)
 
@@ -101,50 +102,43 @@ def add_or_update_holding():
     if cost_price <= 0 or shares <= 0:
         return jsonify({"success": False, "message": "成本价和份额必须大于0"})
     
-    # 尝试获取基金名称
-    fund_data = fetch_fund_data(code)
-    name = fund_data['name'] if fund_data else f'基金{code}'
-    
-    with lock:
+    with holdings_lock:
         # 检查是否已存在
-        existing = next((h for h in fund_holdings if h['code'] == code), None)
+        existing = fund_holdings.get(code)
         if existing:
             # 更新
             existing['cost_price'] = cost_price
             existing['shares'] = shares
             existing['note'] = note
-            existing['name'] = name
         else:
-            # 新增
-            fund_holdings.append({
+            # 新增（先使用占位名称，真实名称由后台补全）
+            fund_holdings[code] = {
                 'code': code,
-                'name': name,
+                'name': f'基金{code}',
                 'cost_price': cost_price,
                 'shares': shares,
                 'note': note
-            })
+            }
         # 修改数据后使缓存失效
         holdings_cache["response"] = None
         holdings_cache["timestamp"] = 0
+        holdings_cache["key"] = None
     
-    save_data()
-    return jsonify({"success": True, "message": "持仓已保存"})
+    save_data_async()
+    FETCH_EXECUTOR.submit(resolve_holding_name, code)
+    return jsonify({"success": True, "message": "持仓已保存", "pending": True})
 
 
 @holdings_bp.route('/api/holdings/<code_to_del>', methods=['DELETE'])
 def delete_holding(code_to_del):
     """删除持仓记录"""
-    with lock:
-        original_len = len(fund_holdings)
-        # 使用列表推导式过滤
-        to_keep = [h for h in fund_holdings if h['code'] != code_to_del]
-        if len(to_keep) < original_len:
-            fund_holdings.clear()
-            fund_holdings.extend(to_keep)
-            # 修改数据后使缓存失效
-            holdings_cache["response"] = None
-            holdings_cache["timestamp"] = 0
-            save_data()
-            return jsonify({"success": True, "message": "持仓已删除"})
+    with holdings_lock:
+        if fund_holdings.pop(code_to_del, None) is None:
+            return jsonify({"success": False, "message": "未找到该持仓"})
+        # 修改数据后使缓存失效
+        holdings_cache["response"] = None
+        holdings_cache["timestamp"] = 0
+        holdings_cache["key"] = None
     
-    return jsonify({"success": False, "message": "未找到该持仓"})
+    save_data_async()
+    return jsonify({"success": True, "message": "持仓已删除"})
@@ -8,14 +8,15 @@ import time
 from flask import Blueprint, render_template, jsonify, request
 
 from app.config import STALE_THRESHOLD_SECONDS
-from app.models.state import lock, price_history
+from app.models.state import price_history
 from app.services.gold_fetcher import fetch_gold_price
+from app.services.background import request_refresh
 from app.services.calculator import (
     calculate_target_prices,
     calculate_current_profit,
     get_24h_summary
 )
-from app.services.persistence import save_data
+from app.services.persistence import save_data_async
 
 
 price_bp = Blueprint('price', __name__)
@@ -30,42 +31,45 @@ def index():
 @price_bp.route('/api/price')
 def get_price():
     """获取当前金价 (改为从缓存获取，不再实时去抓取，提高响应速度)"""
-    with lock:
-        if price_history:
-            latest = price_history[-1].copy() # 复制一份，避免直接修改缓存
-            # 如果缓存数据太老（超过 30 秒），说明后台可能挂了或未运行，尝试实时抓一次
-            if time.time() - latest["timestamp"] > STALE_THRESHOLD_SECONDS:
+    latest = price_history.latest()  # 返回副本，避免直接修改缓存
+    if latest:
+        stale = False
+        # 如果缓存数据太老（超过 30 秒），唤醒后台线程立即采集，本次先返回旧数据并标记 stale
+        if time.time() - latest["timestamp"] > STALE_THRESHOLD_SECONDS:
+            if request_refresh():
+                stale = True
+            else:
+                # 后台线程未运行时退回同步抓取
                 data, _ = fetch_gold_price()
                 if data:
                     price_history.append(data)
-                    save_data()
-                    latest = data
-            
-            # 注入 24 小时摘要信息
-            summary = get_24h_summary()
-            if summary:
-                latest.update(summary)
-                
-            return jsonify({"success": True, "data": latest})
-        else:
-            # 没历史记录时去抓一次
-            data, error_msg = fetch_gold_price()
-            if data:
-                with lock:
-                    price_history.append(data)
-                save_data()
-                return jsonify({"success": True, "data": data})
-            else:
-                return jsonify({"success": False, "message": error_msg or "无法初始化基础数据"})
-            
-    return jsonify({"success": False, "message": "系统错误，无法读取历史记录"})
+                    save_data_async()
+                    latest = dict(data)
+        
+        # 注入 24 小时摘要信息
+        summary = get_24h_summary()
+        if summary:
+            latest.update(summary)
+        
+        response = {"success": True, "data": latest}
+        if stale:
+            response["stale"] = True
+        return jsonify(response)
+    
+    # 没历史记录时去抓一次
+    data, error_msg = fetch_gold_price()
+    if data:
+        price_history.append(data)
+        save_data_async()
+        return jsonify({"success": True, "data": data})
+    return jsonify({"success": False, "message": error_msg or "无法初始化基础数据"})
 
 
 @price_bp.route('/api/history')
 def get_history():
     """获取历史价格数据"""
-    with lock:
-        history_list = list(price_history)
+    # 只读快照无需全局锁：环形缓冲区内部仅在复制数组时短暂加锁
+    history_list = price_history.to_list()
     return jsonify({"success": True, "data": history_list})
 
 
@@ -4,11 +4,13 @@
 包含预警设置、手动记录等
 """
 
+import time
 from flask import Blueprint, jsonify, request
-from datetime import datetime
 
-from app.models.state import lock, alert_settings, manual_records
-from app.services.persistence import save_data
+from app.models.state import lock, records_lock, alert_settings, manual_records
+from app.services.persistence import save_data_async
+from app.utils.http_cache import cached_json
+from app.utils.time_cache import format_datetime
 
 
 settings_bp = Blueprint('settings', __name__)
@@ -24,7 +26,7 @@ def handle_settings():
             alert_settings["low"] = float(req_data.get('low', 0))
             alert_settings["enabled"] = bool(req_data.get('enabled', False))
             alert_settings["trading_events_enabled"] = bool(req_data.get('trading_events_enabled', True))
-        save_data()
+        save_data_async()
         return jsonify({"success": True, "settings": alert_settings})
     
     return jsonify({"success": True, "settings": alert_settings})
@@ -34,34 +36,36 @@ def handle_settings():
 def add_record():
     """添加手动记录"""
     req_data = request.get_json()
+    ts = time.time()
     record = {
         "price": req_data.get('price'),
         "buy_price": req_data.get('buy_price'),
         "profit": req_data.get('profit'),
-        "timestamp": datetime.now().timestamp(),
-        "time_str": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": ts,
+        "time_str": format_datetime(int(ts)),
         "note": req_data.get('note', '')
     }
     
-    with lock:
+    with records_lock:
         manual_records.append(record)
     
-    save_data()
+    save_data_async()
     return jsonify({"success": True, "record": record})
 
 
 @settings_bp.route('/api/records')
 def get_records():
-    """获取所有手动记录"""
-    with lock:
+    """获取所有手动记录（记录只在用户操作时变化，支持 ETag/304）"""
+    with records_lock:
         records = list(manual_records)
-    return jsonify({"success": True, "data": records})
+    version = (len(records), records[-1].get('timestamp', 0) if records else 0)
+    return cached_json(("records",) + version, lambda: {"success": True, "data": records})
 
 
 @settings_bp.route('/api/records/clear', methods=['POST'])
 def clear_records():
     """清空手动记录"""
-    with lock:
+    with records_lock:
         manual_records.clear()
-    save_data()
+    save_data_async()
     return jsonify({"success": True})
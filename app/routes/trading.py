@@ -28,28 +28,24 @@ EVENT_NAMES = {
 }
 
 
+# 星期几名称映射
+WEEKDAY_NAMES = ("周一", "周二", "周三", "周四", "周五", "周六", "周日")
+
+
 def _format_status(status):
-    """格式化交易状态为 API 响应"""
-    # 转换时间为字符串（使用空格分隔，更兼容）
-    next_event_time_str = None
-    if status["next_event_time"]:
-        next_event_time_str = status["next_event_time"].strftime("%Y-%m-%d %H:%M:%S")
-    
-    # 星期几名称映射
-    weekday_names = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-    
+    """格式化交易状态为 API 响应（时间字符串已由 trading_hours 预先格式化）"""
     return {
         "is_trading_time": status["is_trading_time"],
         "trading_phase": status["trading_phase"],
         "phase_name": status["phase_name"],
         "next_event": status["next_event"],
         "next_event_name": EVENT_NAMES.get(status["next_event"], status["next_event"]),
-        "next_event_time": next_event_time_str,
+        "next_event_time": status["next_event_time_str"],
         "time_until_next": status["time_until_next"],
         "is_holiday": status["is_holiday"],
         "holiday_name": status.get("holiday_name"),
         "weekday": status["weekday"],
-        "weekday_name": weekday_names[status["weekday"]]
+        "weekday_name": WEEKDAY_NAMES[status["weekday"]]
     }
 
 
@@ -57,22 +53,16 @@ def _format_status(status):
 def get_trading_status_api():
     """
     获取当前交易状态 (支持 ?type=gold 或 ?type=fund)
+    前端每秒轮询倒计时，time_until_next 每次都会变化，因此不走 ETag 响应缓存
+    （交易状态本身已由 trading_hours 按分钟缓存，每次只重新计算倒计时）
     
     返回:
         JSON: 交易状态信息
     """
     try:
-        asset_type = request.args.get('type', 'gold').lower()
-        
-        if asset_type == 'fund':
-            status = get_fund_trading_status()
-        else:
-            status = get_trading_status()
-        
-        return jsonify({
-            "success": True,
-            "data": _format_status(status)
-        })
+        asset_type = 'fund' if request.args.get('type', 'gold').lower() == 'fund' else 'gold'
+        status_func = get_fund_trading_status if asset_type == 'fund' else get_trading_status
+        return jsonify({"success": True, "data": _format_status(status_func())})
     except Exception as e:
         return jsonify({
             "success": False,
@@ -4,50 +4,90 @@
 包含后台定时采集任务（金价、基金数据等）
 """
 
-import time
+import threading
 
-from app.models.state import lock, price_history
+from app.models.state import price_history
+from app.services.exchange_calendar import prewarm as prewarm_exchange_calendar
 from app.services.gold_fetcher import fetch_gold_price
 from app.services.persistence import save_data
-from app.services.trading_hours import get_fetch_interval, check_trading_events
+from app.services.trading_hours import get_fetch_interval, check_trading_events, get_trading_status
+
+# 唤醒事件：接口发现数据过期时置位，让后台线程立即进行下一次采集
+_wakeup = threading.Event()
+# 停止事件：进程退出时置位，后台线程在下一轮开始前退出
+_shutdown = threading.Event()
+# 后台线程是否正在运行（未运行时接口需自行同步抓取）
+_running = False
+
+
+def request_refresh():
+    """唤醒后台线程立即采集一次，返回后台线程是否在运行"""
+    _wakeup.set()
+    return _running
+
+
+def stop_background_loop():
+    """通知后台线程停止，并打断正在进行的等待"""
+    _shutdown.set()
+    _wakeup.set()
+
+
+def _prewarm_calendar():
+    """预热交易所休市数据（独立线程中执行，爬取耗时不影响金价采集）"""
+    try:
+        prewarm_exchange_calendar()
+    except Exception as e:
+        print(f"[交易所日历] 预热失败: {e}")
 
 
 def background_fetch_loop():
     """后台持续采集任务线程，负责金价和基金数据的定时更新"""
+    global _running
     print("后台抓取线程启动...")
+    _running = True
+    
+    # 交易所休市数据在单独的守护线程中预热，采集循环立即开始
+    threading.Thread(target=_prewarm_calendar, name='calendar-prewarm', daemon=True).start()
     
     last_trading_status = None
     
-    while True:
+    while not _shutdown.is_set():
         try:
+            # 本轮只取一次交易状态，采集间隔和事件检测共用
+            trading_status = get_trading_status()
+            
             # 获取当前应使用的采集间隔
-            interval = get_fetch_interval("gold")
+            interval = get_fetch_interval("gold", status=trading_status)
             
             # 检查是否触发交易事件（开收盘）
-            event = check_trading_events("gold", last_trading_status)
+            event = check_trading_events("gold", last_trading_status, trading_status)
             if event:
                 print(f"[交易事件] {event['event_name']} 已触发！")
                 # TODO: 在这里可以添加通知逻辑
             
             # 更新交易状态
-            from app.services.trading_hours import get_trading_status
-            last_trading_status = get_trading_status()
+            last_trading_status = trading_status
             
             # 只在交易时间内打印状态
             if last_trading_status["is_trading_time"]:
                 print(f"[后台采集] {last_trading_status['phase_name']} - 采集间隔: {interval}秒")
             
+            # 抓取前清除唤醒标记：抓取期间到达的 request_refresh 会让下一次等待立即返回，不会丢失
+            _wakeup.clear()
+            
             # 获取金价数据
             data, _ = fetch_gold_price()
             if data:
-                with lock:
-                    # 添加到历史记录
-                    price_history.append(data)
+                # 添加到历史记录（环形缓冲区内部使用 history_lock）
+                price_history.append(data)
                 # 记录成功后保存数据（内部包含清理逻辑）
                 save_data()
             
-            # 按计算出的间隔休眠
-            time.sleep(interval)
+            # 按计算出的间隔等待，期间可被 request_refresh / stop_background_loop 提前唤醒
+            _wakeup.wait(interval)
         except Exception as e:
             print(f"后台抓取异常: {e}")
-            time.sleep(30) # 异常后等待较长时间再重试
+            _shutdown.wait(30) # 异常后等待较长时间再重试
+    
+    _running = False
+    print("后台抓取线程已停止")
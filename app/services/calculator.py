@@ -4,7 +4,7 @@
 包含盈利计算、收益率计算、24小时统计等
 """
 
-from app.models.state import lock, price_history
+from app.models.state import price_history
 
 
 def calculate_target_prices(buy_price, fee_rate=0.005):
@@ -53,20 +53,19 @@ def calculate_current_profit(buy_price, current_price, fee_rate=0.005):
 
 def get_24h_summary():
     """计算过去 24 小时的统计数据"""
-    with lock:
-        if not price_history:
-            return None
-        
-        prices = [p['price'] for p in price_history]
-        high = max(prices)
-        low = min(prices)
-        avg = sum(prices) / len(prices)
-        volatility = high - low
-        
-        return {
-            "high_24h": round(high, 2),
-            "low_24h": round(low, 2),
-            "avg_24h": round(avg, 2),
-            "volatility": round(volatility, 2),
-            "count": len(prices)
-        }
+    prices = price_history.prices()
+    if not prices:
+        return None
+    
+    high = max(prices)
+    low = min(prices)
+    avg = sum(prices) / len(prices)
+    volatility = high - low
+    
+    return {
+        "high_24h": round(high, 2),
+        "low_24h": round(low, 2),
+        "avg_24h": round(avg, 2),
+        "volatility": round(volatility, 2),
+        "count": len(prices)
+    }
@@ -7,9 +7,12 @@
 import json
 import os
 from datetime import datetime
+from functools import lru_cache
+from itertools import chain
 
 from app.config import SGE_HOLIDAY_CACHE_FILE
 from app.services.sge_holiday_crawler import fetch_sge_holiday_data
+from app.utils.fast_json import dumps_bytes
 
 
 # 内置2026年休市数据（来自上交所官网）
@@ -37,60 +40,147 @@ BUILTIN_EXCHANGE_HOLIDAYS = {
     }
 }
 
+# 内置数据只读：各节日日期转为 frozenset，查询时无需每次重建集合
+for _data in BUILTIN_EXCHANGE_HOLIDAYS.values():
+    _data["holidays"] = {name: frozenset(dates) for name, dates in _data["holidays"].items()}
+del _data
+
+# 内置年份的全年休市日期（模块加载时汇总一次，每次查询返回同一个 frozenset）
+_BUILTIN_ALL_DATES = {
+    year: frozenset(chain.from_iterable(data["holidays"].values()))
+    for year, data in BUILTIN_EXCHANGE_HOLIDAYS.items()
+}
+
+
+def _build_date_index(year_data):
+    """将 {节日: [日期, ...]} 展开为 {日期: 节日} 反向索引，按日期查节日名称只需一次哈希查找"""
+    return {
+        date_str: name
+        for name, dates in year_data.get("holidays", {}).items()
+        for date_str in dates
+    }
+
+
+# 内置年份的日期→节日名称索引（模块加载时构建一次）: {year: {date_str: name}}
+_DATE_TO_NAME = {year: _build_date_index(data) for year, data in BUILTIN_EXCHANGE_HOLIDAYS.items()}
+
+
+@lru_cache(maxsize=8)
+def _sge_cached(year):
+    data = fetch_sge_holiday_data(year)
+    if not data:
+        # lru_cache 不缓存异常：失败结果不记忆，下次调用重试
+        raise LookupError(f"SGE 休市数据不可用: {year}")
+    return data
+
+
+def _sge(year):
+    """获取 SGE 休市数据（按年份记忆，trading_hours 每 TRADING_DAY_CACHE_TTL 秒清空一次），失败返回 None"""
+    try:
+        return _sge_cached(year)
+    except Exception:
+        return None
+
 
 class ExchangeCalendarService:
     """交易所交易日历服务"""
     
     def __init__(self):
         self.cache_file = SGE_HOLIDAY_CACHE_FILE
-        self._ensure_cache_dir()
+        # SGE 爬虫 / 本地缓存数据的日期→节日名称索引: {year: {date_str: name}}
+        self._date_index = {}
+        # 按年份记忆的查询结果，仅保存非空结果（空结果说明数据源暂不可用，下次调用重试）
+        self._holidays_cache = {}    # {year: frozenset(date_str)}
+        self._first_day_cache = {}   # {year: {holiday_name: date_str}}
+        # 已解析的缓存文件内容及其修改时间，文件未变化时不重复读取和解析
+        self._cache_mem = None
+        self._cache_mtime = None
+        self._last_written_hash = None  # 上次写入内容的哈希，内容未变化时跳过写盘
     
     def _ensure_cache_dir(self):
-        cache_dir = os.path.dirname(self.cache_file)
-        if not os.path.exists(cache_dir):
-            os.makedirs(cache_dir)
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
     
     def _load_cache(self):
-        if not os.path.exists(self.cache_file):
+        try:
+            mtime = os.stat(self.cache_file).st_mtime_ns
+        except OSError:
             return None
+        if mtime == self._cache_mtime:
+            return self._cache_mem
         try:
             with open(self.cache_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                self._cache_mem = json.load(f)
+            self._cache_mtime = mtime
+            return self._cache_mem
         except:
             return None
     
-    def _save_cache(self, data):
+    def _save_cache(self, data, pretty=False):
+        """保存到文件：默认紧凑格式，与上次写入内容相同时跳过"""
         try:
+            if pretty:
+                blob = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+            else:
+                blob = dumps_bytes(data)
+            blob_hash = hash(blob)
+            if blob_hash == self._last_written_hash:
+                return True
+            
+            # 目录在写入时按需创建，读取路径不需要目录存在
+            self._ensure_cache_dir()
             temp_file = self.cache_file + ".tmp"
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with open(temp_file, 'wb') as f:
+                f.write(blob)
             os.replace(temp_file, self.cache_file)
+            self._last_written_hash = blob_hash
             return True
         except:
             return False
     
+    def invalidate(self, year=None):
+        """清除记忆的查询结果（year 为 None 时清除全部），数据源更新后调用"""
+        if year is None:
+            self._holidays_cache.clear()
+            self._first_day_cache.clear()
+            self._date_index.clear()
+        else:
+            self._holidays_cache.pop(year, None)
+            self._first_day_cache.pop(year, None)
+            self._date_index.pop(year, None)
+    
+    def prewarm(self, years):
+        """
+        预热多个年份的休市数据（由后台预热线程调用）
+        非内置年份逐年获取：SGE 爬虫共用一个缓存文件，并发爬取没有收益
+        """
+        for year in years:
+            self.get_holidays(year)
+    
     def get_holidays(self, year=None):
         """获取指定年份的休市日期集合"""
         if year is None:
             year = datetime.now().year
         
-        # 1. 优先使用内置数据
-        if year in BUILTIN_EXCHANGE_HOLIDAYS:
-            data = BUILTIN_EXCHANGE_HOLIDAYS[year]
-            all_dates = set()
-            for dates in data.get("holidays", {}).values():
-                all_dates.update(dates)
-            return all_dates
+        holidays = _BUILTIN_ALL_DATES.get(year)
+        if holidays is not None:
+            return holidays
         
+        holidays = self._holidays_cache.get(year)
+        if holidays is None:
+            holidays = self._resolve_holidays(year)
+            if holidays:
+                self._holidays_cache[year] = holidays
+        return holidays
+    
+    def _resolve_holidays(self, year):
+        """按 SGE爬虫 → 本地缓存 的顺序获取非内置年份的休市日期集合"""
+        # 1. 内置数据已在 get_holidays 中直接返回
         # 2. 尝试使用SGE爬虫获取
-        try:
-            sge_data = fetch_sge_holiday_data(year)
-            if sge_data:
-                all_dates = set(sge_data.get("all_holiday_dates", []))
-                if all_dates:
-                    return all_dates
-        except Exception as e:
-            print(f"[交易所日历] SGE爬虫调用失败: {e}")
+        sge_data = _sge(year)
+        if sge_data:
+            all_dates = frozenset(sge_data.get("all_holiday_dates", ()))
+            if all_dates:
+                return all_dates
         
         # 3. 尝试从本地缓存读取
         cache = self._load_cache()
@@ -98,74 +188,77 @@ class ExchangeCalendarService:
             calendars = cache.get("calendars", {})
             if str(year) in calendars:
                 data = calendars[str(year)]
-                all_dates = set()
-                for dates in data.get("holidays", {}).values():
-                    all_dates.update(dates)
-                return all_dates
+                return frozenset(chain.from_iterable(data.get("holidays", {}).values()))
         
-        return set()
+        return frozenset()
     
     def get_first_trading_day(self, holiday_name, year=None):
         """获取指定节假日后的首个交易日"""
         if year is None:
             year = datetime.now().year
         
+        first_days = self._first_day_cache.get(year)
+        if first_days is None:
+            first_days = self._resolve_first_trading_days(year)
+            if first_days:
+                self._first_day_cache[year] = first_days
+        return first_days.get(holiday_name)
+    
+    def _resolve_first_trading_days(self, year):
+        """获取指定年份 {节日: 首个交易日}，SGE爬虫数据优先于本地缓存"""
         # 优先使用内置数据
         if year in BUILTIN_EXCHANGE_HOLIDAYS:
-            return BUILTIN_EXCHANGE_HOLIDAYS[year].get("first_trading_days", {}).get(holiday_name)
+            return BUILTIN_EXCHANGE_HOLIDAYS[year]["first_trading_days"]
         
-        # 尝试SGE爬虫数据
-        try:
-            sge_data = fetch_sge_holiday_data(year)
-            if sge_data:
-                result = sge_data.get("first_trading_days", {}).get(holiday_name)
-                if result:
-                    return result
-        except Exception:
-            pass
+        first_days = {}
+        # 从缓存读取兜底
+        cache = self._load_cache()
+        if cache:
+            year_data = cache.get("calendars", {}).get(str(year))
+            if year_data:
+                first_days.update(year_data.get("first_trading_days", {}))
+        
+        # SGE爬虫数据覆盖缓存
+        sge_data = _sge(year)
+        if sge_data:
+            first_days.update(sge_data.get("first_trading_days", {}))
+        
+        return first_days
+    
+    def _get_date_index(self, year):
+        """
+        获取 SGE 爬虫 / 本地缓存数据的日期→节日名称索引
+        爬虫数据优先于缓存；仅在爬虫返回数据时缓存索引，失败时下次调用重试
+        """
+        index = self._date_index.get(year)
+        if index is not None:
+            return index
         
-        # 尝试从缓存读取
+        index = {}
+        # 本地缓存兜底（仅 SGE 独立缓存），再由爬虫数据覆盖
         cache = self._load_cache()
         if cache:
-            calendars = cache.get("calendars", {})
-            if str(year) in calendars:
-                return calendars[str(year)].get("first_trading_days", {}).get(holiday_name)
+            year_data = cache.get("calendars", {}).get(str(year))
+            if year_data:
+                index.update(_build_date_index(year_data))
         
-        return None
+        sge_data = _sge(year)
+        if sge_data:
+            index.update(_build_date_index(sge_data))
+            self._date_index[year] = index
+        return index
     
     def get_holiday_name_by_date(self, date_str):
         """根据日期获取节日名称"""
-        date = datetime.strptime(date_str, "%Y-%m-%d")
-        year = date.year
+        year = int(date_str[:4])
         
         # 1. 内置数据
-        if year in BUILTIN_EXCHANGE_HOLIDAYS:
-            holidays = BUILTIN_EXCHANGE_HOLIDAYS[year].get("holidays", {})
-            for name, dates in holidays.items():
-                if date_str in dates:
-                    return name
+        name = _DATE_TO_NAME.get(year, {}).get(date_str)
+        if name:
+            return name
         
-        # 2. SGE爬虫数据
-        try:
-            sge_data = fetch_sge_holiday_data(year)
-            if sge_data:
-                for name, dates in sge_data.get("holidays", {}).items():
-                    if date_str in dates:
-                        return name
-        except Exception:
-            pass
-
-        # 3. 本地缓存兜底（仅 SGE 独立缓存）
-        cache = self._load_cache()
-        if cache:
-            calendars = cache.get("calendars", {})
-            if str(year) in calendars:
-                holidays = calendars[str(year)].get("holidays", {})
-                for name, dates in holidays.items():
-                    if date_str in dates:
-                        return name
-
-        return None
+        # 2. SGE爬虫数据 / 3. 本地缓存兜底
+        return self._get_date_index(year).get(date_str)
 
 
 # 全局服务实例
@@ -194,6 +287,25 @@ def get_holiday_name_by_date(date_str):
     return get_service().get_holiday_name_by_date(date_str)
 
 
+def prewarm(years=None):
+    """预热交易所休市数据，默认加载当前年份及前后年份"""
+    if years is None:
+        current_year = datetime.now().year
+        years = (current_year - 1, current_year, current_year + 1)
+    get_service().prewarm(years)
+
+
+def invalidate(year=None):
+    """清除交易所日历的记忆结果（休市数据更新后调用）"""
+    get_service().invalidate(year)
+
+
+def clear_sge_cache():
+    """清除进程内的 SGE 休市数据缓存及依赖它的查询结果，下次查询重新获取"""
+    _sge_cached.cache_clear()
+    invalidate()
+
+
 if __name__ == "__main__":
     # 测试
     print("=== 测试交易所日历服务 ===")
@@ -206,13 +318,13 @@ if __name__ == "__main__":
     print(sorted(holidays))
     
     print(f"\n首个交易日:")
-    for name in ["元旦", "春节", "清明节", "劳动节", "端午节", "中秋节", "国庆节"]:
+    for name in ("元旦", "春节", "清明节", "劳动节", "端午节", "中秋节", "国庆节"):
         day = service.get_first_trading_day(name, 2026)
         print(f"  {name}: {day}")
     
     # 测试日期查询
     print(f"\n日期对应的节日:")
-    test_dates = ["2026-02-16", "2026-02-20", "2026-02-24", "2026-10-01"]
+    test_dates = ("2026-02-16", "2026-02-20", "2026-02-24", "2026-10-01")
     for d in test_dates:
         name = service.get_holiday_name_by_date(d)
         print(f"  {d}: {name}")
@@ -7,13 +7,99 @@
 import re
 import json
 import os
+import threading
 import requests
-from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import date, datetime
+from functools import partial
+from itertools import chain
+
+try:
+    from lxml import html as lxml_html
+    LXML_AVAILABLE = True
+except ImportError:
+    lxml_html = None
+    LXML_AVAILABLE = False
 
 from app.config import (
     EXCHANGE_CALENDAR_URL,
     EXCHANGE_CALENDAR_FILE
 )
+from app.utils.fast_json import dumps_bytes
+
+# 日期范围：X月X日（星期X）至X月X日（星期X），兼容“第二段省略月份”：如“2月15日至23日”
+_RANGE_RE = re.compile(r'(\d{1,2})\s*月\s*(\d{1,2})\s*日[^\d]*?(?:至|到|-|—|~)[^\d]*?(?:(\d{1,2})\s*月)?\s*(\d{1,2})\s*日')
+# 单日休市：X月X日休市
+_SINGLE_RE = re.compile(r'(\d{1,2})\s*月\s*(\d{1,2})\s*日(?:（[^）]+）)?\s*休市')
+# 首个交易日：X月X日（星期X）起照常开市
+_FIRST_RE = re.compile(r'(\d{1,2})\s*月\s*(\d{1,2})\s*日[^\d]*?起(?:照常|恢复)?开市')
+# 备用方案：无表格时在正文中暴搜休市区间
+_FALLBACK_RE = re.compile(r'(\d{1,2})月(\d{1,2})日[^\d至]*至[^\d]*(?:(\d{1,2})月)?(\d{1,2})日[^\d]*休市')
+# 页面头部声明的字符集：<meta charset="utf-8"> / content="text/html; charset=gbk"
+_CHARSET_RE = re.compile(rb'charset\s*=\s*["\']?([\w-]+)', re.I)
+
+# 上交所休市安排中的节日名称（按表格顺序）
+_HOLIDAY_NAMES = ('元旦', '春节', '清明节', '劳动节', '端午节', '中秋节', '国庆节')
+# 备用方案：按休市起始月份推断节日名称（2 月需另外判断日期区分春节）
+_MONTH_TO_NAME = {1: '元旦', 4: '清明节', 5: '劳动节', 6: '端午节', 9: '中秋节', 10: '国庆节'}
+# 一次扫描匹配任一节日名称
+_NAME_RE = re.compile('|'.join(map(re.escape, _HOLIDAY_NAMES)))
+
+
+def _with_date_set(data):
+    """
+    确保日历数据带有休市日期 frozenset（all_holiday_dates_set），供成员判断直接使用
+    从缓存文件读取的数据只有排序列表，返回补充了集合的浅拷贝，不修改缓存内容
+    """
+    if "all_holiday_dates_set" in data:
+        return data
+    result = dict(data)
+    result["all_holiday_dates_set"] = frozenset(data.get("all_holiday_dates", ()))
+    return result
+
+
+def _decode_page(content):
+    """按页面头部 1KB 内声明的字符集一次性解码（未声明时按 utf-8），非法字节替换而不是整体重试"""
+    match = _CHARSET_RE.search(content, 0, 1024)
+    encoding = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        return content.decode(encoding, errors='replace')
+    except LookupError:
+        return content.decode('utf-8', errors='replace')
+
+
+def _extract_table_rows(content):
+    """
+    提取页面中至少两列的表格行
+    优先使用 lxml（C 解析器 + XPath 只取候选行），未安装或解析失败时回退到 BeautifulSoup
+
+    返回:
+        tuple(list, callable): ([(首列文本, 首列原始HTML获取函数, 第二列文本), ...], 页面纯文本获取函数)
+    """
+    if LXML_AVAILABLE:
+        try:
+            tree = lxml_html.fromstring(content)
+            rows = []
+            for row in tree.xpath("//tr[td[2]]"):
+                cells = row.xpath("./td")
+                rows.append((
+                    cells[0].text_content().strip(),
+                    partial(lxml_html.tostring, cells[0], encoding='unicode'),
+                    cells[1].text_content().strip(),
+                ))
+            return rows, tree.text_content
+        except Exception as e:
+            print(f"[交易所日历] lxml 解析失败，回退到 bs4: {e}")
+
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+    rows = []
+    for tr in soup.find_all('tr'):
+        cells = tr.find_all('td')
+        if len(cells) >= 2:
+            rows.append((cells[0].get_text(strip=True), cells[0].__str__, cells[1].get_text(strip=True)))
+    return rows, soup.get_text
 
 
 class ExchangeCalendarCrawler:
@@ -23,91 +109,130 @@ class ExchangeCalendarCrawler:
         self.url = EXCHANGE_CALENDAR_URL
         self.base_url = "https://www.sse.com.cn/"
         self.cache_file = EXCHANGE_CALENDAR_FILE
-        self._session = requests.Session()
-        self._ensure_cache_dir()
+        self._session = self._build_session()
+        self._warmed = False       # 首页预热成功后会话已带 cookies，无需重复访问
+        self._result_cache = {}    # crawl_year 的进程内结果: {year: data}
+        # 已解析的缓存文件内容及其修改时间，文件未变化时不重复读取和解析
+        self._cache_mem = None
+        self._cache_mtime = None
+        self._last_written_hash = None  # 上次写入内容的哈希，内容未变化时跳过写盘
+    
+    @staticmethod
+    def _build_session():
+        """创建带连接池和重试的会话，跨调用复用到上交所的 TCP/TLS 连接"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4,
+            max_retries=Retry(total=2, backoff_factor=0.5)
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+        })
+        return session
     
     def _ensure_cache_dir(self):
         """确保缓存目录存在"""
-        cache_dir = os.path.dirname(self.cache_file)
-        if not os.path.exists(cache_dir):
-            os.makedirs(cache_dir)
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
             
     def _warm_up(self):
-        """访问首页建立 Session/Cookies"""
+        """访问首页建立 Session/Cookies（成功一次后跳过）"""
+        if self._warmed:
+            return True
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            }
-            self._session.get(self.base_url, headers=headers, timeout=5)
+            self._session.get(self.base_url, timeout=5)
+            self._warmed = True
             return True
         except:
             return False
     
     def _load_cache(self):
-        """从文件加载缓存"""
-        if not os.path.exists(self.cache_file):
+        """从文件加载缓存（按修改时间复用已解析的内容）"""
+        try:
+            mtime = os.stat(self.cache_file).st_mtime_ns
+        except OSError:
             return None
+        if mtime == self._cache_mtime:
+            return self._cache_mem
         
         try:
             with open(self.cache_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                self._cache_mem = json.load(f)
+            self._cache_mtime = mtime
+            return self._cache_mem
         except Exception as e:
             print(f"[交易所日历] 加载缓存失败: {e}")
             return None
     
-    def _save_cache(self, data):
-        """保存到文件"""
+    def _save_cache(self, data, pretty=False):
+        """保存到文件：默认紧凑格式，与上次写入内容相同时跳过"""
         try:
+            if pretty:
+                blob = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+            else:
+                blob = dumps_bytes(data)
+            blob_hash = hash(blob)
+            if blob_hash == self._last_written_hash:
+                return True
+            
+            # 目录在写入时按需创建，读取路径不需要目录存在
+            self._ensure_cache_dir()
             temp_file = self.cache_file + ".tmp"
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with open(temp_file, 'wb') as f:
+                f.write(blob)
             os.replace(temp_file, self.cache_file)
+            self._last_written_hash = blob_hash
             return True
         except Exception as e:
             print(f"[交易所日历] 保存缓存失败: {e}")
             return False
     
-    def _fetch_page(self):
-        """获取上交所页面内容"""
+    def _fetch_page(self, cache_meta=None):
+        """
+        获取上交所页面内容
+        cache_meta 中带有上次写入缓存时的 ETag / Last-Modified 时发起条件请求，页面未变化时服务器返回 304 且无正文
+
+        返回:
+            tuple: (页面文本, HTTP 状态码, ETag, Last-Modified)，请求失败时均为 None
+        """
         # 预热以获取 cookies
         self._warm_up()
         
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-                "Referer": self.base_url
-            }
+            # 通用请求头已预置在会话上，这里只添加本次请求特有的头
+            headers = {"Referer": self.base_url}
+            if cache_meta:
+                if cache_meta.get("etag"):
+                    headers["If-None-Match"] = cache_meta["etag"]
+                if cache_meta.get("last_modified"):
+                    headers["If-Modified-Since"] = cache_meta["last_modified"]
             response = self._session.get(self.url, headers=headers, timeout=10)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
             
-            # 优先尝试 utf-8，然后尝试 gbk
-            content = response.content
-            try:
-                text = content.decode('utf-8')
-            except UnicodeDecodeError:
-                try:
-                    text = content.decode('gbk')
-                except UnicodeDecodeError:
-                    text = response.text
+            if response.status_code == 304:
+                return None, 304, etag, last_modified
+            
+            text = _decode_page(response.content)
             
             if len(text) < 1000:
                 print(f"[交易所日历] 页面内容异常短 (长度: {len(text)})，可能被拦截")
                 
-            return text
+            return text, response.status_code, etag, last_modified
             
         except Exception as e:
             print(f"[交易所日历] 获取页面失败: {e}")
-            return None
+            return None, None, None, None
     
     def _parse_date_range(self, text, year=2026):
         """解析日期范围文本，返回日期列表"""
         dates = []
         
-        # 匹配格式：X月X日（星期X）至X月X日（星期X）
-        # 兼容“第二段省略月份”：如“2月15日至23日”
-        pattern = r'(\d{1,2})\s*月\s*(\d{1,2})\s*日[^\d]*?(?:至|到|-|—|~)[^\d]*?(?:(\d{1,2})\s*月)?\s*(\d{1,2})\s*日'
-        match = re.search(pattern, text)
+        match = _RANGE_RE.search(text)
         
         if match:
             start_month = int(match.group(1))
@@ -116,23 +241,19 @@ class ExchangeCalendarCrawler:
             end_day = int(match.group(4))
             
             try:
-                start_date = datetime(year, start_month, start_day)
-                end_date = datetime(year, end_month, end_day)
-                
-                current = start_date
-                while current <= end_date:
-                    dates.append(current.strftime("%Y-%m-%d"))
-                    current += timedelta(days=1)
+                # 按序数展开区间，isoformat 直接生成 YYYY-MM-DD，无需逐日 timedelta 累加和 strftime
+                start_ord = date(year, start_month, start_day).toordinal()
+                end_ord = date(year, end_month, end_day).toordinal()
+                dates = [date.fromordinal(o).isoformat() for o in range(start_ord, end_ord + 1)]
             except Exception as e:
                 print(f"[交易所日历] 日期解析错误: {e}")
         else:
             # 尝试匹配单日休市：X月X日休市
-            single_pattern = r'(\d{1,2})\s*月\s*(\d{1,2})\s*日(?:（[^）]+）)?\s*休市'
-            single_match = re.search(single_pattern, text)
+            single_match = _SINGLE_RE.search(text)
             if single_match:
                 sm, sd = int(single_match.group(1)), int(single_match.group(2))
                 try:
-                    dates.append(datetime(year, sm, sd).strftime("%Y-%m-%d"))
+                    dates.append(date(year, sm, sd).isoformat())
                 except:
                     pass
         
@@ -140,9 +261,7 @@ class ExchangeCalendarCrawler:
     
     def _find_first_trading_day(self, text, year=2026):
         """从文本中找到首个交易日"""
-        # 匹配格式：X月X日（星期X）起照常开市
-        pattern = r'(\d{1,2})\s*月\s*(\d{1,2})\s*日[^\d]*?起(?:照常|恢复)?开市'
-        match = re.search(pattern, text)
+        match = _FIRST_RE.search(text)
         
         if match:
             month = int(match.group(1))
@@ -162,54 +281,43 @@ class ExchangeCalendarCrawler:
         
         # 匹配所有包含日期范围的行
         # 格式：X月X日（周X）至X月X日（周X）休市，X月X日（周X）起照常开市
-        holiday_names = ['元旦', '春节', '清明节', '劳动节', '端午节', '中秋节', '国庆节']
-        
         try:
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(content, 'html.parser')
+            rows, get_page_text = _extract_table_rows(content)
             
-            # 找到所有的行
-            for tr in soup.find_all('tr'):
-                cells = tr.find_all('td')
-                if len(cells) >= 2:
-                    td1_text = cells[0].get_text(strip=True)
-                    td2_text = cells[1].get_text(strip=True)
-                    
-                    for name in holiday_names:
-                        # 兼容部分乱码情况，如果在原始 td 的 html 里能找到名字也可以
-                        if name in td1_text or name in str(cells[0]):
-                            # 找到了休市安排说明单元格 td2_text
-                            # 示例：1月1日（星期四）至1月3日（星期六）休市，1月5日（星期一）起照常开市
-                            
-                            # 解析日期范围
-                            dates = self._parse_date_range(td2_text, year)
-                            if dates:
-                                holidays[name] = dates
-                            
-                            # 查找首个交易日
-                            first_day = self._find_first_trading_day(td2_text, year)
-                            if first_day:
-                                first_trading_days[name] = first_day
-                            break
+            # 遍历所有的行
+            for td1_text, get_td1_html, td2_text in rows:
+                match = _NAME_RE.search(td1_text)
+                if not match:
+                    # 兼容部分乱码情况，如果在原始 td 的 html 里能找到名字也可以
+                    match = _NAME_RE.search(get_td1_html())
+                    if not match:
+                        continue
+                name = match.group(0)
+                # 找到了休市安排说明单元格 td2_text
+                # 示例：1月1日（星期四）至1月3日（星期六）休市，1月5日（星期一）起照常开市
+                
+                # 解析日期范围
+                dates = self._parse_date_range(td2_text, year)
+                if dates:
+                    holidays[name] = dates
+                
+                # 查找首个交易日
+                first_day = self._find_first_trading_day(td2_text, year)
+                if first_day:
+                    first_trading_days[name] = first_day
                             
             # 备用方案（如果基于表格解析失败，或者上交所更换了格式，回退到无标签的正文暴搜）
             if not holidays:
-                clean_text = soup.get_text()
-                pattern = r'(\d{1,2})月(\d{1,2})日[^\d至]*至[^\d]*(?:(\d{1,2})月)?(\d{1,2})日[^\d]*休市'
-                for match in re.finditer(pattern, clean_text):
+                clean_text = get_page_text()
+                for match in _FALLBACK_RE.finditer(clean_text):
                     try:
                         start_month = int(match.group(1))
                         start_day = int(match.group(2))
                         end_month = int(match.group(3)) if match.group(3) else start_month
                         
-                        if start_month == 1: name = '元旦'
-                        elif start_month == 2 and start_day >= 14: name = '春节'
-                        elif start_month == 4: name = '清明节'
-                        elif start_month == 5: name = '劳动节'
-                        elif start_month == 6: name = '端午节'
-                        elif start_month == 9: name = '中秋节'
-                        elif start_month == 10: name = '国庆节'
-                        else: continue
+                        name = _MONTH_TO_NAME.get(start_month) or ('春节' if start_month == 2 and start_day >= 14 else None)
+                        if name is None:
+                            continue
                         
                         if name not in holidays:
                             dates = self._parse_date_range(match.group(0), year)
@@ -218,22 +326,18 @@ class ExchangeCalendarCrawler:
                     except:
                         continue
         except Exception as e:
-            print(f"[交易所日历] bs4 解析异常: {e}")
+            print(f"[交易所日历] 页面解析异常: {e}")
         
         if not holidays:
             print(f"[交易所日历] 未能解析出任何节假日")
             return None
         
-        # 生成所有休市日期
-        all_dates = set()
-        for dates in holidays.values():
-            all_dates.update(dates)
-        
+        # 生成所有休市日期（排序列表仅在写入缓存文件时生成）
         return {
             "year": year,
             "holidays": holidays,
             "first_trading_days": first_trading_days,
-            "all_holiday_dates": sorted(all_dates)
+            "all_holiday_dates_set": frozenset(chain.from_iterable(holidays.values()))
         }
     
     def crawl_year(self, year=None):
@@ -241,27 +345,43 @@ class ExchangeCalendarCrawler:
         if year is None:
             year = datetime.now().year
         
-        # 优先从缓存加载，避免频繁请求导致的挂起或封禁
-        cached = self._load_from_cache(year)
-        if cached:
-            return cached
-            
-        # 尝试获取页面
-        content = self._fetch_page()
-        if not content:
-            print(f"[交易所日历] 爬取失败，且无本地缓存")
-            return None
+        result = self._result_cache.get(year)
+        if result is not None:
+            return result
         
-        # 解析内容
-        result = self.parse_year_from_content(content, year)
+        # 优先从缓存加载，避免频繁请求导致的挂起或封禁
+        result = self._load_from_cache(year)
         if not result:
-            return self._load_from_cache(year)
-        
-        # 更新缓存
-        self._update_cache(result)
+            # 尝试获取页面（带上次解析成功时的校验信息）
+            cache_meta = (self._load_cache() or {}).get("metadata")
+            content, status, etag, last_modified = self._fetch_page(cache_meta)
+            if status == 304:
+                # 页面自上次解析后未变化，其中没有该年份的安排，无需重复下载解析
+                print(f"[交易所日历] 页面未更新，暂无 {year} 年数据")
+                return None
+            if not content:
+                print(f"[交易所日历] 爬取失败，且无本地缓存")
+                return None
+            
+            # 解析内容
+            result = self.parse_year_from_content(content, year)
+            if result:
+                # 更新缓存
+                self._update_cache(result, etag, last_modified)
+            else:
+                result = self._load_from_cache(year)
+                if not result:
+                    return None
         
+        result = _with_date_set(result)
+        self._remember(year, result)
         return result
     
+    def _remember(self, year, data):
+        """记住本年份的结果；借用相邻年份的兜底数据不记忆，下次调用仍会尝试获取"""
+        if data.get("year") == year:
+            self._result_cache[year] = data
+    
     def _load_from_cache(self, year):
         """从缓存加载"""
         cache = self._load_cache()
@@ -280,9 +400,10 @@ class ExchangeCalendarCrawler:
         
         return None
     
-    def _update_cache(self, new_data):
-        """更新缓存"""
+    def _update_cache(self, new_data, etag=None, last_modified=None):
+        """更新缓存（同时记录页面的 ETag / Last-Modified，供下次条件请求使用）"""
         year = new_data.get("year")
+        self._result_cache.pop(year, None)
         
         cache = self._load_cache() or {
             "metadata": {
@@ -294,18 +415,28 @@ class ExchangeCalendarCrawler:
             "calendars": {}
         }
         
-        cache["calendars"][str(year)] = new_data
+        # 集合不写入文件，写入前一次性生成排序列表
+        all_dates = new_data["all_holiday_dates_set"]
+        stored = {k: v for k, v in new_data.items() if k != "all_holiday_dates_set"}
+        stored["all_holiday_dates"] = sorted(all_dates)
+        
+        if cache["calendars"].get(str(year)) == stored:
+            return  # 数据未变化，不重写文件
+        
+        cache["calendars"][str(year)] = stored
         cache["metadata"]["last_updated"] = datetime.now().isoformat()
+        cache["metadata"]["etag"] = etag
+        cache["metadata"]["last_modified"] = last_modified
         
         self._save_cache(cache)
-        print(f"[交易所日历] 已更新 {year} 年数据，共 {len(new_data.get('all_holiday_dates', []))} 天休市")
+        print(f"[交易所日历] 已更新 {year} 年数据，共 {len(all_dates)} 天休市")
     
     def get_holidays(self, year=None):
         """获取指定年份的休市日期集合"""
         data = self.crawl_year(year)
         if data:
-            return set(data.get("all_holiday_dates", []))
-        return set()
+            return data["all_holiday_dates_set"]
+        return frozenset()
     
     def get_first_trading_day(self, holiday_name, year=None):
         """获取指定节假日后的首个交易日"""
@@ -318,7 +449,7 @@ class ExchangeCalendarCrawler:
         """获取指定日期所在的节假日名称"""
         if year is None:
             try:
-                year = int(date_str.split('-')[0])
+                year = int(date_str[:4])
             except:
                 year = datetime.now().year
         
@@ -331,13 +462,16 @@ class ExchangeCalendarCrawler:
         return None
 # 全局爬虫实例
 _crawler = None
+_crawler_lock = threading.Lock()
 
 
 def get_crawler():
-    """获取爬虫单例"""
+    """获取爬虫单例（双重检查加锁，并发首次调用时只创建一个实例和会话）"""
     global _crawler
     if _crawler is None:
-        _crawler = ExchangeCalendarCrawler()
+        with _crawler_lock:
+            if _crawler is None:
+                _crawler = ExchangeCalendarCrawler()
     return _crawler
 
 
@@ -351,12 +485,12 @@ def fetch_exchange_holidays_with_status(year=None):
     获取交易所休市日期并返回数据可用状态
 
     返回:
-        tuple(set, bool): (休市日期集合, 是否成功获取到可用日历)
+        tuple(frozenset, bool): (休市日期集合, 是否成功获取到可用日历)
     """
     data = get_crawler().crawl_year(year)
     if data:
-        return set(data.get("all_holiday_dates", [])), True
-    return set(), False
+        return data["all_holiday_dates_set"], True
+    return frozenset(), False
 
 
 def get_holiday_name_by_date(date_str, year=None):
@@ -393,8 +527,8 @@ if __name__ == "__main__":
         for name, dates in result.get("holidays", {}).items():
             print(f"  {name}: {dates}")
         
-        print(f"\n所有休市日期 ({len(result['all_holiday_dates'])}天):")
-        print(result["all_holiday_dates"])
+        print(f"\n所有休市日期 ({len(result['all_holiday_dates_set'])}天):")
+        print(sorted(result["all_holiday_dates_set"]))
         
         print(f"\n首个交易日:")
         for name, date in result.get("first_trading_days", {}).items():
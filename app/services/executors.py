@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+共享线程池模块
+所有请求共用同一个抓取线程池，避免每次请求都创建/销毁线程
+"""
+
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import MAX_FETCH_WORKERS
+
+
+# 基金行情等上游数据抓取共享线程池
+FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS, thread_name_prefix='fund-fetch')
+
+# 进程退出时关闭线程池（不等待未开始的任务）
+atexit.register(FETCH_EXECUTOR.shutdown, wait=False)
@@ -4,55 +4,117 @@
 包含基金估值、持仓股抓取和缓存刷新逻辑
 """
 
+import logging
 import re
 import time
-import json
-import requests
 import threading
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, as_completed, TimeoutError as FuturesTimeoutError
+
+import requests
 
 from app.config import (
-    CACHE_TTL_SECONDS, FUND_STALE_TTL_SECONDS,
+    HEADERS, CACHE_TTL_SECONDS, FUND_STALE_TTL_SECONDS,
     HOLDINGS_CACHE_TTL_SECONDS, HOLDINGS_STALE_TTL_SECONDS,
-    MAX_FETCH_WORKERS, PORTFOLIO_CACHE_TTL
+    PORTFOLIO_CACHE_TTL, PORTFOLIO_STALE_TTL, SINA_QUOTE_CACHE_TTL,
+    FUND_INFLIGHT_WAIT_SECONDS, FUND_FETCH_DEADLINE_SECONDS, FUND_NEGATIVE_CACHE_TTL
 )
 from app.models.state import (
-    lock, fund_cache, fund_portfolios, holdings_cache
+    cache_lock, holdings_lock, watchlist_lock, fund_portfolios_lock,
+    fund_refresh_gate, holdings_refresh_gate,
+    fund_cache, fund_stale, fund_portfolios, holdings_cache, fund_watchlist, fund_holdings
 )
-import app.models.state as state
-from app.services.persistence import save_data
+from app.services.persistence import save_data_async
+from app.services.executors import FETCH_EXECUTOR
+from app.services.http_client import SESSION
+from app.utils.fast_json import loads
+from app.utils.time_cache import now_str
+
+_log = logging.getLogger(__name__)
 
+# 各上游接口的请求头（模块级常量，每次请求直接复用）
+_UA_CHROME = HEADERS["User-Agent"]
+_HDR_EASTMONEY_GZ = {"User-Agent": _UA_CHROME, "Referer": "http://fund.eastmoney.com/"}
+_HDR_EASTMONEY_F10 = {"User-Agent": _UA_CHROME, "Referer": "http://fundf10.eastmoney.com/"}
+_HDR_SINA_HQ = {"Referer": "https://finance.sina.com.cn", "User-Agent": "Mozilla/5.0"}
+
+# 进行中的基金抓取: {key: Future}，同一基金的并发请求合并为一次上游调用
+# key 为基金代码（多源抓取）或 ("em", 基金代码)（仅天天基金单只估值）
+_inflight = {}
+_inflight_lock = threading.Lock()
+# 已提交到线程池、尚未完成的后台重新验证（同样由 _inflight_lock 保护）
+_revalidating = set()
+# 正在后台刷新重仓股构成的基金代码（同样由 _inflight_lock 保护）
+_portfolio_refreshing = set()
+
+# 新浪行情批量响应中的单条报价: var hq_str_<sina_code>="...";
+_RE_HQ_ALL = re.compile(r'var hq_str_([^=]+)="([^"]*)";')
+# 新浪单条行情中引号内的数据
+_RE_SINA_QUOTE = re.compile(r'"([^"]+)"')
+# 旧版持仓接口 pingzhongdata 中的重仓股代码列表（响应体较大，按字节匹配，免去整段解码）
+_RE_STOCK_CODES = re.compile(rb'stockCodes=\[(.*?)\]')
+# 持仓档案页面：无持仓披露提示 / content:"..." 内嵌 HTML / 报告期 / 重仓股表格行 (code, name, weight)
+_RE_NO_HOLDINGS = re.compile(r'暂无持仓|暂无数据|无重仓股|未披露')
+_RE_CONTENT = re.compile(r'content\s*:\s*"(.*)"', re.S)
+# content 字符串中的转义空白 (\\r \\n \\t)，一次替换全部去除
+_RE_ESCAPED_WS = re.compile(r'\\[rnt]')
+_RE_PERIOD = re.compile(r'(\d{4})年(\d)季度')
+_RE_HOLDINGS = re.compile(
+    r"<td[^>]*>\s*<a[^>]*>(\d{5,6})</a>\s*</td>\s*<td[^>]*>\s*<a[^>]*>([^<]+)</a>\s*</td>.*?<td[^>]*>(\d+\.?\d*)%\s*</td>",
+    re.DOTALL
+)
+# 天天基金 jsonpgz 估值响应的固定字段顺序，按字节直接提取，字段顺序变化时回退到 JSON 解析
+_RE_GZ_FIELDS = re.compile(
+    rb'"fundcode":"(\d+)","name":"([^"]+)","jzrq":"([^"]*)","dwjz":"([^"]*)",'
+    rb'"gsz":"([^"]*)","gszzl":"([^"]*)","gztime":"([^"]*)"'
+)
+# 天天基金对不存在的基金代码返回的空估值响应: jsonpgz();
+_RE_GZ_EMPTY = re.compile(rb'\s*jsonpgz\(\s*\);?\s*')
+# 新浪基金净值批量请求每次最多包含的基金数
+_SINA_FUND_BATCH_SIZE = 40
 
-def fetch_fund_from_eastmoney(fund_code):
+# 失败负缓存: {fund_code: failed_mono}，所有数据源都取不到的基金（如已清盘）短时间内直接跳过
+_NEG_CACHE = {}
+
+# 重仓股行情短时缓存: {sina_code: (name, price, prev_close, fetched_mono)}
+# 多只基金共享重仓股时（如指数基金）避免重复请求
+_SINA_QUOTE_CACHE = {}
+
+
+def fetch_fund_from_eastmoney(fund_code, now_ts=None):
     """
     从天天基金获取估值数据 (主源)
     API: http://fundgz.1234567.com.cn/js/{code}.js
     返回格式: jsonpgz({"fundcode":"...","name":"...","jzrq":"...","dwjz":"...","gsz":"...","gszzl":"...","gztime":"..."});
     """
     try:
-        url = f"http://fundgz.1234567.com.cn/js/{fund_code}.js?rt={int(time.time()*1000)}"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Referer": "http://fund.eastmoney.com/"
-        }
-        response = requests.get(url, headers=headers, timeout=3)
-        text = response.text
+        url = f"http://fundgz.1234567.com.cn/js/{fund_code}.js"
+        response = SESSION.get(url, headers=_HDR_EASTMONEY_GZ, timeout=3)
+        body = response.content
         
-        # 提取 jsonpgz(...) 中的 JSON 内容
-        match = re.search(r'jsonpgz\((.*)\);', text)
+        # 按固定字段顺序一次正则提取，省去 JSON 解析与中间 dict
+        match = _RE_GZ_FIELDS.search(body)
         if match:
-            data = json.loads(match.group(1))
-            return {
-                "code": data['fundcode'],
-                "name": data['name'],
-                "price": float(data['gsz']),      # 估算净值
-                "dwjz": float(data['dwjz']) if data.get('dwjz') and str(data['dwjz']).strip() else 0,      # 昨日单位净值
-                "change": float(data['gszzl']),   # 估算涨跌幅 (%)
-                "time_str": data['gztime'],       # 估值时间
-                "timestamp": datetime.now().timestamp(),
-                "source": "天天基金"
-            }
+            code, name, _jzrq, dwjz, gsz, gszzl, gztime = match.groups()
+            code, name, gztime = code.decode(), name.decode('utf-8'), gztime.decode()
+        else:
+            # 提取 jsonpgz(...) 中的 JSON 内容（直接按字节截取，省去整段文本解码）
+            start = body.find(b'jsonpgz(')
+            end = body.rfind(b');')
+            if start < 0 or end <= start:
+                return None
+            data = loads(body[start + len(b'jsonpgz('):end])
+            code, name, gztime = data['fundcode'], data['name'], data['gztime']
+            dwjz, gsz, gszzl = str(data.get('dwjz') or ''), data['gsz'], data['gszzl']
+        return {
+            "code": code,
+            "name": name,
+            "price": float(gsz),      # 估算净值
+            "dwjz": float(dwjz) if dwjz.strip() else 0,      # 昨日单位净值
+            "change": float(gszzl),   # 估算涨跌幅 (%)
+            "time_str": gztime,       # 估值时间
+            "timestamp": now_ts or time.time(),
+            "source": "天天基金"
+        }
     except Exception as e:
         # print(f"[天天基金] 获取 {fund_code} 失败: {e}") # 仅调试时开启
         pass
@@ -66,40 +128,234 @@ def fetch_fund_from_sina(fund_code):
     """
     try:
         url = f"http://hq.sinajs.cn/list=fu_{fund_code}"
-        headers = {
-            "Referer": "https://finance.sina.com.cn",
-            "User-Agent": "Mozilla/5.0"
-        }
-        response = requests.get(url, headers=headers, timeout=3)
-        # 尝试检测编码
-        encoding = 'gbk'
-        if 'charset' in response.headers.get('Content-Type', ''):
-             encoding = response.headers.get('Content-Type', '').split('charset=')[-1]
-        response.encoding = encoding
-        
-        text = response.text
-        match = re.search(r'"([^"]+)"', text)
+        response = SESSION.get(url, headers=_HDR_SINA_HQ, timeout=3)
+        text = _sina_text(response)
+        match = _RE_SINA_QUOTE.search(text)
         if match:
-            parts = match.group(1).split(',')
-            if len(parts) > 1:
-                # 新浪接口返回: 名称,净值,累计净值,日期
-                current_price = float(parts[1]) if parts[1] else 0
-                return {
-                    "code": fund_code,
-                    "name": parts[0],
-                    "price": current_price,
-                    "dwjz": current_price,  # 新浪接口无昨日净值，使用当前净值作为近似
-                    "change": 0,  # 新浪此接口可能无实时估值涨幅
-                    "time_str": parts[3] if len(parts) > 3 else datetime.now().strftime("%Y-%m-%d"),
-                    "timestamp": datetime.now().timestamp(),
-                    "source": "新浪财经(仅净值)"
-                }
+            return _parse_sina_fund(fund_code, match.group(1))
     except Exception as e:
         pass
     return None
 
 
+def _sina_text(response):
+    """按响应头声明的字符集（默认 gbk）解码新浪行情响应"""
+    encoding = 'gbk'
+    content_type = response.headers.get('Content-Type', '')
+    if 'charset' in content_type:
+        encoding = content_type.split('charset=')[-1]
+    # 直接按已知字符集解码一次，跳过 response.text 的编码探测
+    return response.content.decode(encoding, 'ignore')
+
+
+def _parse_sina_fund(fund_code, data_str, now_ts=None):
+    """
+    解析新浪基金净值行情（名称,净值,累计净值,日期），数据不完整时返回 None
+    now_ts 为批量解析时统一的抓取时间，省去逐条取系统时间
+    """
+    parts = data_str.split(',')
+    if len(parts) <= 1:
+        return None
+    current_price = float(parts[1]) if parts[1] else 0
+    return {
+        "code": fund_code,
+        "name": parts[0],
+        "price": current_price,
+        "dwjz": current_price,  # 新浪接口无昨日净值，使用当前净值作为近似
+        "change": 0,  # 新浪此接口可能无实时估值涨幅
+        "time_str": parts[3] if len(parts) > 3 else time.strftime("%Y-%m-%d"),
+        "timestamp": now_ts or time.time(),
+        "source": "新浪财经(仅净值)"
+    }
+
+
+def fetch_funds_from_sina_batch(codes):
+    """
+    从新浪财经批量获取基金净值 (备用源)
+    API: http://hq.sinajs.cn/list=fu_code1,fu_code2,...（每次最多 _SINA_FUND_BATCH_SIZE 只）
+    返回: {fund_code: 基金数据}，未获取到的基金不在结果中
+    """
+    results = {}
+    for i in range(0, len(codes), _SINA_FUND_BATCH_SIZE):
+        group = codes[i:i + _SINA_FUND_BATCH_SIZE]
+        try:
+            url = "http://hq.sinajs.cn/list=" + ",".join(f"fu_{code}" for code in group)
+            response = SESSION.get(url, headers=_HDR_SINA_HQ, timeout=3)
+            now_ts = time.time()
+            # 单次扫描响应文本，解析本组所有基金
+            for match in _RE_HQ_ALL.finditer(_sina_text(response)):
+                sina_code = match.group(1)
+                if not sina_code.startswith("fu_"):
+                    continue
+                try:
+                    data = _parse_sina_fund(sina_code[3:], match.group(2), now_ts)
+                except ValueError:
+                    continue
+                if data:
+                    results[data["code"]] = data
+        except Exception as e:
+            print(f"[新浪财经] 批量获取基金净值失败: {e}")
+    return results
+
+
+def _to_float(value):
+    """将接口返回的数值字符串转为 float，空值或 "--" 返回 None"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch_funds_batch(codes):
+    """
+    从天天基金批量接口一次获取多只基金估值
+    API: https://fundmobapi.eastmoney.com/FundMNewApi/FundMNFInfo?Fcodes=code1,code2,...
+    返回: {fund_code: 基金数据}，无估值（如 QDII）或解析失败的基金不在结果中
+    """
+    results = {}
+    if not codes:
+        return results
+    try:
+        url = "https://fundmobapi.eastmoney.com/FundMNewApi/FundMNFInfo"
+        params = {
+            "pageIndex": 1,
+            "pageSize": len(codes),
+            "plat": "Android",
+            "appType": "ttjj",
+            "product": "EFund",
+            "Version": 1,
+            "deviceid": "gold-monitor",
+            "Fcodes": ",".join(codes)
+        }
+        response = SESSION.get(url, params=params, headers=_HDR_EASTMONEY_GZ, timeout=5)
+        data = loads(response.content)
+        now_ts = time.time()
+        for item in data.get('Datas') or []:
+            code = item.get('FCODE')
+            price = _to_float(item.get('GSZ'))
+            change = _to_float(item.get('GSZZL'))
+            if not code or price is None or change is None:
+                continue
+            results[code] = {
+                "code": code,
+                "name": item.get('SHORTNAME', ''),
+                "price": price,                               # 估算净值
+                "dwjz": _to_float(item.get('NAV')) or 0,      # 昨日单位净值
+                "change": change,                             # 估算涨跌幅 (%)
+                "time_str": item.get('GZTIME') or "--",       # 估值时间
+                "timestamp": now_ts,
+                "source": "天天基金"
+            }
+    except Exception as e:
+        print(f"[天天基金] 批量获取基金估值失败: {e}")
+    return results
+
+
+def _cache_late_result(fund_code):
+    """生成回调：超过等待期限才完成的抓取结果仍写入缓存，供下次请求使用"""
+    def _callback(future):
+        try:
+            data = future.result()
+        except Exception:
+            return
+        if data:
+            cache_fund_results([fund_code], [data])
+    return _callback
+
+
+def _recently_failed(fund_code, now_mono):
+    """基金是否在负缓存有效期内"""
+    failed_at = _NEG_CACHE.get(fund_code)
+    return failed_at is not None and now_mono - failed_at < FUND_NEGATIVE_CACHE_TTL
+
+
+def _record_outcome(fund_code, data, now_mono):
+    """成功时清除负缓存，失败时记录失败时间"""
+    if data:
+        _NEG_CACHE.pop(fund_code, None)
+    else:
+        _NEG_CACHE[fund_code] = now_mono
+
+
+def fetch_funds_data(codes, deadline=FUND_FETCH_DEADLINE_SECONDS):
+    """
+    批量获取多只基金数据，返回与 codes 顺序一致的列表（失败项为 None）
+    1. 天天基金批量接口一次取回大部分估值
+    2. 缺失的基金逐只请求天天基金单只估值，最多等待 deadline 秒，个别上游慢时不拖累整个响应
+       （超时项为 None，由调用方使用过期缓存；迟到的结果仍写入缓存）
+    3. 单只估值也失败的基金合并为一次新浪批量请求，取最新净值兜底
+    """
+    now_mono = time.monotonic()
+    batch = fetch_funds_batch(codes)
+    # 负缓存有效期内的基金不再逐只回退，避免每轮刷新都为失效代码等待上游超时
+    missing = [code for code in codes if code not in batch and not _recently_failed(code, now_mono)]
+    if missing:
+        failed = []
+        future_to_code = {FETCH_EXECUTOR.submit(_fetch_fund_em, code): code for code in missing}
+        try:
+            for future in as_completed(future_to_code, timeout=deadline):
+                data = future.result()
+                if data:
+                    batch[future_to_code[future]] = data
+                else:
+                    failed.append(future_to_code[future])
+        except FuturesTimeoutError:
+            for future, code in future_to_code.items():
+                if not future.done():
+                    future.add_done_callback(_cache_late_result(code))
+        if failed:
+            batch.update(fetch_funds_from_sina_batch(failed))
+            for code in failed:
+                _record_outcome(code, batch.get(code), now_mono)
+    for code in batch:
+        _NEG_CACHE.pop(code, None)
+    return [batch.get(code) for code in codes]
+
+
+def _single_flight(key, func, *args):
+    """
+    单飞合并：同一 key 已有调用在进行时直接等待其结果，
+    避免缓存过期瞬间的并发请求重复打到上游
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _inflight[key] = future
+
+    if not is_owner:
+        try:
+            return future.result(timeout=FUND_INFLIGHT_WAIT_SECONDS)
+        except Exception:
+            return None
+
+    data = None
+    try:
+        data = func(*args)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        future.set_result(data)
+    return data
+
+
 def fetch_fund_data(fund_code):
+    """多源获取基金数据（单飞合并，近期各源均失败的基金直接返回 None）"""
+    now_mono = time.monotonic()
+    if _recently_failed(fund_code, now_mono):
+        return None
+    data = _single_flight(fund_code, _fetch_fund_data_uncached, fund_code)
+    _record_outcome(fund_code, data, now_mono)
+    return data
+
+
+def _fetch_fund_em(fund_code):
+    """仅从天天基金获取单只基金估值（单飞合并），新浪兜底由调用方批量完成"""
+    return _single_flight(("em", fund_code), fetch_fund_from_eastmoney, fund_code)
+
+
+def _fetch_fund_data_uncached(fund_code):
     """多源获取基金数据"""
     # 1. 优先天天基金 (数据最全，含实时估值)
     data = fetch_fund_from_eastmoney(fund_code)
@@ -114,50 +370,173 @@ def fetch_fund_data(fund_code):
     return None
 
 
+def cache_fund_results(codes, data_list):
+    """
+    将抓取结果写入基金缓存（新鲜缓存和过期兜底缓存各一份）
+    返回写入前的兜底数据 {code: data}，用于抓取失败时回退
+    """
+    # 待写入的数据在锁外整理好，临界区内只做快照和批量写入
+    new_entries = {code: data for code, data in zip(codes, data_list) if data}
+    with cache_lock:
+        fallback = {code: fund_stale.get(code) for code in codes}
+        fund_cache.update(new_entries)
+        fund_stale.update(new_entries)
+    return fallback
+
+
+def _revalidate_fund(fund_code):
+    """后台重新验证单只基金：抓取成功则更新缓存，失败保留原有过期数据"""
+    try:
+        data = fetch_fund_data(fund_code)
+        if data:
+            cache_fund_results([fund_code], [data])
+    finally:
+        with _inflight_lock:
+            _revalidating.discard(fund_code)
+
+
+def revalidate_funds_async(codes):
+    """
+    stale-while-revalidate：接口先返回过期缓存，再把刷新提交到共享线程池
+    已在刷新或抓取中的基金不重复提交
+    """
+    with _inflight_lock:
+        pending = [code for code in codes if code not in _revalidating and code not in _inflight]
+        _revalidating.update(pending)
+    for code in pending:
+        FETCH_EXECUTOR.submit(_revalidate_fund, code)
+
+
+def _fund_code_missing(fund_code):
+    """
+    判断基金代码是否确实不存在：天天基金和新浪都返回空数据时才认定
+    网络错误、超时、非 200 响应等无法判断的情况一律返回 False
+    """
+    try:
+        response = SESSION.get(f"http://fundgz.1234567.com.cn/js/{fund_code}.js",
+                               headers=_HDR_EASTMONEY_GZ, timeout=3)
+        if response.status_code != 200 or not _RE_GZ_EMPTY.fullmatch(response.content):
+            return False
+        # 货币基金等在天天基金也没有估值，再确认新浪同样没有该代码
+        response = SESSION.get(f"http://hq.sinajs.cn/list=fu_{fund_code}",
+                               headers=_HDR_SINA_HQ, timeout=3)
+        if response.status_code != 200:
+            return False
+        match = _RE_HQ_ALL.search(_sina_text(response))
+        return match is not None and not match.group(2).strip()
+    except requests.RequestException:
+        return False
+
+
+def bootstrap_new_fund(fund_code):
+    """
+    后台校验新加入的自选基金（在共享线程池中执行）
+    抓取成功则写入缓存；上游明确返回代码不存在时才从自选列表中移除占位，
+    网络异常等临时失败保留占位，由后续轮询继续重试
+    """
+    # 不走失败负缓存：刚失败过又重新加入的基金也要真实请求一次上游
+    now_mono = time.monotonic()
+    data = _single_flight(fund_code, _fetch_fund_data_uncached, fund_code)
+    _record_outcome(fund_code, data, now_mono)
+    if data:
+        cache_fund_results([fund_code], [data])
+        return
+    
+    if not _fund_code_missing(fund_code):
+        print(f"[自选基金] 暂时无法获取 {fund_code} 的数据，保留在自选列表中")
+        return
+    
+    with watchlist_lock:
+        fund_watchlist.pop(fund_code, None)
+    print(f"[自选基金] 基金代码 {fund_code} 不存在，已从自选列表移除")
+    save_data_async()
+
+
+def resolve_holding_name(fund_code):
+    """
+    后台补全持仓的基金名称（在共享线程池中执行）
+    新增持仓先以占位名称保存，抓取到基金数据后更新名称并使持仓汇总缓存失效
+    """
+    data = fetch_fund_data(fund_code)
+    if not data:
+        return
+    cache_fund_results([fund_code], [data])
+    
+    with holdings_lock:
+        holding = fund_holdings.get(fund_code)
+        if not holding or holding.get('name') == data['name']:
+            return
+        holding['name'] = data['name']
+        holdings_cache["response"] = None
+        holdings_cache["timestamp"] = 0
+        holdings_cache["key"] = None
+    save_data_async()
+
+
 def refresh_fund_cache_async(codes):
     """后台刷新基金缓存，避免阻塞接口"""
     if not codes:
         return
     
-    with lock:
-        if state.fund_refreshing:
-            return
-        state.fund_refreshing = True
+    # 已有刷新在进行时直接返回
+    if not fund_refresh_gate.acquire(blocking=False):
+        return
 
     def _worker():
         try:
-            with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
-                fetched_list = list(executor.map(fetch_fund_data, codes))
-            with lock:
-                for i, data in enumerate(fetched_list):
-                    if data:
-                        fund_cache[codes[i]] = data
+            # 批量接口一次请求取回全部估值，仅缺失项逐只回退，不再为每只基金占用一个线程
+            fetched_list = fetch_funds_data(codes)
+            cache_fund_results(codes, fetched_list)
         finally:
-            with lock:
-                state.fund_refreshing = False
+            fund_refresh_gate.release()
+
+    # 复用共享线程池，不再每次刷新都创建线程；内部的逐只抓取等待受截止时间约束，不会长期占用工作线程
+    try:
+        FETCH_EXECUTOR.submit(_worker)
+    except RuntimeError:
+        # 解释器退出时线程池已关闭
+        fund_refresh_gate.release()
+
+
+def _r2(x):
+    """四舍五入到 2 位小数（整数运算实现，比内置 round 的十进制转换更快，用于即将序列化的展示数值）"""
+    return int(x * 100 + (0.5 if x >= 0 else -0.5)) / 100.0
 
-    threading.Thread(target=_worker, daemon=True).start()
+
+def _r4(x):
+    """四舍五入到 4 位小数，同 _r2"""
+    return int(x * 10000 + (0.5 if x >= 0 else -0.5)) / 10000.0
 
 
 def build_holdings_response(holdings, fund_data_list, cached_map):
-    """合并持仓与基金数据，计算盈亏"""
+    """合并持仓与基金数据，计算盈亏（单次遍历同时累计汇总值）"""
     results = []
     total_cost = 0
     total_value = 0
+    total_today_profit = 0
+    latest_update_time = ""
 
-    for i, holding in enumerate(holdings):
-        fund_data = fund_data_list[i] or cached_map.get(holding['code'])
+    for holding, fresh_data in zip(holdings, fund_data_list):
+        code = holding['code']
+        fund_data = fresh_data or cached_map.get(code)
 
         cost_price = holding.get('cost_price', 0)
         shares = holding.get('shares', 0)
         cost = cost_price * shares
         total_cost += cost
 
-        # 安全获取数值，确保不会是 None（dict.get 在值为 None 时不会返回默认值）
-        current_price = (fund_data.get('price') or 0) if fund_data else 0
-        change = (fund_data.get('change') or 0) if fund_data else 0
-        time_str = fund_data.get('time_str', '--') if fund_data else '--'
-        source = fund_data.get('source', '--') if fund_data else '--'
+        if fund_data:
+            # 安全获取数值，确保不会是 None（dict.get 在值为 None 时不会返回默认值）
+            current_price = fund_data.get('price') or 0
+            change = fund_data.get('change') or 0
+            dwjz = fund_data.get('dwjz') or 0
+            time_str = fund_data.get('time_str', '--')
+            source = fund_data.get('source', '--')
+            name = fund_data['name']
+        else:
+            current_price = change = dwjz = 0
+            time_str = source = '--'
+            name = holding.get('name', f'基金{code}')
 
         # 确保数值类型
         try:
@@ -166,45 +545,47 @@ def build_holdings_response(holdings, fund_data_list, cached_map):
         except (TypeError, ValueError):
             current_price = 0
             change = 0
+        try:
+            dwjz = float(dwjz)
+        except (TypeError, ValueError):
+            dwjz = 0
 
-        market_value = current_price * shares if current_price > 0 else 0
+        has_price = current_price > 0
+        market_value = current_price * shares if has_price else 0
         total_value += market_value
 
-        profit_amount = market_value - cost if current_price > 0 else 0
-        profit_rate = ((current_price - cost_price) / cost_price * 100) if cost_price > 0 and current_price > 0 else 0
+        profit_amount = market_value - cost if has_price else 0
+        profit_rate = ((current_price - cost_price) / cost_price * 100) if cost_price > 0 and has_price else 0
 
         # 计算今日预估盈亏: (当前估值 - 昨日净值) * 持份额
-        dwjz = (fund_data.get('dwjz') or 0) if fund_data else 0
-        try:
-            dwjz = float(dwjz)
-        except (TypeError, ValueError):
-            dwjz = 0
-        
         # 如果 dwjz 不存在但有 change (涨跌幅)，尝试倒推: previous = current / (1 + change/100)
         # 注意: 这种倒推在精确度上可能略有偏差，但作为兜底逻辑可用
-        if dwjz <= 0 and current_price > 0 and change != 0:
+        if dwjz <= 0 and has_price and change != 0:
             try:
-                prev_price = current_price / (1 + change / 100)
-                dwjz = prev_price
-            except (ZeroDivisionError, TypeError, ValueError):
+                dwjz = current_price / (1 + change / 100)
+            except ZeroDivisionError:
                 dwjz = 0
 
-        today_profit = 0
-        if dwjz > 0 and current_price > 0:
-            today_profit = (current_price - dwjz) * shares
+        today_profit = _r2((current_price - dwjz) * shares) if dwjz > 0 and has_price else 0
+        if fund_data is not None:
+            total_today_profit += today_profit
+
+        # 记录最新的数据更新时间
+        if time_str and time_str != '--' and time_str > latest_update_time:
+            latest_update_time = time_str
 
         results.append({
-            "code": holding['code'],
-            "name": fund_data['name'] if fund_data else holding.get('name', f'基金{holding["code"]}'),
-            "cost_price": round(cost_price, 4),
-            "shares": round(shares, 2),
-            "current_price": round(current_price, 4) if current_price else 0,
-            "change": round(change, 2),
-            "profit_rate": round(profit_rate, 2),
-            "profit_amount": round(profit_amount, 2),
-            "today_profit": round(today_profit, 2),
-            "market_value": round(market_value, 2),
-            "cost": round(cost, 2),
+            "code": code,
+            "name": name,
+            "cost_price": _r4(cost_price),
+            "shares": _r2(shares),
+            "current_price": _r4(current_price) if current_price else 0,
+            "change": _r2(change),
+            "profit_rate": _r2(profit_rate),
+            "profit_amount": _r2(profit_amount),
+            "today_profit": today_profit,
+            "market_value": _r2(market_value),
+            "cost": _r2(cost),
             "time_str": time_str,
             "source": source,
             "note": holding.get('note', ''),
@@ -213,69 +594,61 @@ def build_holdings_response(holdings, fund_data_list, cached_map):
 
     total_profit = total_value - total_cost
     total_profit_rate = (total_profit / total_cost * 100) if total_cost > 0 else 0
-    total_today_profit = sum(
-        round(r.get('today_profit', 0), 2)
-        for r in results if r.get('data_available')
-    )
-
-    # 计算最新的数据更新时间
-    latest_update_time = ""
-    for r in results:
-        t = r.get('time_str')
-        if t and t != '--':
-            if not latest_update_time or t > latest_update_time:
-                latest_update_time = t
     
     # 如果没有找到任何有效的基金更新时间，则使用系统当前时间
     if not latest_update_time:
-        latest_update_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        latest_update_time = now_str()
 
     return {
         "success": True,
         "data": results,
         "summary": {
-            "total_cost": round(total_cost, 2),
-            "total_value": round(total_value, 2),
-            "total_profit": round(total_profit, 2),
-            "total_today_profit": total_today_profit,
-            "total_profit_rate": round(total_profit_rate, 2),
+            "total_cost": _r2(total_cost),
+            "total_value": _r2(total_value),
+            "total_profit": _r2(total_profit),
+            "total_today_profit": _r2(total_today_profit),
+            "total_profit_rate": _r2(total_profit_rate),
             "count": len(results)
         },
         "last_update": latest_update_time
     }
 
 
+def holdings_cache_key(holdings):
+    """计算持仓内容的哈希，作为持仓汇总缓存的键"""
+    return hash(tuple(
+        (h.get('code'), h.get('cost_price'), h.get('shares'), h.get('note', ''))
+        for h in holdings
+    ))
+
+
 def refresh_holdings_cache_async(holdings):
     """后台刷新持仓缓存"""
     if not holdings:
         return
     
-    with lock:
-        if state.holdings_refreshing:
-            return
-        state.holdings_refreshing = True
+    if not holdings_refresh_gate.acquire(blocking=False):
+        return
 
     def _worker():
         try:
             codes = [h['code'] for h in holdings]
-            with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
-                fund_data_list = list(executor.map(fetch_fund_data, codes))
+            fund_data_list = fetch_funds_data(codes)
 
-            with lock:
-                cached_map = {code: fund_cache.get(code) for code in codes}
-                for i, data in enumerate(fund_data_list):
-                    if data:
-                        fund_cache[codes[i]] = data
+            cached_map = cache_fund_results(codes, fund_data_list)
 
             response = build_holdings_response(holdings, fund_data_list, cached_map)
-            with lock:
-                holdings_cache["timestamp"] = time.time()
-                holdings_cache["response"] = response
+            entry = {"timestamp": time.monotonic(), "response": response, "key": holdings_cache_key(holdings)}
+            with holdings_lock:
+                holdings_cache.update(entry)
         finally:
-            with lock:
-                state.holdings_refreshing = False
+            holdings_refresh_gate.release()
 
-    threading.Thread(target=_worker, daemon=True).start()
+    try:
+        FETCH_EXECUTOR.submit(_worker)
+    except RuntimeError:
+        # 解释器退出时线程池已关闭
+        holdings_refresh_gate.release()
 
 
 def build_portfolio_meta(holdings, report_period="", source="", parse_error=None, estimate_mode="none"):
@@ -328,24 +701,118 @@ def apply_equal_weight_estimate(holdings):
     return holdings
 
 
+# A 股代码首位 -> 新浪行情市场前缀（6/9 沪市，0/3 深市，4/8 北交所）
+_PREFIX_BY_FIRST = {'6': 'sh', '9': 'sh', '0': 'sz', '3': 'sz', '4': 'bj', '8': 'bj'}
+
+
+def _sina_code(code):
+    """将股票代码映射为新浪行情代码，无法识别时返回空字符串"""
+    if len(code) == 5:  # 港股
+        return f"rt_hk{code}"
+    if len(code) == 6:
+        return _PREFIX_BY_FIRST.get(code[0], 'sh') + code
+    return ""
+
+
+def _parse_sina_quote(sina_code, data_str):
+    """解析单条新浪行情，返回 (name, price, prev_close) 或 None"""
+    parts = data_str.split(',')
+    if sina_code.startswith("rt_hk"):
+        # 港股格式: eng_name, cn_name, open, prev_close, high, low, last, ...
+        if len(parts) > 6:
+            current = float(parts[6]) if parts[6] else 0
+            prev_close = float(parts[3]) if parts[3] else 0
+            return parts[1], current, prev_close
+    else:
+        # A股格式: name, open, prev_close, current, ...
+        if len(parts) > 3:
+            current = float(parts[3]) if parts[3] else 0
+            prev_close = float(parts[2]) if parts[2] else 0
+            return parts[0], current, prev_close
+    return None
+
+
+def _quote_sina_batch(codes):
+    """
+    批量获取重仓股实时行情（新浪）
+    同一股票在 SINA_QUOTE_CACHE_TTL 内复用缓存，其余代码去重后合并为一次请求
+
+    返回:
+        dict: {code: (name, price, prev_close)}，未获取到行情的代码不在结果中
+    """
+    # TTL 判断使用单调时钟，不受系统时间校准/跳变影响
+    now_mono = time.monotonic()
+    quotes = {}
+    pending = {}  # sina_code -> code
+
+    for code in codes:
+        sina_code = _sina_code(code)
+        if not sina_code:
+            continue
+        cached = _SINA_QUOTE_CACHE.get(sina_code)
+        if cached and now_mono - cached[3] < SINA_QUOTE_CACHE_TTL:
+            quotes[code] = cached[:3]
+        else:
+            pending[sina_code] = code
+
+    if not pending:
+        return quotes
+
+    hq_url = f"http://hq.sinajs.cn/list={','.join(pending)}"
+    hq_res = SESSION.get(hq_url, headers=_HDR_SINA_HQ, timeout=5)
+    # 单次扫描响应文本，解析所有行情
+    for match in _RE_HQ_ALL.finditer(_sina_text(hq_res)):
+        sina_code = match.group(1)
+        code = pending.get(sina_code)
+        if code is None:
+            continue
+        quote = _parse_sina_quote(sina_code, match.group(2))
+        if quote:
+            _SINA_QUOTE_CACHE[sina_code] = quote + (now_mono,)
+            quotes[code] = quote
+
+    return quotes
+
+
+def _build_portfolio_item(code, info, quote, report_period=""):
+    """根据重仓股配置和实时行情构建单条持仓，并计算贡献"""
+    item = {
+        "code": code,
+        "name": info.get("name", "--"),
+        "weight": info.get("weight", 0),
+        "price": 0,
+        "change_percent": 0,
+        "contribution": None,
+        "report_period": report_period
+    }
+
+    if quote:
+        name, current, prev_close = quote
+        item["name"] = info.get("name") or name
+        item["price"] = current
+        if prev_close > 0:
+            item["change_percent"] = round((current - prev_close) / prev_close * 100, 2)
+
+        # 计算贡献：weight * change_percent / 100
+        if item["weight"] > 0:
+            item["contribution"] = round(item["weight"] * item["change_percent"] / 100, 4)
+
+    return item
+
+
 def fetch_fund_portfolio_fallback(fund_code):
     """
     降级方案：使用旧 API（无占比数据）
     """
     try:
         url = f"http://fund.eastmoney.com/pingzhongdata/{fund_code}.js"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "Referer": "http://fund.eastmoney.com/"
-        }
-        response = requests.get(url, headers=headers, timeout=5)
-        text = response.text
-        
-        match = re.search(r'stockCodes=\[(.*?)\]', text)
+        response = SESSION.get(url, headers=_HDR_EASTMONEY_GZ, timeout=5)
+
+        match = _RE_STOCK_CODES.search(response.content)
         if not match:
             return None
-            
-        codes_str = match.group(1)
+
+        codes_str = match.group(1).decode('ascii', 'ignore')
         if not codes_str:
             return {
                 "holdings": [],
@@ -353,161 +820,142 @@ def fetch_fund_portfolio_fallback(fund_code):
             }
             
         codes = [c.strip('"\'') for c in codes_str.split(',')][:10]
-        
-        sina_codes = []
-        code_map = {}
-        
-        for code in codes:
-            prefix = ""
-            if len(code) == 5:
-                prefix = "rt_hk"
-            elif len(code) == 6:
-                if code.startswith('6') or code.startswith('9'):
-                    prefix = "sh"
-                elif code.startswith('0') or code.startswith('3'):
-                    prefix = "sz"
-                elif code.startswith('4') or code.startswith('8'):
-                    prefix = "bj"
-                else:
-                    prefix = "sh"
-            
-            if prefix:
-                sina_code = f"{prefix}{code}"
-                sina_codes.append(sina_code)
-                code_map[sina_code] = code
+        quotes = _quote_sina_batch(codes)
+        portfolio = [_build_portfolio_item(code, {}, quotes[code]) for code in codes if code in quotes]
 
-        if not sina_codes:
-            return {
-                "holdings": [],
-                "meta": build_portfolio_meta([], report_period="", source="fallback")
+        return {
+            "holdings": portfolio,
+            "meta": build_portfolio_meta(portfolio, report_period="", source="fallback")
+        }
+
+    except (requests.RequestException, ValueError, KeyError) as e:
+        # 上游超时/断连/格式异常属于预期失败，只记调试日志，避免批量失败时线程争用输出锁
+        _log.debug("降级获取持仓失败 %s: %s", fund_code, e)
+        return None
+    except Exception:
+        _log.exception("降级获取持仓异常 %s", fund_code)
+        return None
+
+
+def _refresh_portfolio(fund_code):
+    """
+    从天天基金抓取重仓股构成和权重，成功时写入持久化缓存
+    返回 (holdings_info, report_period, error)：
+    error 非空表示请求失败或无持仓披露；holdings_info 为空且 error 为空表示页面解析失败
+    """
+    url = f"http://fundf10.eastmoney.com/FundArchivesDatas.aspx?type=jjcc&code={fund_code}&topline=10"
+    response = SESSION.get(url, headers=_HDR_EASTMONEY_F10, timeout=8)
+    if response.status_code != 200:
+        return {}, "", "请求失败"
+    # 页面固定为 UTF-8，直接解码字节，跳过 requests 的编码探测
+    text = response.content.decode('utf-8', 'ignore')
+
+    if not text or len(text) < 200:
+        return {}, "", "响应内容过短"
+
+    if _RE_NO_HOLDINGS.search(text):
+        return {}, "", "暂无持仓披露"
+
+    content_match = _RE_CONTENT.search(text)
+    if content_match:
+        text = content_match.group(1)
+        text = _RE_ESCAPED_WS.sub('', text).replace('\\"', '"')
+
+    # 提取报告期（如 "2025年4季度"）
+    report_period = ""
+    period_match = _RE_PERIOD.search(text)
+    if period_match:
+        report_period = f"{period_match.group(1)}年{period_match.group(2)}季度"
+
+    # 解析 HTML 表格：提取 code, name, weight
+    holdings_info = {}
+    for code, name, weight in _RE_HOLDINGS.findall(text):
+        if code not in holdings_info and len(holdings_info) < 10:
+            holdings_info[code] = {
+                "name": name,
+                "weight": float(weight)
             }
-            
-        list_str = ",".join(sina_codes)
-        hq_url = f"http://hq.sinajs.cn/list={list_str}"
-        
-        hq_res = requests.get(hq_url, headers={"Referer": "https://finance.sina.com.cn"}, timeout=5)
-        hq_res.encoding = 'gbk'
-        hq_text = hq_res.text
-        
-        portfolio = []
-        
-        for sina_code in sina_codes:
-            pattern = f'var hq_str_{sina_code}="(.*?)";'
-            hq_match = re.search(pattern, hq_text)
-            
-            if hq_match:
-                data_str = hq_match.group(1)
-                parts = data_str.split(',')
-                
-                item = {
-                    "code": code_map[sina_code],
-                    "name": "--",
-                    "weight": 0,
-                    "price": 0,
-                    "change_percent": 0,
-                    "contribution": None,
-                    "report_period": ""
-                }
-                
-                if "rt_hk" in sina_code:
-                    if len(parts) > 6:
-                        item["name"] = parts[1]
-                        current = float(parts[6]) if parts[6] else 0
-                        prev_close = float(parts[3]) if parts[3] else 0
-                        item["price"] = current
-                        if prev_close > 0:
-                            item["change_percent"] = round((current - prev_close) / prev_close * 100, 2)
-                else:
-                    if len(parts) > 3:
-                        item["name"] = parts[0]
-                        current = float(parts[3]) if parts[3] else 0
-                        prev_close = float(parts[2]) if parts[2] else 0
-                        item["price"] = current
-                        if prev_close > 0:
-                            item["change_percent"] = round((current - prev_close) / prev_close * 100, 2)
-                
-                portfolio.append(item)
 
-            return {
-                "holdings": portfolio,
-                "meta": build_portfolio_meta(portfolio, report_period="", source="fallback")
+    if holdings_info:
+        # 更新持久化缓存
+        with fund_portfolios_lock:
+            fund_portfolios[fund_code] = {
+                "timestamp": time.time(),
+                "report_period": report_period,
+                "holdings_info": holdings_info
             }
+        # 抓取到新数据后异步保存到磁盘
+        save_data_async()
+    return holdings_info, report_period, None
+
 
+def _revalidate_portfolio(fund_code):
+    """后台刷新单只基金的重仓股构成（线程池任务）"""
+    try:
+        _refresh_portfolio(fund_code)
     except Exception as e:
-        print(f"降级获取持仓失败 {fund_code}: {e}")
-        return None
+        print(f"后台刷新持仓失败 {fund_code}: {e}")
+    finally:
+        with _inflight_lock:
+            _portfolio_refreshing.discard(fund_code)
+
+
+def _revalidate_portfolio_async(fund_code):
+    """提交后台刷新，同一基金同时只有一个刷新任务"""
+    with _inflight_lock:
+        if fund_code in _portfolio_refreshing:
+            return
+        _portfolio_refreshing.add(fund_code)
+    try:
+        FETCH_EXECUTOR.submit(_revalidate_portfolio, fund_code)
+    except RuntimeError:
+        # 解释器退出时线程池已关闭
+        with _inflight_lock:
+            _portfolio_refreshing.discard(fund_code)
 
 
 def fetch_fund_portfolio(fund_code, force_refresh=False):
     """
     获取基金持仓股票实时数据（含占比和贡献估算）
-    1. 检查本地持久化缓存 (24小时有效期)
-    2. 若缓存失效，则从天天基金重新获取构成和权重
+    1. 检查本地持久化缓存 (24小时有效期)；过期但未超过 PORTFOLIO_STALE_TTL 时
+       直接使用旧构成并在后台刷新，只有无缓存或缓存过旧时才同步抓取
+    2. 若需同步抓取，则从天天基金重新获取构成和权重
     3. 从新浪财经获取所有重仓股实时行情
     4. 计算每只股票对基金净值的贡献
     """
     try:
-        now_ts = datetime.now().timestamp()
+        now_ts = time.time()
         holdings_info = {}
         report_period = ""
         use_cache = False
+        revalidating = False
 
         stale_cache_item = None
         # 1. 尝试从持久化缓存获取构成 (有效期 24 小时)
         if not force_refresh:
-            with lock:
-                if fund_code in fund_portfolios:
-                    cache_item = fund_portfolios[fund_code]
-                    stale_cache_item = cache_item
-                    if now_ts - cache_item.get('timestamp', 0) < PORTFOLIO_CACHE_TTL:
-                        holdings_info = cache_item.get('holdings_info', {})
-                        report_period = cache_item.get('report_period', "")
-                        use_cache = True
-
-        # 2. 如果没有缓存，则从天天基金抓取新数据
-        if not use_cache:
-            url = f"http://fundf10.eastmoney.com/FundArchivesDatas.aspx?type=jjcc&code={fund_code}&topline=10"
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Referer": "http://fundf10.eastmoney.com/"
-            }
-            response = requests.get(url, headers=headers, timeout=8)
-            if response.status_code != 200:
-                return {
-                    "holdings": [],
-                    "meta": build_portfolio_meta([], report_period=report_period, source="eastmoney", parse_error="请求失败")
-                }
-            response.encoding = 'utf-8'
-            text = response.text
-
-            if not text or len(text) < 200:
-                return {
-                    "holdings": [],
-                    "meta": build_portfolio_meta([], report_period=report_period, source="eastmoney", parse_error="响应内容过短")
-                }
+            with fund_portfolios_lock:
+                cache_item = fund_portfolios.get(fund_code)
+            if cache_item:
+                stale_cache_item = cache_item
+                age = now_ts - cache_item.get('timestamp', 0)
+                if age < PORTFOLIO_STALE_TTL and cache_item.get('holdings_info'):
+                    holdings_info = cache_item.get('holdings_info', {})
+                    report_period = cache_item.get('report_period', "")
+                    use_cache = True
+                    if age >= PORTFOLIO_CACHE_TTL:
+                        revalidating = True
+                        _revalidate_portfolio_async(fund_code)
 
-            if re.search(r'暂无持仓|暂无数据|无重仓股|未披露', text):
+        # 2. 如果没有可用缓存，则从天天基金同步抓取新数据
+        if not use_cache:
+            holdings_info, report_period, fetch_error = _refresh_portfolio(fund_code)
+            if fetch_error:
                 return {
                     "holdings": [],
-                    "meta": build_portfolio_meta([], report_period=report_period, source="eastmoney", parse_error="暂无持仓披露")
+                    "meta": build_portfolio_meta([], report_period=report_period, source="eastmoney", parse_error=fetch_error)
                 }
 
-            content_match = re.search(r'content\s*:\s*"(.*)"', text, re.S)
-            if content_match:
-                text = content_match.group(1)
-                text = text.replace('\\r', '').replace('\\n', '').replace('\\t', '')
-                text = text.replace('\\"', '"')
-            
-            # 提取报告期（如 "2025年4季度"）
-            period_match = re.search(r'(\d{4})年(\d)季度', text)
-            if period_match:
-                report_period = f"{period_match.group(1)}年{period_match.group(2)}季度"
-            
-            # 解析 HTML 表格：提取 code, name, weight
-            pattern = r"<td[^>]*>\s*<a[^>]*>(\d{5,6})</a>\s*</td>\s*<td[^>]*>\s*<a[^>]*>([^<]+)</a>\s*</td>.*?<td[^>]*>(\d+\.?\d*)%\s*</td>"
-            matches = re.findall(pattern, text, re.DOTALL)
-            
-            if not matches:
+            if not holdings_info:
                 # 先尝试使用过期缓存
                 if stale_cache_item and stale_cache_item.get("holdings_info"):
                     holdings_info = stale_cache_item.get("holdings_info", {})
@@ -531,25 +979,6 @@ def fetch_fund_portfolio(fund_code, force_refresh=False):
                         "holdings": [],
                         "meta": build_portfolio_meta([], report_period=report_period, source="eastmoney", parse_error="解析失败")
                     }
-            
-            # 构建持仓信息内容
-            for code, name, weight in matches:
-                if code not in holdings_info and len(holdings_info) < 10:
-                    holdings_info[code] = {
-                        "name": name,
-                        "weight": float(weight)
-                    }
-            
-            if holdings_info:
-                # 更新持久化缓存
-                with lock:
-                    fund_portfolios[fund_code] = {
-                        "timestamp": now_ts,
-                        "report_period": report_period,
-                        "holdings_info": holdings_info
-                    }
-                # 抓取到新数据后保存到磁盘
-                threading.Thread(target=save_data, daemon=True).start()
 
         if not holdings_info:
             return {
@@ -557,98 +986,26 @@ def fetch_fund_portfolio(fund_code, force_refresh=False):
                 "meta": build_portfolio_meta([], report_period=report_period, source="eastmoney")
             }
         
-        # 3. 映射为新浪 API 格式
-        sina_codes = []
-        code_map = {}  # sina_code -> original_code
-        
-        for code in holdings_info.keys():
-            prefix = ""
-            if len(code) == 5:  # 港股
-                prefix = "rt_hk"
-            elif len(code) == 6:
-                if code.startswith('6') or code.startswith('9'):
-                    prefix = "sh"
-                elif code.startswith('0') or code.startswith('3'):
-                    prefix = "sz"
-                elif code.startswith('4') or code.startswith('8'):
-                    prefix = "bj"
-                else:
-                    prefix = "sh"
-            
-            if prefix:
-                sina_code = f"{prefix}{code}"
-                sina_codes.append(sina_code)
-                code_map[sina_code] = code
-
-        if not sina_codes:
+        # 3. 批量获取重仓股实时行情（新浪）
+        codes = [code for code in holdings_info if _sina_code(code)]
+        if not codes:
             return {
                 "holdings": [],
                 "meta": build_portfolio_meta([], report_period=report_period, source="eastmoney")
             }
-            
-        # 3. 批量获取实时行情
-        list_str = ",".join(sina_codes)
-        hq_url = f"http://hq.sinajs.cn/list={list_str}"
-        
-        hq_res = requests.get(hq_url, headers={"Referer": "https://finance.sina.com.cn"}, timeout=5)
-        encoding = 'gbk'
-        if 'charset' in hq_res.headers.get('Content-Type', ''):
-            encoding = hq_res.headers.get('Content-Type', '').split('charset=')[-1]
-        hq_res.encoding = encoding
-        
-        hq_text = hq_res.text
-        
-        portfolio = []
-        
-        for sina_code in sina_codes:
-            pattern = f'var hq_str_{sina_code}="(.*?)";'
-            hq_match = re.search(pattern, hq_text)
-            
-            original_code = code_map[sina_code]
-            info = holdings_info.get(original_code, {})
-            
-            item = {
-                "code": original_code,
-                "name": info.get("name", "--"),
-                "weight": info.get("weight", 0),
-                "price": 0,
-                "change_percent": 0,
-                "contribution": None,
-                "report_period": report_period
-            }
-            
-            if hq_match:
-                data_str = hq_match.group(1)
-                parts = data_str.split(',')
-                
-                if "rt_hk" in sina_code:
-                    # 港股格式: eng_name, cn_name, open, prev_close, high, low, last, ...
-                    if len(parts) > 6:
-                        item["name"] = info.get("name") or parts[1]
-                        current = float(parts[6]) if parts[6] else 0
-                        prev_close = float(parts[3]) if parts[3] else 0
-                        item["price"] = current
-                        if prev_close > 0:
-                            item["change_percent"] = round((current - prev_close) / prev_close * 100, 2)
-                else:
-                    # A股格式: name, open, prev_close, current, ...
-                    if len(parts) > 3:
-                        item["name"] = info.get("name") or parts[0]
-                        current = float(parts[3]) if parts[3] else 0
-                        prev_close = float(parts[2]) if parts[2] else 0
-                        item["price"] = current
-                        if prev_close > 0:
-                            item["change_percent"] = round((current - prev_close) / prev_close * 100, 2)
-                
-                # 4. 计算贡献：weight * change_percent / 100
-                if item["weight"] > 0:
-                    item["contribution"] = round(item["weight"] * item["change_percent"] / 100, 4)
-            
-            portfolio.append(item)
-                
+        quotes = _quote_sina_batch(codes)
+
+        # 4. 计算每只股票的贡献
+        portfolio = [
+            _build_portfolio_item(code, holdings_info[code], quotes.get(code), report_period)
+            for code in codes
+        ]
+
         estimate_mode = "none"
         parse_error = None
-        if use_cache and stale_cache_item and stale_cache_item.get("holdings_info") and not (now_ts - stale_cache_item.get('timestamp', 0) < PORTFOLIO_CACHE_TTL):
+        if revalidating:
+            estimate_mode = "stale_revalidating"
+        elif use_cache and stale_cache_item and stale_cache_item.get("holdings_info") and not (now_ts - stale_cache_item.get('timestamp', 0) < PORTFOLIO_CACHE_TTL):
             estimate_mode = "cached_stale"
             parse_error = "使用过期缓存权重估算"
         meta = build_portfolio_meta(
@@ -662,6 +1019,9 @@ def fetch_fund_portfolio(fund_code, force_refresh=False):
             meta["contribution_available"] = True
         return {"holdings": portfolio, "meta": meta}
 
-    except Exception as e:
-        print(f"获取持仓失败 {fund_code}: {e}")
+    except (requests.RequestException, ValueError, KeyError) as e:
+        _log.debug("获取持仓失败 %s: %s", fund_code, e)
+        return None
+    except Exception:
+        _log.exception("获取持仓异常 %s", fund_code)
         return None
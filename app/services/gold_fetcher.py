@@ -6,13 +6,66 @@
 
 import re
 import time
-import json
-import requests
-from datetime import datetime
+import operator
 
 from app.config import (
-    DATA_SOURCES, HEADERS, MAX_FAIL_COUNT, MUTE_DURATION
+    DATA_SOURCES, MAX_FAIL_COUNT, MUTE_DURATION
 )
+from app.models.state import SOURCE_STATE, source_state_lock
+from app.services.http_client import SESSION
+from app.utils.fast_json import loads
+
+# 本地时区相对 UTC 的偏移缓存 (15 分钟时段序号, 偏移秒数)
+# 夏令时等时区切换都发生在 UTC 的整 15 分钟上，按时段缓存即可在切换后自动更新
+_tz_offset_cache = (None, 0)
+
+
+def _tz_offset(ts):
+    """返回时间戳 ts 时刻本地时区相对 UTC 的偏移（秒）"""
+    global _tz_offset_cache
+    bucket = int(ts // 900)
+    cached_bucket, offset = _tz_offset_cache
+    if bucket != cached_bucket:
+        offset = time.localtime(ts).tm_gmtoff
+        _tz_offset_cache = (bucket, offset)
+    return offset
+
+
+def _fast_hms(ts):
+    """将已加上时区偏移的时间戳格式化为 HH:MM:SS（整数取模，无需 strftime）"""
+    s = int(ts)
+    return f"{(s // 3600) % 24:02d}:{(s // 60) % 60:02d}:{s % 60:02d}"
+
+
+# 新浪 gds_au9999 字段位置：昨收、开盘、最高、最低
+_SINA_OHLC_FIELDS = operator.itemgetter(2, 3, 4, 5)
+# 腾讯全版行情字段位置：昨收、开盘、最高、最低
+_TENCENT_OHLC_FIELDS = operator.itemgetter(4, 5, 33, 34)
+
+
+def _derive(price, yesterday_close):
+    """由现价和昨收计算 (涨跌额, 涨跌幅%)，昨收无效时返回 (0.0, 0.0)"""
+    if yesterday_close > 0:
+        diff = price - yesterday_close
+        return diff, diff / yesterday_close * 100.0
+    return 0.0, 0.0
+
+
+def _mk_result(price, open_price, high, low, yesterday_close, change, change_percent, source_name, ts=None):
+    """构造统一的金价结果字典（各数据源共用）"""
+    ts = ts or time.time()
+    return {
+        "price": round(price, 2),
+        "open": round(open_price, 2),
+        "high": round(high, 2),
+        "low": round(low, 2),
+        "yesterday_close": round(yesterday_close, 2),
+        "change": round(change, 2),
+        "change_percent": round(change_percent, 2),
+        "timestamp": ts,
+        "time_str": _fast_hms(ts + _tz_offset(ts)),
+        "source": source_name
+    }
 
 
 def fetch_from_eastmoney(source_config):
@@ -21,8 +74,8 @@ def fetch_from_eastmoney(source_config):
     """
     try:
         url = "https://push2.eastmoney.com/api/qt/stock/get?secid=118.AU9999&fields=f43,f44,f45,f46,f60,f170"
-        response = requests.get(url, headers=HEADERS, timeout=source_config.get('timeout', 5))
-        data = response.json()
+        response = SESSION.get(url, timeout=source_config.timeout)
+        data = loads(response.content)
         
         if data.get('data'):
             d = data['data']
@@ -36,26 +89,16 @@ def fetch_from_eastmoney(source_config):
             high_price = d.get('f44', 0) / 100
             low_price = d.get('f45', 0) / 100
             yesterday_close = d.get('f60', 0) / 100
-            change_percent = d.get('f170', 0) / 100
-            
-            change = current_price - yesterday_close
             
-            now = datetime.now()
+            # 涨跌额/涨跌幅统一由现价和昨收推导；昨收缺失时才使用接口自带的 f170（单位 0.01%）
+            change, change_percent = _derive(current_price, yesterday_close)
+            if yesterday_close <= 0:
+                change_percent = d.get('f170', 0) / 100
             
-            return {
-                "price": round(current_price, 2),
-                "open": round(open_price, 2),
-                "high": round(high_price, 2),
-                "low": round(low_price, 2),
-                "yesterday_close": round(yesterday_close, 2),
-                "change": round(change, 2),
-                "change_percent": round(change_percent, 2),
-                "timestamp": now.timestamp(),
-                "time_str": now.strftime("%H:%M:%S"),
-                "source": source_config['name']
-            }
+            return _mk_result(current_price, open_price, high_price, low_price, yesterday_close,
+                              change, change_percent, source_config.name)
     except Exception as e:
-        print(f"[{source_config['name']}] 获取失败: {e}")
+        print(f"[{source_config.name}] 获取失败: {e}")
     return None
 
 
@@ -69,7 +112,7 @@ def fetch_from_sina(source_config):
             "Referer": "https://finance.sina.com.cn",
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
-        response = requests.get(url, headers=headers, timeout=source_config.get('timeout', 5))
+        response = SESSION.get(url, headers=headers, timeout=source_config.timeout)
         
         # 处理编码
         content_type = response.headers.get('Content-Type', '').lower()
@@ -95,30 +138,16 @@ def fetch_from_sina(source_config):
         if current_price <= 0:
             return None
 
-        yesterday_close = float(parts[2]) if parts[2] else current_price
-        open_price = float(parts[3]) if parts[3] else current_price
-        high_price = float(parts[4]) if parts[4] else current_price
-        low_price = float(parts[5]) if parts[5] else current_price
+        yesterday_close, open_price, high_price, low_price = [
+            float(x) if x else current_price for x in _SINA_OHLC_FIELDS(parts)
+        ]
             
-        change = current_price - yesterday_close
-        change_percent = (change / yesterday_close * 100) if yesterday_close else 0
-        
-        now = datetime.now()
+        change, change_percent = _derive(current_price, yesterday_close)
         
-        return {
-            "price": round(current_price, 2),
-            "open": round(open_price, 2),
-            "high": round(high_price, 2),
-            "low": round(low_price, 2),
-            "yesterday_close": round(yesterday_close, 2),
-            "change": round(change, 2),
-            "change_percent": round(change_percent, 2),
-            "timestamp": now.timestamp(),
-            "time_str": now.strftime("%H:%M:%S"),
-            "source": source_config['name']
-        }
+        return _mk_result(current_price, open_price, high_price, low_price, yesterday_close,
+                          change, change_percent, source_config.name)
     except Exception as e:
-        print(f"[{source_config['name']}] 获取失败: {e}")
+        print(f"[{source_config.name}] 获取失败: {e}")
     return None
 
 
@@ -128,7 +157,7 @@ def fetch_from_tencent(source_config):
     """
     try:
         url = "http://qt.gtimg.cn/q=s_shau9999"
-        response = requests.get(url, headers=HEADERS, timeout=source_config.get('timeout', 3))
+        response = SESSION.get(url, timeout=source_config.timeout)
         text = response.text
         
         # 格式: v_s_shau9999="1~黄金Au9999~shau9999~550.45~0.12~0.02~...~";
@@ -146,7 +175,7 @@ def fetch_from_tencent(source_config):
         
         # 腾讯简版不含最高最低，尝试使用全版以获取更全数据
         full_url = "http://qt.gtimg.cn/q=shau9999"
-        full_res = requests.get(full_url, headers=HEADERS, timeout=2)
+        full_res = SESSION.get(full_url, timeout=2)
         full_match = re.search(r'"([^"]+)"', full_res.text)
         
         open_price = current_price
@@ -157,26 +186,12 @@ def fetch_from_tencent(source_config):
         if full_match:
             f_parts = full_match.group(1).split('~')
             if len(f_parts) > 34:
-                yesterday_close = float(f_parts[4])
-                open_price = float(f_parts[5])
-                high_price = float(f_parts[33])
-                low_price = float(f_parts[34])
+                yesterday_close, open_price, high_price, low_price = map(float, _TENCENT_OHLC_FIELDS(f_parts))
 
-        now = datetime.now()
-        return {
-            "price": round(current_price, 2),
-            "open": round(open_price, 2),
-            "high": round(high_price, 2),
-            "low": round(low_price, 2),
-            "yesterday_close": round(yesterday_close, 2),
-            "change": round(change, 2),
-            "change_percent": round(change_percent, 2),
-            "timestamp": now.timestamp(),
-            "time_str": now.strftime("%H:%M:%S"),
-            "source": source_config['name']
-        }
+        return _mk_result(current_price, open_price, high_price, low_price, yesterday_close,
+                          change, change_percent, source_config.name)
     except Exception as e:
-        print(f"[{source_config['name']}] 获取失败: {e}")
+        print(f"[{source_config.name}] 获取失败: {e}")
     return None
 
 
@@ -187,15 +202,17 @@ def fetch_from_netease(source_config):
     try:
         # 网易接口，118AU9999 是 SGE Au99.99 的代码
         url = "http://api.money.126.net/data/feed/118AU9999,money.api"
-        response = requests.get(url, headers=HEADERS, timeout=source_config.get('timeout', 3))
+        response = SESSION.get(url, timeout=source_config.timeout)
         
         # 网易返回的是 _ntes_quote_callback({...});
-        text = response.text
-        match = re.search(r'\((.*)\)', text)
-        if not match:
+        # 直接在原始字节上截取括号内的 JSON，省去整段文本解码
+        body = response.content
+        start = body.find(b'(')
+        end = body.rfind(b')')
+        if start < 0 or end <= start:
             return None
             
-        data = json.loads(match.group(1))
+        data = loads(body[start + 1:end])
         d = data.get('118AU9999')
         if not d:
             return None
@@ -208,24 +225,17 @@ def fetch_from_netease(source_config):
         high_price = d.get('high', current_price)
         low_price = d.get('low', current_price)
         yesterday_close = d.get('yestclose', current_price)
-        change = d.get('updown', 0)
-        change_percent = d.get('percent', 0) * 100
+        # 优先使用接口返回的涨跌数据（percent 为小数形式），缺失时由昨收推导
+        change, change_percent = _derive(current_price, yesterday_close)
+        if d.get('updown') is not None:
+            change = d['updown']
+        if d.get('percent') is not None:
+            change_percent = d['percent'] * 100
         
-        now = datetime.now()
-        return {
-            "price": round(current_price, 2),
-            "open": round(open_price, 2),
-            "high": round(high_price, 2),
-            "low": round(low_price, 2),
-            "yesterday_close": round(yesterday_close, 2),
-            "change": round(change, 2),
-            "change_percent": round(change_percent, 2),
-            "timestamp": now.timestamp(),
-            "time_str": now.strftime("%H:%M:%S"),
-            "source": source_config['name']
-        }
+        return _mk_result(current_price, open_price, high_price, low_price, yesterday_close,
+                          change, change_percent, source_config.name)
     except Exception as e:
-        print(f"[{source_config['name']}] 获取失败: {e}")
+        print(f"[{source_config.name}] 获取失败: {e}")
     return None
 
 
@@ -246,37 +256,43 @@ def fetch_gold_price():
         (data, error_msg): 成功时 data 为价格数据字典，error_msg 为 None
                           失败时 data 为 None，error_msg 为错误信息
     """
-    now_ts = time.time()
-    enabled_sources = [s for s in DATA_SOURCES if s.get('enabled', False)]
+    # 熔断冷却期使用单调时钟，系统时间回拨不会让数据源被长期静默
+    now_ts = time.monotonic()
+    enabled_sources = [s for s in DATA_SOURCES if s.enabled]
     
     if not enabled_sources:
         return None, "没有启用的数据源"
         
     muted_count = 0
     for source in enabled_sources:
+        runtime = SOURCE_STATE[source.type]
         # 检查是否处于熔断期
-        if source.get('mute_until', 0) > now_ts:
+        with source_state_lock:
+            is_muted = runtime.mute_until > now_ts
+        if is_muted:
             muted_count += 1
             continue
             
-        handler = SOURCE_HANDLERS.get(source['type'])
+        handler = SOURCE_HANDLERS.get(source.type)
         if not handler:
             continue
             
         # 尝试获取数据
         data = handler(source)
+        with source_state_lock:
+            if data:
+                # 成功获取，重置失败计数
+                runtime.fail_count = 0
+                runtime.mute_until = 0.0
+            else:
+                # 失败处理：增加计数并检查是否触发熔断
+                runtime.fail_count += 1
+                if runtime.fail_count >= MAX_FAIL_COUNT:
+                    print(f"!!! [熔断] {source.name} 连续失败 {MAX_FAIL_COUNT} 次，进入 {MUTE_DURATION}s 冷却期")
+                    runtime.mute_until = now_ts + MUTE_DURATION
+                    runtime.fail_count = 0 # 触发后重置，等待冷却后重新开始
         if data:
-            # 成功获取，重置失败计数
-            source['fail_count'] = 0
-            source['mute_until'] = 0
             return data, None
-        else:
-            # 失败处理：增加计数并检查是否触发熔断
-            source['fail_count'] = source.get('fail_count', 0) + 1
-            if source['fail_count'] >= MAX_FAIL_COUNT:
-                print(f"!!! [熔断] {source['name']} 连续失败 {MAX_FAIL_COUNT} 次，进入 {MUTE_DURATION}s 冷却期")
-                source['mute_until'] = now_ts + MUTE_DURATION
-                source['fail_count'] = 0 # 触发后重置，等待冷却后重新开始
             
     if muted_count == len(enabled_sources):
         return None, "所有数据源均处于熔断冷却期，请稍后再试"
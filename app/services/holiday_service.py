@@ -5,77 +5,98 @@
 """
 
 import time
-import json
 import os
 import threading
-from datetime import datetime, timedelta
-from collections import OrderedDict
+import itertools
+import calendar
+from datetime import date, datetime, timedelta
 
 from app.config import (
     HOLIDAY_API_URLS, 
     HOLIDAY_CACHE_TTL, 
     HOLIDAY_CACHE_DIR,
-    MAX_CACHED_YEARS
+    HOLIDAY_API_MUTE_DURATION,
+    HOLIDAY_API_CONNECT_TIMEOUT,
+    MAX_CACHED_YEARS,
+    MAX_FAIL_COUNT
 )
+from app.utils.fast_json import dumps_bytes, loads
 from app.utils.lunar_holiday_calculator import (
     get_holidays_as_set,
     calculate_all_legal_holidays,
     apply_adjustments,
     LUNARDATE_AVAILABLE
 )
+from app.services.http_client import SESSION
 from app.services.exchange_calendar import get_exchange_holidays
 from app.services.exchange_calendar_crawler import (
     fetch_exchange_holidays_with_status,
 )
 
+# 全局访问计数器：next() 在 CPython 中是原子操作，读取路径用它记录最近访问顺序
+_tick = itertools.count()
+
 
 class HolidayCacheManager:
     """
     智能节假日缓存管理器
-    - LRU内存缓存（限制最多3年）
-    - 持久化存储
+    - 惰性 LRU 内存缓存：读取只更新访问计数、不加锁，条目超过 2 倍上限时才按计数淘汰到上限
+    - 持久化存储（按年份分文件，只写有改动的年份）
     - 定时批量写入
     """
     
     def __init__(self, max_years=3):
         self._max_years = max_years
-        self._memory_cache = OrderedDict()  # LRU: {year: {data, source, expires, timestamp, has_adjustments}}
-        self._cache_file = os.path.join(HOLIDAY_CACHE_DIR, "holiday_cache.json")
-        self._dirty = False  # 是否有未写入的更改
+        self._memory_cache = {}  # {year: [data, last_access]}，data: {data, source, expires, timestamp, has_adjustments}
+        # 按年份分文件存储：holiday_cache/<year>.json，每次只写有改动的年份
+        self._cache_dir = os.path.join(HOLIDAY_CACHE_DIR, "holiday_cache")
+        self._legacy_file = os.path.join(HOLIDAY_CACHE_DIR, "holiday_cache.json")  # 旧版单文件缓存（自动迁移）
+        self._dirty_years = set()  # 有未写入更改的年份
         self._last_save_time = 0
         self._save_interval = 3600  # 1小时写入一次
         self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
         
         # 启动时加载缓存
         self._load_from_disk()
-    
+
+    def _year_file(self, year):
+        return os.path.join(self._cache_dir, f"{year}.json")
+
     def _load_from_disk(self):
-        """从磁盘加载缓存"""
-        if not os.path.exists(self._cache_file):
-            return
-        
+        """从磁盘加载缓存（只加载当前年份 ±2 年的数据）"""
+        current_year = datetime.now().year
         try:
-            with open(self._cache_file, 'r', encoding='utf-8') as f:
-                disk_cache = json.load(f)
-            
-            metadata = disk_cache.get("metadata", {})
-            cache_data = disk_cache.get("cache", {})
-            
-            # 只加载最近的数据
-            current_year = datetime.now().year
-            for year_str, data in cache_data.items():
-                year = int(year_str)
-                # 保留当前年份 ±2 年的数据
-                if abs(year - current_year) <= 2:
-                    self._memory_cache[year] = data
-            
+            if os.path.isdir(self._cache_dir):
+                for name in os.listdir(self._cache_dir):
+                    year_str, ext = os.path.splitext(name)
+                    if ext != ".json" or not year_str.isdigit():
+                        continue
+                    year = int(year_str)
+                    if abs(year - current_year) > 2:
+                        continue
+                    with open(self._year_file(year), 'rb') as f:
+                        self._memory_cache[year] = [loads(f.read()), next(_tick)]
+            elif os.path.exists(self._legacy_file):
+                with open(self._legacy_file, 'rb') as f:
+                    cache_data = loads(f.read()).get("cache", {})
+                for year_str, data in cache_data.items():
+                    year = int(year_str)
+                    if abs(year - current_year) <= 2:
+                        self._memory_cache[year] = [data, next(_tick)]
+                        # 下次保存时写成按年份的文件
+                        self._dirty_years.add(year)
+
             print(f"[节假日缓存] 从磁盘加载了 {len(self._memory_cache)} 年的数据")
-            
+
         except Exception as e:
             print(f"[节假日缓存] 加载失败: {e}")
     
     def save_to_disk(self, force=False):
-        """保存缓存到磁盘"""
+        """
+        保存有改动的年份到磁盘（每个年份单独原子写入，不再读取合并整个缓存文件）
+        缓存锁内只取出待写数据的快照，编码和文件写入在锁外进行，不阻塞 set()
+        """
         with self._lock:
             now = time.time()
             
@@ -83,66 +104,75 @@ class HolidayCacheManager:
             if not force and now - self._last_save_time < self._save_interval:
                 return
             
-            if not self._dirty and not force:
+            if not self._dirty_years:
                 return
-            
+
+            pending = {}
+            for year in self._dirty_years:
+                entry = self._memory_cache.get(year)
+                if entry is not None:  # 已被 LRU 淘汰的年份跳过
+                    # _frozen 为内存中的只读集合，不写入磁盘（加载后首次读取时重建）
+                    pending[year] = {k: v for k, v in entry[0].items() if k != "_frozen"}
+            self._dirty_years.clear()
+            self._last_save_time = now
+
+        # 写文件锁：保证并发保存不会交错写同一个临时文件
+        with self._write_lock:
             try:
-                # 读取现有数据，合并内存缓存
-                disk_data = {"metadata": {"version": "2.0"}, "cache": {}}
-                
-                if os.path.exists(self._cache_file):
-                    with open(self._cache_file, 'r', encoding='utf-8') as f:
-                        disk_data = json.load(f)
-                
-                # 更新缓存
-                for year, data in self._memory_cache.items():
-                    disk_data["cache"][str(year)] = data
-                
-                # 写入临时文件再原子替换
-                temp_file = self._cache_file + ".tmp"
-                with open(temp_file, 'w', encoding='utf-8') as f:
-                    json.dump(disk_data, f, ensure_ascii=False, indent=2)
-                
-                os.replace(temp_file, self._cache_file)
-                
-                self._last_save_time = now
-                self._dirty = False
+                os.makedirs(self._cache_dir, exist_ok=True)
+                for year in sorted(pending):
+                    # 写入临时文件再原子替换
+                    year_file = self._year_file(year)
+                    temp_file = year_file + ".tmp"
+                    with open(temp_file, 'wb') as f:
+                        f.write(dumps_bytes(pending[year]))
+                    os.replace(temp_file, year_file)
                 print(f"[节假日缓存] 已保存到磁盘")
-                
+
             except Exception as e:
                 print(f"[节假日缓存] 保存失败: {e}")
-    
-    def get(self, year):
-        """获取指定年份的节假日数据"""
-        with self._lock:
-            if year in self._memory_cache:
-                # 移到末尾（LRU）
-                self._memory_cache.move_to_end(year)
-                data = self._memory_cache[year]
-                
-                # 检查是否过期
-                if data.get("expires", 0) > time.time():
-                    return data
-                # 内置/计算数据永不过期
-                elif data.get("source") in ("builtin", "calculated"):
-                    return data
-            
+                # 写入失败的年份重新标记，下次保存时重试
+                with self._lock:
+                    self._dirty_years.update(pending)
+    
+    def get(self, year, allow_expired=False):
+        """获取指定年份的节假日数据（无锁：一次字典查找 + 更新访问计数）"""
+        entry = self._memory_cache.get(year)
+        if entry is None:
             return None
+        entry[1] = next(_tick)
+        data = entry[0]
+        if allow_expired:
+            return data
+
+        # 检查是否过期
+        if data.get("expires", 0) > time.time():
+            return data
+        # 内置/计算数据永不过期
+        elif data.get("source") in ("builtin", "calculated"):
+            return data
+
+        return None
     
     def set(self, year, data):
         """设置缓存"""
         with self._lock:
-            # LRU淘汰
-            if len(self._memory_cache) >= self._max_years:
-                # 移除最旧的
-                oldest_year, _ = self._memory_cache.popitem(last=False)
-            
-            self._memory_cache[year] = data
-            self._dirty = True
-    
-    def mark_dirty(self):
-        """标记为脏数据"""
-        self._dirty = True
+            self._memory_cache[year] = [data, next(_tick)]
+            self._dirty_years.add(year)
+
+            # 惰性淘汰：超过 2 倍上限时一次性移除最久未访问的条目，回到上限
+            if len(self._memory_cache) > 2 * self._max_years:
+                by_access = sorted(self._memory_cache.items(), key=lambda item: item[1][1])
+                for old_year, _ in by_access[:len(by_access) - self._max_years]:
+                    del self._memory_cache[old_year]
+    
+    def mark_dirty(self, year=None):
+        """标记为脏数据（不指定年份时标记内存中的全部年份）"""
+        with self._lock:
+            if year is None:
+                self._dirty_years.update(self._memory_cache)
+            else:
+                self._dirty_years.add(year)
 
 
 # 全局缓存管理器
@@ -157,6 +187,44 @@ def get_cache_manager():
     return _cache_manager
 
 
+# 节假日 API 熔断状态: {api_name: {"fail_count": int, "mute_until": float}}
+_api_circuit = {}
+_api_circuit_lock = threading.Lock()
+
+
+def _api_muted(api_name, now_ts):
+    """API 是否处于熔断冷却期"""
+    with _api_circuit_lock:
+        state = _api_circuit.get(api_name)
+        return state is not None and now_ts < state["mute_until"]
+
+
+def _record_api_result(api_name, success):
+    """记录 API 调用结果：成功清零，连续失败达到阈值后熔断一段时间"""
+    with _api_circuit_lock:
+        state = _api_circuit.setdefault(api_name, {"fail_count": 0, "mute_until": 0})
+        if success:
+            state["fail_count"] = 0
+            state["mute_until"] = 0
+            return
+        state["fail_count"] += 1
+        if state["fail_count"] >= MAX_FAIL_COUNT:
+            state["fail_count"] = 0
+            state["mute_until"] = time.time() + HOLIDAY_API_MUTE_DURATION
+            print(f"[节假日] {api_name} 连续失败 {MAX_FAIL_COUNT} 次，熔断 {HOLIDAY_API_MUTE_DURATION}s")
+
+
+def _json_body(response):
+    """
+    解析接口 JSON 响应：UTF-8 响应直接按字节交给 fast_json 解析，
+    其他字符集（如百度接口的 gbk）按响应头声明的编码解码一次
+    """
+    encoding = (response.encoding or 'utf-8').lower()
+    if encoding in ('utf-8', 'utf8'):
+        return loads(response.content)
+    return loads(response.content.decode(encoding, 'ignore'))
+
+
 def fetch_holidays_from_api(year):
     """
     从多个API获取节假日数据
@@ -167,14 +235,17 @@ def fetch_holidays_from_api(year):
     adjustments = {}
     source = None
     
-    for api_name, api_url in HOLIDAY_API_URLS:
+    for api_name, api_url, api_timeout in HOLIDAY_API_URLS:
+        # 熔断中的 API 直接跳过，不再等待超时
+        if _api_muted(api_name, time.time()):
+            continue
         try:
             url = api_url.format(year=year)
-            import requests
-            response = requests.get(url, timeout=5)
+            # 连接阶段单独限时，DNS / 握手卡住时尽快切换到下一个 API
+            response = SESSION.get(url, timeout=(HOLIDAY_API_CONNECT_TIMEOUT, api_timeout))
             
             if response.status_code == 200:
-                data = response.json()
+                data = _json_body(response)
                 
                 # 解析节假日数据
                 if "data" in data and data["data"]:
@@ -202,10 +273,13 @@ def fetch_holidays_from_api(year):
                 
                 if holidays:
                     source = api_name
+                    _record_api_result(api_name, True)
                     print(f"[节假日] 从 {api_name} 获取 {year} 年数据成功，共 {len(holidays)} 天")
                     break
+            _record_api_result(api_name, False)
                     
         except Exception as e:
+            _record_api_result(api_name, False)
             print(f"[节假日] {api_name} 获取失败: {e}")
             continue
     
@@ -232,6 +306,18 @@ def calculate_holidays(year):
     return holidays, source
 
 
+def _cached_holidays(cache_mgr, year, allow_expired=False):
+    """从内存缓存取节假日集合，未命中返回 None（不发起任何网络请求）"""
+    cached = cache_mgr.get(year, allow_expired=allow_expired)
+    if not cached:
+        return None
+    frozen = cached.get("_frozen")
+    if frozen is None:
+        # 从磁盘加载的条目首次读取时构建一次
+        frozen = cached["_frozen"] = frozenset(cached["data"])
+    return frozen
+
+
 def get_holidays(year=None):
     """
     获取指定年份的节假日集合
@@ -240,9 +326,9 @@ def get_holidays(year=None):
     1. 内存缓存命中且未过期
     2. 持久化缓存命中且未过期
     3. 年份 >= 2026: 尝试API获取 -> 自动计算
-    4. 使用上一年数据估算
+    4. 使用上一年缓存数据估算（只读缓存，不递归请求接口）
     
-    返回: set(["2026-01-01", ...])
+    返回: frozenset(["2026-01-01", ...])（缓存中的只读集合，直接返回不复制）
     """
     if year is None:
         year = datetime.now().year
@@ -250,9 +336,9 @@ def get_holidays(year=None):
     cache_mgr = get_cache_manager()
     
     # 1. 检查内存缓存
-    cached = cache_mgr.get(year)
-    if cached:
-        return set(cached["data"])
+    frozen = _cached_holidays(cache_mgr, year)
+    if frozen is not None:
+        return frozen
     
     # 2. 尝试获取新数据
     holidays = None
@@ -281,17 +367,18 @@ def get_holidays(year=None):
     # 3. 如果都失败，使用上一年数据估算
     if not holidays:
         print(f"[节假日] 警告: {year} 年数据获取失败，尝试使用 {year-1} 年数据估算")
-        prev_holidays = get_holidays(year - 1)
+        # 只读缓存（含已过期条目），不为估算再触发上一年的接口请求
+        prev_holidays = _cached_holidays(cache_mgr, year - 1, allow_expired=True)
         if prev_holidays:
-            # 简单平移（不一定准确）
-            holidays = set()
-            for d in prev_holidays:
-                try:
-                    old_date = datetime.strptime(d, "%Y-%m-%d")
-                    new_date = old_date.replace(year=year)
-                    holidays.add(new_date.strftime("%Y-%m-%d"))
-                except:
-                    pass
+            # 简单平移（不一定准确）：直接替换 "YYYY-MM-DD" 的年份部分，
+            # 非闰年丢弃 2 月 29 日
+            year_prefix = str(year)
+            leap = calendar.isleap(year)
+            holidays = {
+                year_prefix + d[4:]
+                for d in prev_holidays
+                if len(d) == 10 and (leap or d[5:] != "02-29")
+            }
             source = "fallback"
     
     # 4. 缓存结果
@@ -306,8 +393,10 @@ def get_holidays(year=None):
         else:
             expires = time.time() + float('inf')
         
+        holidays = frozenset(holidays)
         cache_data = {
             "data": list(holidays),
+            "_frozen": holidays,
             "source": source,
             "source_name": source_name if source == "api" else None,
             "expires": expires,
@@ -315,9 +404,33 @@ def get_holidays(year=None):
             "has_adjustments": bool(adjustments)
         }
         cache_mgr.set(year, cache_data)
-        cache_mgr.mark_dirty()
     
-    return holidays if holidays else set()
+    return holidays if holidays else frozenset()
+
+
+# 休市日位图缓存: {(market_type, year): (holidays, jan1_ordinal, bitmap)}
+# 第 n 位表示当年第 n 天（1 月 1 日为第 0 位）休市；holidays 为生成位图时的集合对象，
+# 底层日历返回新集合（数据更新）时按对象身份判断并重建
+_bitmap_cache = {}
+
+
+def _holiday_bitmap(market_type, year, holidays):
+    """返回 (jan1_ordinal, bitmap)，集合未变化时直接复用"""
+    key = (market_type, year)
+    entry = _bitmap_cache.get(key)
+    if entry is None or entry[0] is not holidays:
+        jan1 = date(year, 1, 1).toordinal()
+        bitmap = 0
+        for date_str in holidays:
+            try:
+                offset = date.fromisoformat(date_str).toordinal() - jan1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= offset < 366:
+                bitmap |= 1 << offset
+        entry = (holidays, jan1, bitmap)
+        _bitmap_cache[key] = entry
+    return entry[1], entry[2]
 
 
 def is_holiday(dt=None, market_type="fund"):
@@ -334,19 +447,33 @@ def is_holiday(dt=None, market_type="fund"):
     if dt is None:
         dt = datetime.now()
     
-    date_str = dt.strftime("%Y-%m-%d")
+    # 按当年天数查位图，省去每次格式化日期字符串和集合哈希查找
+    jan1, bitmap = get_holiday_bitmap(dt.year, market_type)
+    return bool(bitmap >> (dt.toordinal() - jan1) & 1)
+
+
+def get_holiday_bitmap(year, market_type="fund"):
+    """
+    获取某年的休市日位图（不含周末）
+    
+    参数:
+        year: 年份
+        market_type: 市场类型 "fund"(基金/股票) 或 "gold"(黄金)
     
+    返回:
+        tuple: (当年 1 月 1 日的 ordinal, 位图)，第 n 位为 1 表示 1 月 1 日之后第 n 天休市
+    """
     if market_type == "fund":
         # 基金/股票使用上交所日历爬虫
-        holidays, has_calendar = fetch_exchange_holidays_with_status(dt.year)
+        holidays, has_calendar = fetch_exchange_holidays_with_status(year)
         if not holidays and not has_calendar:
             # 爬虫失败且无缓存时，回退到本地节假日服务避免误判开市
-            holidays = get_holidays(dt.year)
+            holidays = get_holidays(year)
     else:
         # 黄金使用上金所（SGE）混合日历
-        holidays = get_exchange_holidays(dt.year)
+        holidays = get_exchange_holidays(year)
     
-    return date_str in holidays
+    return _holiday_bitmap(market_type, year, holidays)
 
 
 def check_and_save_cache():
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+共享 HTTP 会话模块
+所有上游行情请求共用同一个 requests.Session，复用 TCP/TLS 连接
+（HTTPAdapter 按主机分别维护连接池，天天基金 / 新浪等不同主机之间互不占用连接）
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.config import HEADERS, MAX_FETCH_WORKERS
+
+
+def _build_session():
+    """创建带连接池和轻量重试（仅连接失败 / 5xx）的会话，并预置默认请求头"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        # 每个主机的连接池至少容纳共享线程池的全部并发，避免连接用完后被丢弃重建
+        pool_maxsize=max(32, MAX_FETCH_WORKERS),
+        pool_block=False,
+        # 只重试建立连接失败和 5xx；读超时不重试，挂起的数据源按 timeout 一次失败后立即切换到下一个
+        max_retries=Retry(total=1, connect=1, read=0, backoff_factor=0.1,
+                          status_forcelist=(500, 502, 503, 504))
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+# 全局共享会话（requests.Session 的 get 调用可在线程间共享）
+SESSION = _build_session()
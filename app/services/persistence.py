@@ -4,19 +4,35 @@
 负责数据的保存、加载和清理，包含自动迁移逻辑
 """
 
+import atexit
 import os
-import json
 import shutil
+import threading
+import time
 from datetime import datetime
 
 from app.config import (
     DATA_FILE, OLD_DATA_FILE, DATA_DIR,
-    RECORDS_KEEP_DAYS
+    RECORDS_KEEP_DAYS, DURABILITY_INTERVAL, SAVE_DEBOUNCE_SECONDS
 )
 from app.models.state import (
-    lock, price_history, manual_records, alert_settings,
+    lock, records_lock, watchlist_lock, holdings_lock, fund_portfolios_lock,
+    price_history, manual_records, alert_settings,
     fund_watchlist, fund_holdings, fund_portfolios
 )
+from app.utils.fast_json import dumps_bytes, loads
+
+# 上次 fsync 的时间（time.monotonic()），以及此后是否还有未强制落盘的保存
+_last_fsync_ts = float('-inf')
+_unsynced = False
+
+# 文件写入锁：状态快照在各资源锁下完成，序列化和磁盘 I/O 只持有此锁
+_write_lock = threading.Lock()
+
+# 异步保存：接口只标记"有修改"，由后台写入线程合并后统一落盘
+_dirty_event = threading.Event()
+_flush_thread = None
+_flush_thread_lock = threading.Lock()
 
 
 def _get_today_start_timestamp():
@@ -28,52 +44,111 @@ def _get_today_start_timestamp():
 
 def cleanup_expired_data():
     """清理过期的数据，保持文件精简"""
-    # 注意：此函数必须在锁保护下调用，以避免与状态修改的竞态
+    # 各资源在自己的锁内清理，调用方无需持有全局锁
     
     # 1. 清理历史价格（仅保留当天自然日内的数据）
     # 计算今日零点时间戳
     today_start_ts = _get_today_start_timestamp()
-    # 因为 price_history 是有序的，我们可以直接根据时间戳过滤
-    while price_history and price_history[0].get('timestamp', 0) < today_start_ts:
-        price_history.popleft()
+    # 因为 price_history 按时间有序，环形缓冲区内部二分查找后批量丢弃
+    price_history.expire_before(today_start_ts)
         
     # 2. 清理手动记录 (7天)
     now_ts = datetime.now().timestamp()
     record_threshold = now_ts - (RECORDS_KEEP_DAYS * 86400)
     # 使用原地切片赋值，避免破坏与 state.manual_records 的共享引用
-    manual_records[:] = [r for r in manual_records if r.get('timestamp', 0) > record_threshold]
+    with records_lock:
+        manual_records[:] = [r for r in manual_records if r.get('timestamp', 0) > record_threshold]
 
 
-def save_data():
-    """将数据保存到 JSON 文件 (原子写入模式)"""
-    with lock:
-        try:
+def save_data(force_sync=False):
+    """
+    将数据保存到 JSON 文件 (原子写入模式)
+    每次保存都通过临时文件 + os.replace 原子替换；fsync 只在距上次落盘超过
+    DURABILITY_INTERVAL 或 force_sync=True 时执行，避免每个采集周期都阻塞在磁盘刷写上
+    """
+    global _last_fsync_ts, _unsynced
+    try:
+        # 逐个资源在各自的锁内复制快照（不嵌套），序列化和写文件放到锁外，避免阻塞接口
+        cleanup_expired_data()
+        with records_lock:
+            records_snapshot = list(manual_records)
+        with watchlist_lock:
+            watchlist_snapshot = list(fund_watchlist)  # 文件中保持列表格式
+        with holdings_lock:
+            holdings_snapshot = list(fund_holdings.values())
+        with lock:
+            alerts_snapshot = dict(alert_settings)
+        with fund_portfolios_lock:
+            portfolios_snapshot = dict(fund_portfolios)
+        
+        data = {
+            "manual_records": records_snapshot,
+            # 持久化只需价格和时间戳，time_str 在读取时按需生成
+            "price_history": price_history.to_list(with_time_str=False),
+            "alert_settings": alerts_snapshot,
+            "fund_watchlist": watchlist_snapshot,
+            "fund_holdings": holdings_snapshot,
+            "fund_portfolios": portfolios_snapshot
+        }
+        
+        payload = dumps_bytes(data)
+        
+        with _write_lock:
             # 确保数据目录存在
             os.makedirs(DATA_DIR, exist_ok=True)
             
-            # 在保存前执行清理
-            cleanup_expired_data()
-            
-            data = {
-                "manual_records": manual_records,
-                "price_history": list(price_history),
-                "alert_settings": alert_settings,
-                "fund_watchlist": fund_watchlist,
-                "fund_holdings": fund_holdings,
-                "fund_portfolios": fund_portfolios
-            }
+            now_mono = time.monotonic()
+            need_sync = force_sync or now_mono - _last_fsync_ts >= DURABILITY_INTERVAL
             
             # 使用临时文件进行原子写入
             tmp_file = DATA_FILE + ".tmp"
-            with open(tmp_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                f.flush()
-                os.fsync(f.fileno())  # 确保数据写入物理磁盘
+            with open(tmp_file, 'wb') as f:
+                f.write(payload)
+                if need_sync:
+                    f.flush()
+                    os.fsync(f.fileno())  # 确保数据写入物理磁盘
             
             # 原子替换原文件
             os.replace(tmp_file, DATA_FILE)
-        except Exception as e:
-            print(f"保存数据失败: {e}")
+            
+            if need_sync:
+                _last_fsync_ts = now_mono
+                _unsynced = False
+            else:
+                _unsynced = True
+    except Exception as e:
+        print(f"保存数据失败: {e}")
+
+
+def _flush_loop():
+    """后台写入线程：有修改时等待合并窗口结束，再统一保存一次"""
+    while True:
+        _dirty_event.wait()
+        time.sleep(SAVE_DEBOUNCE_SECONDS)
+        # 先清除标记再保存，保存期间的新修改会触发下一轮
+        _dirty_event.clear()
+        save_data()
+
+
+def save_data_async():
+    """标记数据已修改，由后台写入线程在合并窗口后保存（不阻塞调用方）"""
+    global _flush_thread
+    _dirty_event.set()
+    if _flush_thread is None:
+        with _flush_thread_lock:
+            if _flush_thread is None:
+                _flush_thread = threading.Thread(target=_flush_loop, name='data-flush', daemon=True)
+                _flush_thread.start()
+
+
+def _force_sync_on_exit():
+    """进程正常退出时，若有待写入或未落盘的保存则强制保存并 fsync 一次"""
+    if _dirty_event.is_set() or _unsynced:
+        _dirty_event.clear()
+        save_data(force_sync=True)
+
+
+atexit.register(_force_sync_on_exit)
 
 
 def _migrate_old_data_file():
@@ -112,42 +187,45 @@ def load_data():
     
     if os.path.exists(DATA_FILE):
         try:
+            with open(DATA_FILE, 'rb') as f:
+                data = loads(f.read())
+            
+            # 加载手动记录
+            with records_lock:
+                manual_records.clear()
+                manual_records.extend(data.get("manual_records", []))
+            
+            # 加载历史价格
+            price_history.clear()
+            price_history.extend(data.get("price_history", []))
+            
+            # 加载自选基金
+            with watchlist_lock:
+                fund_watchlist.clear()
+                fund_watchlist.update(dict.fromkeys(data.get("fund_watchlist", [])))
+            
+            # 加载基金持仓
+            with holdings_lock:
+                fund_holdings.clear()
+                saved_holdings = data.get("fund_holdings", [])
+                if isinstance(saved_holdings, dict):
+                    saved_holdings = saved_holdings.values()
+                fund_holdings.update((h['code'], h) for h in saved_holdings if h.get('code'))
+            
             with lock:
-                with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                    # 加载手动记录
-                    loaded_records = data.get("manual_records", [])
-                    manual_records.clear()
-                    manual_records.extend(loaded_records)
-                    
-                    # 加载历史价格
-                    history = data.get("price_history", [])
-                    price_history.clear()
-                    price_history.extend(history)
-                    
-                    # 加载预警配置
-                    saved_alerts = data.get("alert_settings", {})
-                    alert_settings.update(saved_alerts)
-                    
-                    # 加载自选基金
-                    fund_watchlist.clear()
-                    fund_watchlist.extend(data.get("fund_watchlist", []))
-                    
-                    # 加载基金持仓
-                    fund_holdings.clear()
-                    fund_holdings.extend(data.get("fund_holdings", []))
-                    
-                    # 加载基金重仓股内容缓存
-                    fund_portfolios.clear()
-                    fund_portfolios.update(data.get("fund_portfolios", {}))
-                    
-                print(f"成功加载数据: {len(manual_records)} 条记录, {len(price_history)} 条历史, "
-                      f"{len(fund_watchlist)} 个自选基金, {len(fund_holdings)} 条持仓, "
-                      f"{len(fund_portfolios)} 个重仓股缓存")
+                # 加载预警配置
+                alert_settings.update(data.get("alert_settings", {}))
+            with fund_portfolios_lock:
+                # 加载基金重仓股内容缓存
+                fund_portfolios.clear()
+                fund_portfolios.update(data.get("fund_portfolios", {}))
                 
-                # 加载后立即执行清理，避免跨日数据在首次 save_data() 前可见
-                cleanup_expired_data()
+            print(f"成功加载数据: {len(manual_records)} 条记录, {len(price_history)} 条历史, "
+                  f"{len(fund_watchlist)} 个自选基金, {len(fund_holdings)} 条持仓, "
+                  f"{len(fund_portfolios)} 个重仓股缓存")
+            
+            # 加载后立即执行清理，避免跨日数据在首次 save_data() 前可见
+            cleanup_expired_data()
             
         except Exception as e:
             print(f"加载数据失败: {e}")
@@ -6,17 +6,73 @@ Scrapes closure schedules from www.sge.com.cn
 
 import re
 import time
-import json
 import os
 import random
+import threading
 import requests
-from datetime import datetime, timedelta
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InsecureRequestWarning
+from datetime import date, datetime
 
 from app.config import (
     SGE_HOLIDAY_URL,
     SGE_HOLIDAY_CACHE_FILE,
     SGE_HOLIDAY_CACHE_TTL,
+    SGE_FETCH_MUTE_DURATION,
+    MAX_FAIL_COUNT,
 )
+from app.utils.fast_json import dumps_bytes, loads
+
+# The SGE site is fetched without certificate verification (its chain is
+# not reliably validated by the bundled CA store); silence the warning once
+# here instead of per request.
+urllib3.disable_warnings(InsecureRequestWarning)
+
+# Holiday names in announcement order
+_HOLIDAY_NAMES = (
+    "元旦", "春节", "清明节", "劳动节",
+    "端午节", "中秋节", "国庆节",
+)
+
+# Precompiled patterns (compiled once at import, not per parse / per holiday)
+# List page: result block separator, <a href>title</a>, <p class="fr">date
+_BLOCK_SPLIT = re.compile(r'searchContList')
+_HREF_PAT = re.compile(r'<a[^>]+href="([^"]*)"[^>]*>(.*?)</a>', re.DOTALL)
+_LIST_DATE_PAT = re.compile(r'<p\s+class="fr"\s*>\s*(\d{4}-\d{2}-\d{2})')
+_TAG_STRIP = re.compile(r'<[^>]+>')
+# <script>/<style> blocks are dropped whole before tag stripping so their
+# bodies neither reach the text patterns nor leave stray "<" fragments
+_SCRIPT_STYLE = re.compile(r'<(script|style)\b[^>]*>.*?</\1\s*>', re.DOTALL | re.IGNORECASE)
+# Detail page: numbered section markers ("一、", "二．"...) and "春节：" style headings
+_SECTION_SPLIT = re.compile(r'[一二三四五六七八九十]+[、.．]')
+_SECTION_HEAD = re.compile('(' + '|'.join(_HOLIDAY_NAMES) + ')[：:]')
+# "X月X日至X月X日休市"
+_CLOSURE_PAT = re.compile(
+    r'(\d{1,2})\s*月\s*(\d{1,2})\s*日'
+    r'[^至]*?至[^月]*?'
+    r'(\d{1,2})\s*月\s*(\d{1,2})\s*日'
+    r'[^休]*?休市'
+)
+# Fallback name guess from a closure's start date: (month, day) -> name
+_GUESS_RANGES = (
+    (1, 1, 31, "元旦"),
+    (2, 10, 31, "春节"),
+    (4, 1, 7, "清明节"),
+    (5, 1, 5, "劳动节"),
+    (6, 15, 25, "端午节"),
+    (9, 20, 31, "中秋节"),
+    (10, 1, 7, "国庆节"),
+)
+_GUESS_NAME = {
+    (month, day): name
+    for month, first, last, name in _GUESS_RANGES
+    for day in range(first, last + 1)
+}
+# A year mentioned in a notice title, e.g. "2026年"
+_YEAR_PAT = re.compile(r'(?:19|20)\d{2}\s*年')
+# First trading day: the date right before "开市"
+_FT_PAT = re.compile(r'(\d{1,2})\s*月\s*(\d{1,2})\s*日[^月]*?(?:起照常|恢复)?开市')
 
 
 class SgeHolidayCrawler:
@@ -25,12 +81,23 @@ class SgeHolidayCrawler:
     MAX_RETRIES = 2
     LIST_TIMEOUT = 20
     DETAIL_TIMEOUT = 30
+    LIST_CACHE_TTL = 600  # seconds a parsed listing page is reused across year crawls
 
     def __init__(self):
         self.list_url = SGE_HOLIDAY_URL
         self.base_url = "https://www.sge.com.cn"
         self.cache_file = SGE_HOLIDAY_CACHE_FILE
         self._session = None
+        self._session_lock = threading.Lock()
+        # Serialises load-modify-save of the shared cache file
+        self._cache_lock = threading.Lock()
+        # Circuit breaker: consecutive failed fetches / muted-until timestamp
+        self._fail_count = 0
+        self._mute_until = 0
+        # Parsed listing page shared by concurrent / consecutive year crawls
+        self._list_lock = threading.Lock()
+        self._list_entries = None
+        self._list_fetched = 0
         self._ensure_cache_dir()
 
     # ------------------------------------------------------------------
@@ -46,8 +113,8 @@ class SgeHolidayCrawler:
         if not os.path.exists(self.cache_file):
             return None
         try:
-            with open(self.cache_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(self.cache_file, "rb") as f:
+                return loads(f.read())
         except Exception as e:
             print(f"[SGE爬虫] 加载缓存失败: {e}")
             return None
@@ -55,8 +122,8 @@ class SgeHolidayCrawler:
     def _save_cache(self, data):
         try:
             temp = self.cache_file + ".tmp"
-            with open(temp, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with open(temp, "wb") as f:
+                f.write(dumps_bytes(data))
             os.replace(temp, self.cache_file)
             return True
         except Exception as e:
@@ -79,10 +146,24 @@ class SgeHolidayCrawler:
     # ------------------------------------------------------------------
 
     def _get_session(self):
-        """Lazy-init a requests.Session with browser-like headers."""
-        if self._session is None:
-            self._session = requests.Session()
-            self._session.headers.update({
+        """Lazy-init a requests.Session with browser-like headers.
+
+        Initialised under _session_lock so concurrent crawls (prewarm thread
+        and request threads) share one fully configured session.
+        """
+        if self._session is not None:
+            return self._session
+        with self._session_lock:
+            if self._session is not None:
+                return self._session
+            session = requests.Session()
+            # Small keep-alive pool; retries are handled by _fetch_url itself
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            # Session-wide instead of verify=False on every call
+            session.verify = False
+            session.headers.update({
                 "User-Agent": (
                     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                     "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -98,23 +179,27 @@ class SgeHolidayCrawler:
             })
             # Warm up: visit the home page first to get cookies
             try:
-                self._session.get(
-                    self.base_url, timeout=self.LIST_TIMEOUT, verify=False,
-                )
+                session.get(self.base_url, timeout=self.LIST_TIMEOUT)
             except Exception:
                 pass  # best-effort
+            self._session = session
         return self._session
 
     def _fetch_url(self, url, timeout=None):
-        """GET *url* with retry logic.  Returns text or None."""
+        """GET *url* with retry logic.  Returns text or None.
+
+        After MAX_FAIL_COUNT consecutive failed fetches the crawler stops
+        hitting the site for SGE_FETCH_MUTE_DURATION seconds and callers
+        fall back to the cache immediately.
+        """
+        if time.time() < self._mute_until:
+            return None
         if timeout is None:
             timeout = self.LIST_TIMEOUT
         session = self._get_session()
         for attempt in range(self.MAX_RETRIES + 1):
             try:
-                resp = session.get(
-                    url, timeout=timeout, verify=False,
-                )
+                resp = session.get(url, timeout=timeout)
                 if resp.status_code == 200:
                     # Handle common encoding problems
                     content = resp.content
@@ -125,6 +210,7 @@ class SgeHolidayCrawler:
                             text = content.decode("gbk")
                         except UnicodeDecodeError:
                             text = resp.text
+                    self._fail_count = 0
                     return text
                 else:
                     print(
@@ -137,6 +223,11 @@ class SgeHolidayCrawler:
                 )
             if attempt < self.MAX_RETRIES:
                 time.sleep(random.uniform(1, 3))
+        self._fail_count += 1
+        if self._fail_count >= MAX_FAIL_COUNT:
+            self._fail_count = 0
+            self._mute_until = time.time() + SGE_FETCH_MUTE_DURATION
+            print(f"[SGE爬虫] 连续失败 {MAX_FAIL_COUNT} 次，熔断 {SGE_FETCH_MUTE_DURATION}s")
         return None
 
     # ------------------------------------------------------------------
@@ -161,30 +252,24 @@ class SgeHolidayCrawler:
         # Pattern: find <a> tags whose inner text (after stripping tags)
         #          contains "休市"
         # Each search result block: <div class="searchContList ...">
-        blocks = re.split(r'searchContList', html)
+        blocks = _BLOCK_SPLIT.split(html)
 
         for block in blocks[1:]:  # skip the first split (before first match)
             # Extract href from <a> tag
-            href_match = re.search(
-                r'<a[^>]+href="([^"]*)"[^>]*>(.*?)</a>',
-                block, re.DOTALL,
-            )
+            href_match = _HREF_PAT.search(block)
             if not href_match:
                 continue
 
             href = href_match.group(1).strip()
             raw_title = href_match.group(2).strip()
             # Strip all HTML tags from title
-            title = re.sub(r'<[^>]+>', '', raw_title).strip()
+            title = _TAG_STRIP.sub('', raw_title).strip()
 
             if "休市" not in title:
                 continue
 
             # Extract date from <p class="fr">
-            date_match = re.search(
-                r'<p\s+class="fr"\s*>\s*(\d{4}-\d{2}-\d{2})',
-                block,
-            )
+            date_match = _LIST_DATE_PAT.search(block)
             date_str = date_match.group(1) if date_match else ""
 
             full_url = (
@@ -202,6 +287,27 @@ class SgeHolidayCrawler:
 
         return entries
 
+    def _get_list_entries(self):
+        """Return announcement entries from the listing page.
+
+        Every year's announcement sits on the same listing page, so a
+        multi-year prewarm fetches and parses it once: concurrent crawls
+        wait on the lock for the in-flight fetch, later ones reuse the
+        result for LIST_CACHE_TTL seconds.  Returns None if the fetch failed.
+        """
+        with self._list_lock:
+            if (self._list_entries
+                    and time.monotonic() - self._list_fetched < self.LIST_CACHE_TTL):
+                return self._list_entries
+            list_html = self._fetch_url(self.list_url)
+            if not list_html:
+                return None
+            entries = self._parse_list_page(list_html)
+            if entries:
+                self._list_entries = entries
+                self._list_fetched = time.monotonic()
+            return entries
+
     # ------------------------------------------------------------------
     # Detail page parsing
     # ------------------------------------------------------------------
@@ -218,66 +324,27 @@ class SgeHolidayCrawler:
         holidays = {}
         first_trading_days = {}
 
-        holiday_names = [
-            "元旦", "春节", "清明节", "劳动节",
-            "端午节", "中秋节", "国庆节",
-        ]
-
         # Strategy A – named sections like "一、春节：..."
-        for name in holiday_names:
-            # Step 1: Find the section for this holiday
-            # SGE format: "一、元旦：...二、春节：..." or with HTML tags
-            # Extract text from this holiday name to the next numbered section
-            section_pat = re.compile(
-                rf'{name}[：:](.*?)(?=[一二三四五六七八九十]+[、.．]|$)',
-                re.DOTALL,
-            )
-            section_m = section_pat.search(html)
-            if not section_m:
-                continue
-
-            section_text = section_m.group(1)
-            # Strip HTML tags for cleaner matching
-            clean_text = re.sub(r'<[^>]+>', '', section_text)
-
-            # Step 2: Find closure date range (X月X日至X月X日休市)
-            closure_pat = re.compile(
-                r'(\d{1,2})\s*月\s*(\d{1,2})\s*日'
-                r'[^至]*?至[^月]*?'
-                r'(\d{1,2})\s*月\s*(\d{1,2})\s*日'
-                r'[^休]*?休市',
-            )
-            closure_m = closure_pat.search(clean_text)
-            if not closure_m:
-                continue
-
-            sm, sd = int(closure_m.group(1)), int(closure_m.group(2))
-            em, ed = int(closure_m.group(3)), int(closure_m.group(4))
-            dates = self._expand_date_range(year, sm, sd, em, ed)
-            if dates:
-                holidays[name] = dates
-
-            # Step 3: Find first trading day – the date immediately
-            #         before "开市" (e.g. "1月5日（星期一）起照常开市")
-            ft_pat = re.compile(
-                r'(\d{1,2})\s*月\s*(\d{1,2})\s*日[^月]*?(?:起照常|恢复)?开市',
-            )
-            ft_m = ft_pat.search(clean_text)
-            if ft_m:
-                ftm, ftd = int(ft_m.group(1)), int(ft_m.group(2))
-                first_trading_days[name] = (
-                    f"{year}-{ftm:02d}-{ftd:02d}"
-                )
+        # Step 1: Strip tags once and split the page into numbered sections
+        # SGE format: "一、元旦：...二、春节：..." (possibly with HTML tags)
+        # Each holiday's text runs from "<name>：" to the next heading or
+        # section marker; only the first occurrence of a holiday counts.
+        seen = set()
+        text = _TAG_STRIP.sub('', _SCRIPT_STYLE.sub('', html))
+        for section in _SECTION_SPLIT.split(text):
+            heads = list(_SECTION_HEAD.finditer(section))
+            for i, head in enumerate(heads):
+                name = head.group(1)
+                if name in seen:
+                    continue
+                seen.add(name)
+                end = heads[i + 1].start() if i + 1 < len(heads) else len(section)
+                self._parse_section(name, section[head.end():end], year,
+                                    holidays, first_trading_days)
 
         # Strategy B – fallback: unnamed date ranges
         if not holidays:
-            pat = re.compile(
-                r'(\d{1,2})\s*月\s*(\d{1,2})\s*日'
-                r'[^至]*?至[^月]*?'
-                r'(\d{1,2})\s*月\s*(\d{1,2})\s*日'
-                r'[^休]*?休市'
-            )
-            for m in pat.finditer(html):
+            for m in _CLOSURE_PAT.finditer(html):
                 sm, sd = int(m.group(1)), int(m.group(2))
                 em, ed = int(m.group(3)), int(m.group(4))
                 name = self._guess_holiday_name(sm, sd)
@@ -294,6 +361,28 @@ class SgeHolidayCrawler:
             "first_trading_days": first_trading_days,
         }
 
+    def _parse_section(self, name, clean_text, year, holidays, first_trading_days):
+        """Extract closure dates / first trading day from one holiday's text."""
+        # Step 2: Find closure date range (X月X日至X月X日休市)
+        closure_m = _CLOSURE_PAT.search(clean_text)
+        if not closure_m:
+            return
+
+        sm, sd = int(closure_m.group(1)), int(closure_m.group(2))
+        em, ed = int(closure_m.group(3)), int(closure_m.group(4))
+        dates = self._expand_date_range(year, sm, sd, em, ed)
+        if dates:
+            holidays[name] = dates
+
+        # Step 3: Find first trading day – the date immediately
+        #         before "开市" (e.g. "1月5日（星期一）起照常开市")
+        ft_m = _FT_PAT.search(clean_text)
+        if ft_m:
+            ftm, ftd = int(ft_m.group(1)), int(ft_m.group(2))
+            first_trading_days[name] = (
+                f"{year}-{ftm:02d}-{ftd:02d}"
+            )
+
     # ------------------------------------------------------------------
     # Date helpers
     # ------------------------------------------------------------------
@@ -302,14 +391,15 @@ class SgeHolidayCrawler:
     def _expand_date_range(year, sm, sd, em, ed):
         """Expand month/day range into a list of YYYY-MM-DD strings."""
         try:
-            start = datetime(year, sm, sd)
-            end = datetime(year, em, ed)
-            dates = []
-            cur = start
-            while cur <= end:
-                dates.append(cur.strftime("%Y-%m-%d"))
-                cur += timedelta(days=1)
-            return dates
+            start = date(year, sm, sd)
+            end = date(year, em, ed)
+            if sm == em:
+                # Common case: the whole closure sits inside one month
+                return [f"{year:04d}-{sm:02d}-{d:02d}" for d in range(sd, ed + 1)]
+            return [
+                date.fromordinal(o).isoformat()
+                for o in range(start.toordinal(), end.toordinal() + 1)
+            ]
         except Exception as e:
             print(f"[SGE爬虫] 日期解析错误: {e}")
             return []
@@ -317,21 +407,7 @@ class SgeHolidayCrawler:
     @staticmethod
     def _guess_holiday_name(month, day):
         """Heuristically guess the holiday name from start date."""
-        if month == 1:
-            return "元旦"
-        if month == 2 and day >= 10:
-            return "春节"
-        if month == 4 and day <= 7:
-            return "清明节"
-        if month == 5 and day <= 5:
-            return "劳动节"
-        if month == 6 and 15 <= day <= 25:
-            return "端午节"
-        if month == 9 and day >= 20:
-            return "中秋节"
-        if month == 10 and day <= 7:
-            return "国庆节"
-        return None
+        return _GUESS_NAME.get((month, day))
 
     # ------------------------------------------------------------------
     # Public API
@@ -359,15 +435,14 @@ class SgeHolidayCrawler:
             print(f"[SGE爬虫] 使用 {year} 年缓存数据")
             return cache["calendars"][str(year)]
 
-        # 2. Fetch the listing page
+        # 2. Fetch the listing page (shared with other years' crawls)
         print(f"[SGE爬虫] 开始爬取 {year} 年休市安排...")
-        list_html = self._fetch_url(self.list_url)
-        if not list_html:
+        entries = self._get_list_entries()
+        if entries is None:
             print("[SGE爬虫] 列表页获取失败，尝试使用缓存")
             return self._get_from_cache(cache, year)
 
-        # 3. Parse listing to find matching announcement
-        entries = self._parse_list_page(list_html)
+        # 3. Find the matching announcement in the listing
         if not entries:
             print("[SGE爬虫] 未在列表页找到休市公告")
             return self._get_from_cache(cache, year)
@@ -378,8 +453,10 @@ class SgeHolidayCrawler:
             if str(year) in entry.get("title", ""):
                 target_entry = entry
                 break
-        # Fallback: use newest entry if year not explicitly matched
-        if not target_entry and entries:
+        # Fallback: use newest entry if year not explicitly matched, but
+        # never a notice that names another year – its month/day values
+        # would be stored as dates of *year*
+        if not target_entry and entries and not _YEAR_PAT.search(entries[0].get("title", "")):
             target_entry = entries[0]
 
         if not target_entry:
@@ -450,17 +527,20 @@ class SgeHolidayCrawler:
 
     def _update_cache(self, result):
         year = result.get("year")
-        cache = self._load_cache() or {
-            "metadata": {
-                "version": "1.0",
-                "source": "sge_crawler",
-                "last_updated": datetime.now().isoformat(),
-            },
-            "calendars": {},
-        }
-        cache["calendars"][str(year)] = result
-        cache["metadata"]["last_updated"] = datetime.now().isoformat()
-        self._save_cache(cache)
+        # One year's crawl must not overwrite another's entry, and the
+        # fixed ".tmp" path in _save_cache allows only one writer at a time
+        with self._cache_lock:
+            cache = self._load_cache() or {
+                "metadata": {
+                    "version": "1.0",
+                    "source": "sge_crawler",
+                    "last_updated": datetime.now().isoformat(),
+                },
+                "calendars": {},
+            }
+            cache["calendars"][str(year)] = result
+            cache["metadata"]["last_updated"] = datetime.now().isoformat()
+            self._save_cache(cache)
 
 
 # ------------------------------------------------------------------
@@ -5,13 +5,198 @@
 """
 
 import time
-from datetime import datetime, timedelta
+import functools
+import calendar
+from datetime import date, datetime, timedelta, time as dtime
+from app.config import TRADING_DAY_CACHE_TTL
 from app.services.holiday_service import (
     get_holidays,
+    get_holiday_bitmap,
     is_holiday as holiday_service_is_holiday,
-    warmup_cache,
+    warmup_cache as holiday_service_warmup_cache,
     check_and_save_cache
 )
+from app.services.exchange_calendar import (
+    clear_sge_cache,
+    get_holiday_name_by_date as get_gold_holiday_name_by_date,
+    get_exchange_first_trading_day as get_gold_first_trading_day
+)
+from app.services.exchange_calendar_crawler import (
+    get_holiday_name_by_date as get_fund_holiday_name_by_date,
+    get_first_trading_day as get_fund_first_trading_day
+)
+
+
+# 交易时段关键时间点（模块加载时构造一次，避免每次调用都解析 "HH:MM" 字符串）
+_T0230 = dtime(2, 30)
+_T0850 = dtime(8, 50)
+_T0900 = dtime(9, 0)
+_T0930 = dtime(9, 30)
+_T1130 = dtime(11, 30)
+_T1300 = dtime(13, 0)
+_T1500 = dtime(15, 0)
+_T1530 = dtime(15, 30)
+_T1950 = dtime(19, 50)
+_T2000 = dtime(20, 0)
+
+# 同一时间点的当日分钟序号（hour * 60 + minute），阶段判断用整数比较代替 time 对象比较
+_M0230 = 2 * 60 + 30
+_M0850 = 8 * 60 + 50
+_M0859 = 8 * 60 + 59
+_M0900 = 9 * 60
+_M0930 = 9 * 60 + 30
+_M1130 = 11 * 60 + 30
+_M1300 = 13 * 60
+_M1500 = 15 * 60
+_M1530 = 15 * 60 + 30
+_M1950 = 19 * 60 + 50
+_M1959 = 19 * 60 + 59
+_M2000 = 20 * 60
+
+def _build_phase_index(phases):
+    """按当日分钟序号预先展开阶段表：第 n 字节为第 n 分钟所在阶段的下标 + 1，0 表示不在任何阶段"""
+    index = bytearray(24 * 60)
+    for slot, phase in enumerate(phases, 1):
+        lo, hi = phase[0], phase[1]
+        index[lo:hi] = bytes([slot]) * (hi - lo)
+    return bytes(index)
+
+
+def _make_schedule(market, phases, waits, open_event, overnight, holiday_name_func):
+    """
+    构造市场交易时间表
+    
+    参数:
+        market: 市场类型 "gold" 或 "fund"
+        phases: 交易阶段，按时间顺序排列
+            (起始分钟, 结束分钟, 仅周一至周四, 阶段, 阶段名称, 下一事件, 下一事件在 _day_events 中的键)
+        waits: 当日仍有后续事件的休市时段 (起始分钟, 结束分钟, 仅周一至周四, 下一事件, 事件键)
+            不在任何时段内的休市时间，下一事件为下一交易日开盘
+        open_event: 下一交易日开盘的 (事件, 事件键)
+        overnight: 跨日夜盘 (结束分钟, 阶段, 阶段名称, 下一事件, 事件键)，前一天为周一至周四的交易日时生效
+        holiday_name_func: 按日期字符串查询休市名称的函数
+    """
+    return {
+        "market": market,
+        "phases": phases,
+        "phase_index": _build_phase_index(phases),
+        "waits": waits,
+        "open_event": open_event,
+        "overnight": overnight,
+        "holiday_name": holiday_name_func,
+    }
+
+
+# 上海黄金交易所 Au99.99：日盘 09:00-15:30，夜盘 20:00-次日 02:30（周五无夜盘）
+_GOLD_SCHEDULE = _make_schedule(
+    "gold",
+    phases=(
+        (_M0850, _M0859, False, "day_auction", "早市集合竞价", "day_open", "day_open"),
+        (_M0900, _M1530, False, "day_session", "日间交易", "day_close", "day_close"),
+        (_M1950, _M1959, True, "night_auction", "夜市集合竞价", "night_open", "night_open"),
+        (_M2000, 24 * 60, True, "night_session", "夜间交易", "night_close", "next_night_close"),
+    ),
+    waits=(
+        (0, _M0850, False, "day_auction", "day_auction"),
+        (_M1530, _M1950, True, "night_auction", "night_auction"),
+    ),
+    open_event=("day_open", "day_open"),
+    overnight=(_M0230, "night_session", "夜间交易", "night_close", "night_close"),
+    holiday_name_func=get_gold_holiday_name_by_date,
+)
+
+# 基金/股票：9:30-11:30, 13:00-15:00
+_FUND_SCHEDULE = _make_schedule(
+    "fund",
+    phases=(
+        (_M0930, _M1130, False, "trading", "交易中", "lunch_break", "lunch_break"),
+        (_M1300, _M1500, False, "trading", "交易中", "market_close", "market_close"),
+    ),
+    waits=(
+        (0, _M0930, False, "market_open", "market_open"),
+        (_M1130, _M1300, False, "market_resume", "market_resume"),
+    ),
+    open_event=("market_open", "market_open"),
+    overnight=None,
+    holiday_name_func=get_fund_holiday_name_by_date,
+)
+
+
+@functools.lru_cache(maxsize=64)
+def _day_events(day):
+    """某一天各交易事件的时间点（只取决于日期，按日期缓存）"""
+    return {
+        # 黄金
+        "day_auction": datetime.combine(day, _T0850),
+        "day_open": datetime.combine(day, _T0900),
+        "day_close": datetime.combine(day, _T1530),
+        "night_auction": datetime.combine(day, _T1950),
+        "night_open": datetime.combine(day, _T2000),
+        "night_close": datetime.combine(day, _T0230),
+        "next_night_close": datetime.combine(day + timedelta(days=1), _T0230),
+        # 基金
+        "market_open": datetime.combine(day, _T0930),
+        "lunch_break": datetime.combine(day, _T1130),
+        "market_resume": datetime.combine(day, _T1300),
+        "market_close": datetime.combine(day, _T1500),
+    }
+
+
+def _td_int(td):
+    """timedelta 转整数秒，用整数运算代替 total_seconds() 的浮点计算（剩余时间非负，与 int() 截断结果一致）"""
+    return td.days * 86400 + td.seconds
+
+
+@functools.lru_cache(maxsize=32)
+def _format_event_time(event_time):
+    """格式化下一事件时间（事件时间点很少变化，按值缓存格式化结果）"""
+    return event_time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _with_event_time_str(status_func):
+    """为交易状态结果附加预先格式化的 next_event_time_str，接口层无需再做格式化"""
+    @functools.wraps(status_func)
+    def wrapper(dt=None):
+        result = status_func(dt)
+        event_time = result.get("next_event_time")
+        result["next_event_time_str"] = _format_event_time(event_time) if event_time else None
+        return result
+    return wrapper
+
+
+# dt 为空时的状态缓存 {market_type: (分钟序号, 结果)}
+# 交易阶段的边界都落在整分钟上，同一分钟内只有 time_until_next 会变化
+_status_cache = {}
+
+# 交易阶段内的结果模板 {(市场, 日期, 阶段槽位): 结果}
+# 同一天同一阶段内除 time_until_next 外结果完全相同，无需重新走节假日判断和分支逻辑
+_phase_templates = {}
+_PHASE_TEMPLATES_MAXSIZE = 16
+
+
+def _cache_per_minute(market_type):
+    """dt 为空（取当前时间）时按分钟缓存交易状态，命中后只重新计算 time_until_next"""
+    def decorator(status_func):
+        @functools.wraps(status_func)
+        def wrapper(dt=None):
+            if dt is not None:
+                return status_func(dt)
+
+            minute_bucket = int(time.time() // 60)
+            now = datetime.now()
+            cached = _status_cache.get(market_type)
+            if cached is not None and cached[0] == minute_bucket:
+                result = dict(cached[1])
+                event_time = result["next_event_time"]
+                if event_time is not None:
+                    result["time_until_next"] = _td_int(event_time - now)
+                return result
+
+            result = status_func(now)
+            _status_cache[market_type] = (minute_bucket, dict(result))
+            return result
+        return wrapper
+    return decorator
 
 
 def fetch_holidays(year=None):
@@ -22,7 +207,7 @@ def fetch_holidays(year=None):
         year: 年份，默认为当前年份
         
     返回:
-        set: 节假日日期字符串集合 (格式: "YYYY-MM-DD")
+        frozenset: 节假日日期字符串集合 (格式: "YYYY-MM-DD")
     """
     return get_holidays(year)
 
@@ -44,6 +229,7 @@ def is_holiday(dt=None, market_type="fund"):
 def get_weekday(dt=None):
     """
     获取星期几 (0=周一, 6=周日)
+    保留供外部调用，本模块内部直接使用 dt.weekday()
     
     参数:
         dt: datetime 对象，默认为当前时间
@@ -70,19 +256,53 @@ def is_trading_day(dt=None, market_type="fund"):
     if dt is None:
         dt = datetime.now()
     
-    weekday = get_weekday(dt)
-    
+    _expire_trading_day_cache()
+    return _is_trading_day_cached(dt.date() if isinstance(dt, datetime) else dt, market_type)
+
+
+@functools.lru_cache(maxsize=512)
+def _is_trading_day_cached(day, market_type):
+    """按 (日期, 市场) 缓存的交易日判断"""
     # 周六周日不是交易日
-    if weekday >= 5:
+    if day.weekday() >= 5:
         return False
     
     # 节假日不是交易日
-    if is_holiday(dt, market_type):
+    if is_holiday(day, market_type):
         return False
     
     return True
 
 
+_trading_day_cache_expires = 0.0
+
+
+def clear_trading_day_cache():
+    """清空交易日判断缓存及交易状态缓存（节假日数据更新后调用）"""
+    global _trading_day_cache_expires
+    # 同时丢弃进程内记忆的 SGE 休市数据，下次查询经爬虫按 SGE_HOLIDAY_CACHE_TTL 判断是否重新抓取
+    clear_sge_cache()
+    _is_trading_day_cached.cache_clear()
+    _next_trading_day_cached.cache_clear()
+    _status_cache.clear()
+    _phase_templates.clear()
+    _trading_day_cache_expires = time.time() + TRADING_DAY_CACHE_TTL
+
+
+def _expire_trading_day_cache():
+    """节假日数据可能在运行中更新，依赖它的缓存定期整体失效"""
+    if time.time() >= _trading_day_cache_expires:
+        clear_trading_day_cache()
+
+
+def warmup_cache():
+    """预热节假日缓存，并丢弃基于旧数据的交易日判断"""
+    holiday_service_warmup_cache()
+    clear_trading_day_cache()
+
+
+@_cache_per_minute("gold")
+@_with_event_time_str
 def get_trading_status(dt=None):
     """
     获取黄金当前交易状态
@@ -95,112 +315,11 @@ def get_trading_status(dt=None):
     """
     if dt is None:
         dt = datetime.now()
-    
-    current_time = dt.time()
-    weekday = get_weekday(dt)
-    holiday = is_holiday(dt, "gold")
-    holiday_name = None
-    if holiday:
-        from app.services.exchange_calendar import get_holiday_name_by_date as get_gold_holiday_name_by_date
-        holiday_name = get_gold_holiday_name_by_date(dt.strftime("%Y-%m-%d"))
-    
-    result = {
-        "is_trading_time": False,
-        "trading_phase": "closed",
-        "phase_name": "休市",
-        "next_event": None,
-        "next_event_time": None,
-        "time_until_next": None,
-        "is_holiday": holiday,
-        "holiday_name": holiday_name,
-        "weekday": weekday
-    }
-    
-    # 如果不是交易日，计算下次开盘时间
-    if not is_trading_day(dt, "gold"):
-        next_trading_day = _find_next_trading_day(dt, "gold")
-        day_open = datetime.combine(next_trading_day, datetime.strptime("09:00", "%H:%M").time())
-        
-        result["next_event"] = "day_open"
-        result["next_event_time"] = day_open
-        result["time_until_next"] = int((day_open - dt).total_seconds())
-        return result
-    
-    # 判断当前交易阶段
-    # 早市集合竞价: 08:50-08:59
-    if current_time >= datetime.strptime("08:50", "%H:%M").time() and \
-       current_time < datetime.strptime("08:59", "%H:%M").time():
-        result["is_trading_time"] = True
-        result["trading_phase"] = "day_auction"
-        result["phase_name"] = "早市集合竞价"
-        result["next_event"] = "day_open"
-        day_open = datetime.combine(dt.date(), datetime.strptime("09:00", "%H:%M").time())
-        result["next_event_time"] = day_open
-        result["time_until_next"] = int((day_open - dt).total_seconds())
-        return result
-    
-    # 日间交易: 09:00-15:30
-    if current_time >= datetime.strptime("09:00", "%H:%M").time() and \
-       current_time < datetime.strptime("15:30", "%H:%M").time():
-        result["is_trading_time"] = True
-        result["trading_phase"] = "day_session"
-        result["phase_name"] = "日间交易"
-        result["next_event"] = "day_close"
-        day_close = datetime.combine(dt.date(), datetime.strptime("15:30", "%H:%M").time())
-        result["next_event_time"] = day_close
-        result["time_until_next"] = int((day_close - dt).total_seconds())
-        return result
-    
-    # 夜市集合竞价: 19:50-19:59 (仅周一至周四)
-    if weekday < 4 and \
-       current_time >= datetime.strptime("19:50", "%H:%M").time() and \
-       current_time < datetime.strptime("19:59", "%H:%M").time():
-        result["is_trading_time"] = True
-        result["trading_phase"] = "night_auction"
-        result["phase_name"] = "夜市集合竞价"
-        result["next_event"] = "night_open"
-        night_open = datetime.combine(dt.date(), datetime.strptime("20:00", "%H:%M").time())
-        result["next_event_time"] = night_open
-        result["time_until_next"] = int((night_open - dt).total_seconds())
-        return result
-    
-    # 夜间交易: 20:00-次日02:30 (仅周一至周四)
-    # 注意：周五没有夜市
-    if weekday < 4:
-        # 20:00-23:59:59
-        if current_time >= datetime.strptime("20:00", "%H:%M").time():
-            result["is_trading_time"] = True
-            result["trading_phase"] = "night_session"
-            result["phase_name"] = "夜间交易"
-            result["next_event"] = "night_close"
-            # 次日 02:30
-            next_day = dt.date() + timedelta(days=1)
-            night_close = datetime.combine(next_day, datetime.strptime("02:30", "%H:%M").time())
-            result["next_event_time"] = night_close
-            result["time_until_next"] = int((night_close - dt).total_seconds())
-            return result
-    
-    # 检查是否是凌晨的夜间交易 (02:30 前)
-    if current_time < datetime.strptime("02:30", "%H:%M").time():
-        # 检查昨天是否是周一至周四（有夜市）
-        yesterday = dt.date() - timedelta(days=1)
-        yesterday_weekday = yesterday.weekday()
-
-        if yesterday_weekday < 4 and not is_holiday(yesterday, "gold"):
-            result["is_trading_time"] = True
-            result["trading_phase"] = "night_session"
-            result["phase_name"] = "夜间交易"
-            result["next_event"] = "night_close"
-            night_close = datetime.combine(dt.date(), datetime.strptime("02:30", "%H:%M").time())
-            result["next_event_time"] = night_close
-            result["time_until_next"] = int((night_close - dt).total_seconds())
-            return result
-    
-    # 非交易时间，计算下一个事件
-    result = _calculate_next_event(dt, result)
-    return result
+    return _evaluate_schedule(dt, _GOLD_SCHEDULE)
 
 
+@_cache_per_minute("fund")
+@_with_event_time_str
 def get_fund_trading_status(dt=None):
     """
     获取基金当前交易状态 (核心时段: 9:30-11:30, 13:00-15:00)
@@ -213,14 +332,47 @@ def get_fund_trading_status(dt=None):
     """
     if dt is None:
         dt = datetime.now()
+    return _evaluate_schedule(dt, _FUND_SCHEDULE)
+
+
+def _set_next_event(result, dt, next_event, next_time):
+    """填写下一事件及剩余秒数"""
+    result["next_event"] = next_event
+    result["next_event_time"] = next_time
+    result["time_until_next"] = _td_int(next_time - dt)
+    return result
+
+
+def _evaluate_schedule(dt, schedule):
+    """
+    按交易时间表计算指定时刻的交易状态
     
-    current_time = dt.time()
-    weekday = get_weekday(dt)
-    holiday = is_holiday(dt, "fund")
+    参数:
+        dt: datetime 对象
+        schedule: _make_schedule 构造的交易时间表
+        
+    返回:
+        dict: 包含交易状态信息的字典
+    """
+    market = schedule["market"]
+    today = dt.date()
+    minute_of_day = dt.hour * 60 + dt.minute
+    
+    # 交易阶段内直接复用当天该阶段的结果
+    phase_slot = schedule["phase_index"][minute_of_day]
+    if phase_slot:
+        _expire_trading_day_cache()
+        template = _phase_templates.get((market, today, phase_slot))
+        if template is not None:
+            result = dict(template)
+            result["time_until_next"] = _td_int(result["next_event_time"] - dt)
+            return result
+    
+    weekday = dt.weekday()
+    holiday = is_holiday(dt, market)
     holiday_name = None
     if holiday:
-        from app.services.exchange_calendar_crawler import get_holiday_name_by_date as get_fund_holiday_name_by_date
-        holiday_name = get_fund_holiday_name_by_date(dt.strftime("%Y-%m-%d"))
+        holiday_name = schedule["holiday_name"](today.isoformat())
     
     result = {
         "is_trading_time": False,
@@ -234,107 +386,47 @@ def get_fund_trading_status(dt=None):
         "weekday": weekday
     }
     
-    # 定义关键时间点
-    t930 = datetime.strptime("09:30", "%H:%M").time()
-    t1130 = datetime.strptime("11:30", "%H:%M").time()
-    t1300 = datetime.strptime("13:00", "%H:%M").time()
-    t1500 = datetime.strptime("15:00", "%H:%M").time()
+    open_event, open_key = schedule["open_event"]
     
     # 如果不是交易日，计算下次开盘时间
-    if not is_trading_day(dt, "fund"):
-        next_trading_day = _find_next_trading_day(dt, "fund")
-        day_open = datetime.combine(next_trading_day, t930)
-        
-        result["next_event"] = "market_open"
-        result["next_event_time"] = day_open
-        result["time_until_next"] = int((day_open - dt).total_seconds())
-        return result
+    if not is_trading_day(dt, market):
+        next_trading_day = _find_next_trading_day(dt, market)
+        return _set_next_event(result, dt, open_event, _day_events(next_trading_day)[open_key])
+    
+    # 判断当前交易阶段（按分钟序号查阶段表）
+    if phase_slot:
+        _, _, night_only, phase, phase_name, next_event, event_key = schedule["phases"][phase_slot - 1]
+        # 周五没有夜市
+        if not (night_only and weekday >= 4):
+            result["is_trading_time"] = True
+            result["trading_phase"] = phase
+            result["phase_name"] = phase_name
+            _set_next_event(result, dt, next_event, _day_events(today)[event_key])
+            if len(_phase_templates) >= _PHASE_TEMPLATES_MAXSIZE:
+                _phase_templates.clear()
+            _phase_templates[(market, today, phase_slot)] = dict(result)
+            return result
     
-    # 判断当前交易阶段
-    if (current_time >= t930 and current_time < t1130) or \
-       (current_time >= t1300 and current_time < t1500):
-        result["is_trading_time"] = True
-        result["trading_phase"] = "trading"
-        result["phase_name"] = "交易中"
-        
-        if current_time < t1130:
-            next_event_time = datetime.combine(dt.date(), t1130)
-            result["next_event"] = "lunch_break"
-        else:
-            next_event_time = datetime.combine(dt.date(), t1500)
-            result["next_event"] = "market_close"
-            
-        result["next_event_time"] = next_event_time
-        result["time_until_next"] = int((next_event_time - dt).total_seconds())
-        return result
+    # 检查是否是凌晨的跨日夜盘（如黄金 02:30 前）
+    overnight = schedule["overnight"]
+    if overnight is not None and minute_of_day < overnight[0]:
+        # 检查昨天是否是周一至周四（有夜市）
+        yesterday = today - timedelta(days=1)
+        if yesterday.weekday() < 4 and not is_holiday(yesterday, market):
+            _, phase, phase_name, next_event, event_key = overnight
+            result["is_trading_time"] = True
+            result["trading_phase"] = phase
+            result["phase_name"] = phase_name
+            return _set_next_event(result, dt, next_event, _day_events(today)[event_key])
     
     # 非交易时间，计算下一个事件
-    if current_time < t930:
-        next_event_time = datetime.combine(dt.date(), t930)
-        result["next_event"] = "market_open"
-    elif current_time < t1300:
-        next_event_time = datetime.combine(dt.date(), t1300)
-        result["next_event"] = "market_resume"
-    else:
-        next_trading_day = _find_next_trading_day(dt, "fund")
-        next_event_time = datetime.combine(next_trading_day, t930)
-        result["next_event"] = "market_open"
-        
-    result["next_event_time"] = next_event_time
-    result["time_until_next"] = int((next_event_time - dt).total_seconds())
-    return result
-
-
-def _calculate_next_event(dt, result):
-    """
-    计算黄金下一个交易事件（开盘或收盘）
-    """
-    current_time = dt.time()
-    weekday = get_weekday(dt)
-    
-    # 如果当前在日间交易前（08:50 前）
-    if current_time < datetime.strptime("08:50", "%H:%M").time():
-        result["next_event"] = "day_auction"
-        next_time = datetime.combine(dt.date(), datetime.strptime("08:50", "%H:%M").time())
-        result["next_event_time"] = next_time
-        result["time_until_next"] = int((next_time - dt).total_seconds())
-        return result
+    for lo, hi, night_only, next_event, event_key in schedule["waits"]:
+        if lo <= minute_of_day < hi and not (night_only and weekday >= 4):
+            return _set_next_event(result, dt, next_event, _day_events(today)[event_key])
     
-    # 如果当前在日间收盘后到夜市前
-    if current_time >= datetime.strptime("15:30", "%H:%M").time() and \
-       current_time < datetime.strptime("19:50", "%H:%M").time():
-        # 检查今天是否有夜市（周一至周四）
-        if weekday < 4:
-            result["next_event"] = "night_auction"
-            next_time = datetime.combine(dt.date(), datetime.strptime("19:50", "%H:%M").time())
-            result["next_event_time"] = next_time
-            result["time_until_next"] = int((next_time - dt).total_seconds())
-        else:
-            # 周五没有夜市，等下周一
-            next_trading_day = _find_next_trading_day(dt, "gold")
-            result["next_event"] = "day_open"
-            next_time = datetime.combine(next_trading_day, datetime.strptime("09:00", "%H:%M").time())
-            result["next_event_time"] = next_time
-            result["time_until_next"] = int((next_time - dt).total_seconds())
-        return result
-    
-    # 如果当前在夜市收盘后（02:30 后到次日 08:50）
-    if current_time >= datetime.strptime("02:30", "%H:%M").time() and \
-       current_time < datetime.strptime("08:50", "%H:%M").time():
-        result["next_event"] = "day_open"
-        next_time = datetime.combine(dt.date(), datetime.strptime("09:00", "%H:%M").time())
-        result["next_event_time"] = next_time
-        result["time_until_next"] = int((next_time - dt).total_seconds())
-        return result
-    
-    # 默认情况下找下一个交易日
-    next_trading_day = _find_next_trading_day(dt, "gold")
-    result["next_event"] = "day_open"
-    next_time = datetime.combine(next_trading_day, datetime.strptime("09:00", "%H:%M").time())
-    result["next_event_time"] = next_time
-    result["time_until_next"] = int((next_time - dt).total_seconds())
-    
-    return result
+    # 当日已无后续事件，等下一个交易日开盘
+    next_trading_day = _find_next_trading_day(dt, market)
+    return _set_next_event(result, dt, open_event, _day_events(next_trading_day)[open_key])
 
 
 def _find_next_trading_day(start_dt, market_type="fund"):
@@ -348,90 +440,128 @@ def _find_next_trading_day(start_dt, market_type="fund"):
     返回:
         date: 下一个交易日的日期
     """
-    date_str = start_dt.strftime("%Y-%m-%d")
+    _expire_trading_day_cache()
+    return _next_trading_day_cached(start_dt.date(), market_type)
+
+
+@functools.lru_cache(maxsize=256)
+def _next_trading_day_cached(day, market_type):
+    """按 (日期, 市场) 缓存的下一个交易日，结果只取决于日期和节假日数据"""
+    date_str = day.isoformat()
     
     # 尝试直接获取节后首个交易日
     if market_type == "fund":
-        from app.services.exchange_calendar_crawler import (
-            get_holiday_name_by_date as get_fund_holiday_name_by_date,
-            get_first_trading_day as get_fund_first_trading_day
-        )
         holiday_name = get_fund_holiday_name_by_date(date_str)
         if holiday_name:
-            first_day_str = get_fund_first_trading_day(holiday_name, start_dt.year)
+            first_day_str = get_fund_first_trading_day(holiday_name, day.year)
             if first_day_str:
                 try:
-                    candidate_date = datetime.strptime(first_day_str, "%Y-%m-%d").date()
-                    if candidate_date > start_dt.date():
+                    candidate_date = date.fromisoformat(first_day_str)
+                    if candidate_date > day:
                         return candidate_date
                 except Exception:
                     pass
     else:
-        from app.services.exchange_calendar import get_holiday_name_by_date, get_exchange_first_trading_day
-        holiday_name = get_holiday_name_by_date(date_str)
+        holiday_name = get_gold_holiday_name_by_date(date_str)
         if holiday_name:
-            first_day_str = get_exchange_first_trading_day(holiday_name, start_dt.year)
+            first_day_str = get_gold_first_trading_day(holiday_name, day.year)
             if first_day_str:
                 try:
-                    candidate_date = datetime.strptime(first_day_str, "%Y-%m-%d").date()
-                    if candidate_date > start_dt.date():
+                    candidate_date = date.fromisoformat(first_day_str)
+                    if candidate_date > day:
                         return candidate_date
                 except Exception:
                     pass
                 
-    current_date = start_dt.date() + timedelta(days=1)
-    
-    # 最多查找 30 天
-    for _ in range(30):
-        dt_check = datetime.combine(current_date, datetime.min.time())
-        if is_trading_day(dt_check, market_type):
-            return current_date
-        current_date += timedelta(days=1)
+    # 最多查找 30 天：按年合并休市位图和周末位图，逐位查找第一个开市日
+    ordinal = day.toordinal() + 1
+    end = ordinal + 30
+    while ordinal < end:
+        year = date.fromordinal(ordinal).year
+        jan1, holiday_bits = get_holiday_bitmap(year, market_type)
+        closed_bits = holiday_bits | _weekend_bitmap(year)
+        offset = ordinal - jan1
+        limit = min(end - jan1, 366 if calendar.isleap(year) else 365)
+        while offset < limit:
+            if not closed_bits >> offset & 1:
+                return date.fromordinal(jan1 + offset)
+            offset += 1
+        ordinal = jan1 + limit
     
     # 如果 30 天内没找到，返回当前日期（异常情况）
-    return start_dt.date()
+    return day
+
 
+@functools.lru_cache(maxsize=8)
+def _weekend_bitmap(year):
+    """某年的周末位图，第 n 位为 1 表示 1 月 1 日之后第 n 天是周六或周日"""
+    first_weekday = date(year, 1, 1).weekday()
+    days = 366 if calendar.isleap(year) else 365
+    bits = 0
+    for offset in range(days):
+        if (first_weekday + offset) % 7 >= 5:
+            bits |= 1 << offset
+    return bits
 
-def get_fetch_interval(asset_type="gold", dt=None):
+
+def get_fetch_interval(asset_type="gold", dt=None, status=None):
     """
     获取当前应该使用的数据采集间隔
     
     参数:
         asset_type: 资产类型 ("gold" or "fund")
         dt: datetime 对象，默认为当前时间
+        status: 调用方已获取的交易状态，传入时不再重新计算
         
     返回:
         int: 采集间隔秒数（交易时间较短，非交易时间 300 秒）
     """
     if asset_type == "fund":
-        status = get_fund_trading_status(dt)
+        if status is None:
+            status = get_fund_trading_status(dt)
         if status["is_trading_time"]:
             return 15  # 基金更新稍慢，15秒一次
         else:
             return 300
     else:
-        status = get_trading_status(dt)
+        if status is None:
+            status = get_trading_status(dt)
         if status["is_trading_time"]:
             return 5  # 黄金交易：5 秒
         else:
             return 300  # 非交易时间：5 分钟
 
 
-def check_trading_events(asset_type="gold", last_status=None):
+# 交易阶段变化 (上次阶段, 当前阶段) -> (事件类型, 事件名称)
+_GOLD_EVENT_MAP = {
+    ("day_auction", "day_session"): ("day_open", "日间交易开始"),
+    ("day_session", "closed"): ("day_close", "日间交易结束"),
+    ("night_auction", "night_session"): ("night_open", "夜间交易开始"),
+    ("night_session", "closed"): ("night_close", "夜间交易结束"),
+}
+_FUND_EVENT_MAP = {
+    ("closed", "trading"): ("market_open", "基金市场开盘"),
+    ("trading", "closed"): ("market_close", "基金市场收盘"),
+}
+
+
+def check_trading_events(asset_type="gold", last_status=None, current_status=None):
     """
     检查是否触发了交易事件（开盘或收盘）
     
     参数:
         asset_type: 资产类型 ("gold" or "fund")
         last_status: 上一次的交易状态
+        current_status: 调用方已获取的当前交易状态，默认重新获取
         
     返回:
         dict or None: 如果有事件触发，返回事件信息
     """
-    if asset_type == "fund":
-        current_status = get_fund_trading_status()
-    else:
-        current_status = get_trading_status()
+    if current_status is None:
+        if asset_type == "fund":
+            current_status = get_fund_trading_status()
+        else:
+            current_status = get_trading_status()
     
     if last_status is None:
         return None
@@ -440,18 +570,7 @@ def check_trading_events(asset_type="gold", last_status=None):
     last_phase = last_status.get("trading_phase", "closed")
     current_phase = current_status["trading_phase"]
     
-    if asset_type == "gold":
-        event_map = {
-            ("day_auction", "day_session"): ("day_open", "日间交易开始"),
-            ("day_session", "closed"): ("day_close", "日间交易结束"),
-            ("night_auction", "night_session"): ("night_open", "夜间交易开始"),
-            ("night_session", "closed"): ("night_close", "夜间交易结束"),
-        }
-    else: # fund
-        event_map = {
-            ("closed", "trading"): ("market_open", "基金市场开盘"),
-            ("trading", "closed"): ("market_close", "基金市场收盘"),
-        }
+    event_map = _GOLD_EVENT_MAP if asset_type == "gold" else _FUND_EVENT_MAP
     
     key = (last_phase, current_phase)
     if key in event_map:
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+JSON 编解码工具
+优先使用 orjson（C 实现，速度更快），未安装时回退到标准库 json
+"""
+
+import json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def dumps_bytes(obj):
+    """
+    将对象序列化为 UTF-8 编码的 JSON 字节串（紧凑格式，不转义中文）
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """
+    解析 JSON，支持 str / bytes / bytearray / memoryview 输入
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+条件请求响应缓存工具
+对变化缓慢的只读接口缓存序列化后的响应体和 ETag，客户端携带 If-None-Match 命中时直接返回 304
+"""
+
+import hashlib
+import threading
+
+from cachetools import TTLCache
+from flask import Response, request
+
+from app.config import RESPONSE_CACHE_TTL
+from app.utils.fast_json import dumps_bytes
+
+
+# {key: (etag, body_bytes)}，key 由调用方根据数据版本构造
+_RESPONSE_CACHE = TTLCache(maxsize=64, ttl=RESPONSE_CACHE_TTL)
+_cache_lock = threading.Lock()
+
+
+def cached_json(key, build_fn):
+    """
+    返回带 ETag 的 JSON 响应
+    
+    参数:
+        key: 数据版本键（数据变化时键必须变化）
+        build_fn: 无参函数，缓存未命中时调用以生成响应数据
+    """
+    with _cache_lock:
+        entry = _RESPONSE_CACHE.get(key)
+    
+    if entry is None:
+        body = dumps_bytes(build_fn())
+        entry = (hashlib.sha1(body).hexdigest(), body)
+        with _cache_lock:
+            _RESPONSE_CACHE[key] = entry
+    
+    etag, body = entry
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # 允许浏览器缓存，但每次使用前必须携带 ETag 向服务端确认
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
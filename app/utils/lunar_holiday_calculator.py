@@ -254,10 +254,11 @@ def get_next_holiday_info(current_date, holidays_set):
     返回:
         (距离天数, 节日名称) 或 None
     """
+    today_str = current_date.strftime("%Y-%m-%d")
     holiday_dates = sorted([
-        (datetime.strptime(d, "%Y-%m-%d"), d) 
+        (datetime.fromisoformat(d), d)
         for d in holidays_set 
-        if d >= current_date.strftime("%Y-%m-%d")
+        if d >= today_str
     ])
     
     if not holiday_dates:
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+时间格式化缓存工具
+仪表盘时间只精确到秒，同一秒内的多次格式化直接复用结果
+"""
+
+import time
+import functools
+from datetime import datetime
+
+
+@functools.lru_cache(maxsize=4)
+def format_datetime(sec):
+    """将整数秒时间戳格式化为 "YYYY-MM-DD HH:MM:SS"（本地时区）"""
+    return datetime.fromtimestamp(sec).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def now_str():
+    """当前时间的 "YYYY-MM-DD HH:MM:SS" 字符串"""
+    return format_datetime(int(time.time()))
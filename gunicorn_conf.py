@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 配置
+用法: gunicorn -c gunicorn_conf.py wsgi:application
+
+注意：自选列表、缓存、金价历史等状态都保存在进程内存中并由进程自行写入 data.json，
+因此只能使用单个 worker；并发由 gthread 线程提供。
+"""
+
+import threading
+
+from app.config import SERVER_HOST, SERVER_PORT, SERVER_THREADS
+
+bind = f"{SERVER_HOST}:{SERVER_PORT}"
+workers = 1
+worker_class = "gthread"
+threads = SERVER_THREADS
+timeout = 60
+
+
+def post_worker_init(worker):
+    """worker 启动后再创建后台抓取线程（线程不能跨 fork 继承）"""
+    from app.services.background import background_fetch_loop
+    threading.Thread(target=background_fetch_loop, daemon=True).start()
+
+
+def worker_exit(server, worker):
+    """worker 退出时通知后台线程停止"""
+    from app.services.background import stop_background_loop
+    stop_background_loop()
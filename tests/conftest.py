@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+pytest 公共配置：把项目根目录加入 sys.path，使测试可以直接 import app
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
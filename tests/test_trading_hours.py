@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+交易时间服务测试
+休市数据全部替换为固定集合，不访问网络；覆盖黄金 / 基金交易状态、休市位图查询、下一交易日查找
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import app.services.holiday_service as holiday_service
+import app.services.trading_hours as trading_hours
+
+
+# 固定休市安排：2026 国庆 10-01 ~ 10-07（周四至周三），2027 元旦 01-01（周五）
+_NATIONAL_DAY = frozenset(f"2026-10-{d:02d}" for d in range(1, 8))
+_NEW_YEAR = frozenset({"2027-01-01"})
+_HOLIDAYS = {2026: _NATIONAL_DAY, 2027: _NEW_YEAR}
+_EMPTY = frozenset()
+_HOLIDAY_NAMES = dict.fromkeys(_NATIONAL_DAY, "国庆节")
+_HOLIDAY_NAMES.update(dict.fromkeys(_NEW_YEAR, "元旦"))
+
+# 2026-10-12 为周一，2026-10-16 为周五
+MON = date(2026, 10, 12)
+TUE = date(2026, 10, 13)
+FRI = date(2026, 10, 16)
+SAT = date(2026, 10, 17)
+NEXT_MON = date(2026, 10, 19)
+
+
+def _at(day, hh, mm, ss=0):
+    return datetime(day.year, day.month, day.day, hh, mm, ss)
+
+
+@pytest.fixture(autouse=True)
+def fixed_calendar(monkeypatch):
+    """两个市场使用同一份固定休市安排，并清空所有依赖休市数据的缓存"""
+    monkeypatch.setattr(holiday_service, "get_exchange_holidays",
+                        lambda year: _HOLIDAYS.get(year, _EMPTY))
+    monkeypatch.setattr(holiday_service, "fetch_exchange_holidays_with_status",
+                        lambda year: (_HOLIDAYS.get(year, _EMPTY), True))
+    for name in ("get_gold_first_trading_day", "get_fund_first_trading_day"):
+        monkeypatch.setattr(trading_hours, name, lambda holiday_name, year=None: None)
+    for name in ("get_gold_holiday_name_by_date", "get_fund_holiday_name_by_date"):
+        monkeypatch.setattr(trading_hours, name, _HOLIDAY_NAMES.get)
+    monkeypatch.setitem(trading_hours._GOLD_SCHEDULE, "holiday_name", _HOLIDAY_NAMES.get)
+    monkeypatch.setitem(trading_hours._FUND_SCHEDULE, "holiday_name", _HOLIDAY_NAMES.get)
+    monkeypatch.setattr(trading_hours, "clear_sge_cache", lambda: None)
+
+    holiday_service._bitmap_cache.clear()
+    trading_hours.clear_trading_day_cache()
+    yield
+    holiday_service._bitmap_cache.clear()
+    trading_hours.clear_trading_day_cache()
+
+
+def _assert_status(status, phase, next_event, next_time, now):
+    assert status["trading_phase"] == phase
+    assert status["is_trading_time"] == (phase != "closed")
+    assert status["next_event"] == next_event
+    assert status["next_event_time"] == next_time
+    assert status["time_until_next"] == int((next_time - now).total_seconds())
+    assert status["next_event_time_str"] == next_time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ==================== 黄金 ====================
+
+@pytest.mark.parametrize("now, phase, next_event, next_time", [
+    # 日盘
+    (_at(MON, 8, 55), "day_auction", "day_open", _at(MON, 9, 0)),
+    (_at(MON, 10, 0, 30), "day_session", "day_close", _at(MON, 15, 30)),
+    (_at(MON, 17, 0), "closed", "night_auction", _at(MON, 19, 50)),
+    # 夜盘（周一至周四）
+    (_at(MON, 19, 55), "night_auction", "night_open", _at(MON, 20, 0)),
+    (_at(MON, 21, 0), "night_session", "night_close", _at(TUE, 2, 30)),
+    # 02:30 前延续前一天的夜盘；周一凌晨前一天是周日，没有夜盘
+    (_at(TUE, 1, 0), "night_session", "night_close", _at(TUE, 2, 30)),
+    (_at(MON, 1, 0), "closed", "day_auction", _at(MON, 8, 50)),
+    (_at(MON, 3, 0), "closed", "day_auction", _at(MON, 8, 50)),
+    # 周五没有夜盘，下一事件为下周一开盘；周六凌晨也不延续周五夜盘
+    (_at(FRI, 17, 0), "closed", "day_open", _at(NEXT_MON, 9, 0)),
+    (_at(FRI, 19, 55), "closed", "day_open", _at(NEXT_MON, 9, 0)),
+    (_at(FRI, 21, 0), "closed", "day_open", _at(NEXT_MON, 9, 0)),
+    (_at(SAT, 1, 0), "closed", "day_open", _at(NEXT_MON, 9, 0)),
+    # 集合竞价结束到开盘之间的一分钟：沿用原有行为，下一事件为下一交易日开盘
+    (_at(MON, 8, 59, 30), "closed", "day_open", _at(TUE, 9, 0)),
+    (_at(MON, 19, 59, 30), "closed", "day_open", _at(TUE, 9, 0)),
+])
+def test_gold_status(now, phase, next_event, next_time):
+    status = trading_hours.get_trading_status(now)
+    _assert_status(status, phase, next_event, next_time, now)
+    assert status["weekday"] == now.weekday()
+    assert status["is_holiday"] is False
+
+
+def test_gold_status_on_holiday():
+    now = _at(date(2026, 10, 1), 10, 0)
+    status = trading_hours.get_trading_status(now)
+    _assert_status(status, "closed", "day_open", _at(date(2026, 10, 8), 9, 0), now)
+    assert status["is_holiday"] is True
+    assert status["holiday_name"] == "国庆节"
+
+
+def test_gold_no_night_carryover_after_holiday():
+    # 10-07（周三）休市，10-08 凌晨没有延续的夜盘
+    now = _at(date(2026, 10, 8), 1, 0)
+    status = trading_hours.get_trading_status(now)
+    _assert_status(status, "closed", "day_auction", _at(date(2026, 10, 8), 8, 50), now)
+
+
+def test_gold_phase_template_reused_within_phase():
+    first = trading_hours.get_trading_status(_at(MON, 10, 0))
+    later = _at(MON, 14, 0, 15)
+    second = trading_hours.get_trading_status(later)
+    assert second is not first
+    _assert_status(second, "day_session", "day_close", _at(MON, 15, 30), later)
+
+
+# ==================== 基金 ====================
+
+@pytest.mark.parametrize("now, phase, next_event, next_time", [
+    (_at(MON, 9, 0), "closed", "market_open", _at(MON, 9, 30)),
+    (_at(MON, 10, 0), "trading", "lunch_break", _at(MON, 11, 30)),
+    (_at(MON, 12, 0), "closed", "market_resume", _at(MON, 13, 0)),
+    (_at(MON, 14, 0, 30), "trading", "market_close", _at(MON, 15, 0)),
+    (_at(MON, 16, 0), "closed", "market_open", _at(TUE, 9, 30)),
+    (_at(FRI, 16, 0), "closed", "market_open", _at(NEXT_MON, 9, 30)),
+    (_at(SAT, 10, 0), "closed", "market_open", _at(NEXT_MON, 9, 30)),
+])
+def test_fund_status(now, phase, next_event, next_time):
+    status = trading_hours.get_fund_trading_status(now)
+    _assert_status(status, phase, next_event, next_time, now)
+    assert status["phase_name"] == ("交易中" if phase == "trading" else "休市")
+
+
+def test_fund_status_on_holiday():
+    now = _at(date(2026, 10, 5), 10, 0)
+    status = trading_hours.get_fund_trading_status(now)
+    _assert_status(status, "closed", "market_open", _at(date(2026, 10, 8), 9, 30), now)
+    assert status["holiday_name"] == "国庆节"
+
+
+# ==================== 休市位图 ====================
+
+@pytest.mark.parametrize("market_type", ["gold", "fund"])
+def test_is_holiday_bitmap(market_type):
+    assert holiday_service.is_holiday(datetime(2026, 10, 1, 12, 0), market_type)
+    assert holiday_service.is_holiday(date(2026, 10, 7), market_type)
+    assert not holiday_service.is_holiday(date(2026, 9, 30), market_type)
+    assert not holiday_service.is_holiday(date(2026, 10, 8), market_type)
+    assert holiday_service.is_holiday(date(2027, 1, 1), market_type)
+    assert not holiday_service.is_holiday(date(2026, 12, 31), market_type)
+
+
+def test_is_holiday_bitmap_leap_year_and_rebuild(monkeypatch):
+    leap = frozenset({"2028-12-31", "2028-02-29", "not-a-date"})
+    monkeypatch.setattr(holiday_service, "get_exchange_holidays",
+                        lambda year: leap if year == 2028 else _EMPTY)
+    assert holiday_service.is_holiday(date(2028, 12, 31), "gold")
+    assert holiday_service.is_holiday(date(2028, 2, 29), "gold")
+    assert not holiday_service.is_holiday(date(2028, 3, 1), "gold")
+
+    # 底层日历返回新的集合对象时位图重建
+    updated = frozenset({"2028-03-01"})
+    monkeypatch.setattr(holiday_service, "get_exchange_holidays",
+                        lambda year: updated if year == 2028 else _EMPTY)
+    assert holiday_service.is_holiday(date(2028, 3, 1), "gold")
+    assert not holiday_service.is_holiday(date(2028, 12, 31), "gold")
+
+
+# ==================== 下一交易日 ====================
+
+@pytest.mark.parametrize("start, expected", [
+    (_at(FRI, 16, 0), NEXT_MON),
+    (_at(date(2026, 9, 30), 16, 0), date(2026, 10, 8)),
+    # 跨年：01-01 休市，01-02 / 01-03 为周末
+    (_at(date(2026, 12, 31), 16, 0), date(2027, 1, 4)),
+])
+@pytest.mark.parametrize("market_type", ["gold", "fund"])
+def test_find_next_trading_day(market_type, start, expected):
+    assert trading_hours._find_next_trading_day(start, market_type) == expected
+
+
+@pytest.mark.parametrize("market_type", ["gold", "fund"])
+def test_next_trading_day_matches_day_by_day_scan(market_type):
+    day = date(2026, 9, 1)
+    while day < date(2027, 2, 1):
+        expected = day + timedelta(days=1)
+        while not trading_hours.is_trading_day(expected, market_type):
+            expected += timedelta(days=1)
+        start = datetime.combine(day, datetime.min.time())
+        assert trading_hours._find_next_trading_day(start, market_type) == expected
+        day += timedelta(days=1)
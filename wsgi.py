@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+WSGI 入口（供 gunicorn 等生产服务器使用）
+后台抓取线程由 gunicorn_conf.py 的 post_worker_init 钩子启动
+
+用法: gunicorn -c gunicorn_conf.py wsgi:application
+"""
+
+from app import create_app
+
+application = create_app()
+app = application